@@ -0,0 +1,277 @@
+"""
+Incrementally maintained analytics summaries.
+
+Each upload, classification and recommendation adds to daily rows for the
+global scope, the owning user and (if any) the case, split by wound type
+plus an all-types "*" row. Deleting wounds subtracts everything they had
+added (record_deletion), so the rows always match a rebuild() from the
+remaining wounds. /api/stats reads only these rows, so its cost depends on
+the requested date range, not on how many wounds exist.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import bindparam, delete, select, union_all, update
+from sqlalchemy.orm import Session
+from database import AnalyticsDaily, Classification, ClassificationArchive, Recommendation, RecommendationArchive, Wound
+
+ALL_TYPES = "*"
+
+# (upper bound in ms, column) — None is the overflow bucket
+LATENCY_BUCKETS = [
+    (1000, "latency_le_1s"),
+    (2000, "latency_le_2s"),
+    (5000, "latency_le_5s"),
+    (10000, "latency_le_10s"),
+    (20000, "latency_le_20s"),
+    (None, "latency_gt_20s"),
+]
+
+COUNTER_COLUMNS = [
+    "uploads", "classifications", "recommendations", "confidence_sum", "processing_ms_sum",
+] + [column for _, column in LATENCY_BUCKETS]
+
+
+def _scopes(user_id, case_id):
+    scopes = [("global", 0)]
+    if user_id is not None:
+        scopes.append(("user", user_id))
+    if case_id:
+        scopes.append(("case", case_id))
+    return scopes
+
+
+def _latency_column(processing_ms) -> str:
+    for bound, column in LATENCY_BUCKETS:
+        if bound is None or (processing_ms or 0) <= bound:
+            return column
+
+
+def _upsert(db: Session, keys: dict, deltas: dict):
+    """Atomically add `deltas` to the summary row identified by `keys`"""
+    dialect = db.get_bind().dialect.name
+    values = {**keys, **{column: 0 for column in COUNTER_COLUMNS}, **deltas}
+    increments = {column: getattr(AnalyticsDaily, column) + amount for column, amount in deltas.items()}
+    
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(AnalyticsDaily).values(**values).on_conflict_do_update(
+            index_elements=["scope", "scope_id", "day", "wound_type"],
+            set_=increments,
+        )
+        db.execute(statement)
+        return
+    
+    # Generic fallback: update, insert if the row does not exist yet
+    updated = db.query(AnalyticsDaily).filter_by(**keys).update(increments, synchronize_session=False)
+    if not updated:
+        db.add(AnalyticsDaily(**values))
+        db.flush()
+
+
+def _record(db: Session, day: date, wound_type, user_id, case_id, deltas: dict):
+    for scope, scope_id in _scopes(user_id, case_id):
+        for bucket_type in {ALL_TYPES, wound_type or ALL_TYPES}:
+            _upsert(db, {"scope": scope, "scope_id": scope_id, "day": day, "wound_type": bucket_type}, deltas)
+
+
+def record_upload(db: Session, wound: Wound):
+    """Count a new wound upload (caller commits)"""
+    day = (wound.upload_date or datetime.utcnow()).date()
+    _record(db, day, None, wound.user_id, wound.case_id, {"uploads": 1})
+
+
+def _pinned(row, column: str) -> datetime:
+    # Before the flush the column default hasn't run yet: set it now, so the
+    # row and its summary day agree (rebuild() reads the stored value)
+    if getattr(row, column) is None:
+        setattr(row, column, datetime.utcnow())
+    return getattr(row, column)
+
+
+def record_classification(db: Session, wound: Wound, classification: Classification):
+    """Count a classification towards type distribution, confidence and latency on its own day (caller commits)"""
+    day = _pinned(classification, "timestamp").date()
+    _record(db, day, classification.wound_type, wound.user_id, wound.case_id, {
+        "classifications": 1,
+        "confidence_sum": float(classification.confidence or 0),
+        "processing_ms_sum": int(classification.processing_time_ms or 0),
+        _latency_column(classification.processing_time_ms): 1,
+    })
+
+
+def record_recommendation(db: Session, wound: Wound, recommendation: Recommendation):
+    """Count a generated recommendation on its own day (caller commits)"""
+    day = _pinned(recommendation, "created_at").date()
+    _record(db, day, None, wound.user_id, wound.case_id, {"recommendations": 1})
+
+
+def _contributions(db: Session, wound_ids=None, batch_size: int = 1000) -> dict:
+    """
+    What the base tables add to each (scope, scope_id, day, wound_type) row:
+    all wounds, or only `wound_ids` (a list or a select of ids)
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    
+    def add(day, wound_type, user_id, case_id, deltas):
+        for scope, scope_id in _scopes(user_id, case_id):
+            for bucket_type in {ALL_TYPES, wound_type or ALL_TYPES}:
+                row = totals[(scope, scope_id, day, bucket_type)]
+                for column, amount in deltas.items():
+                    row[column] += amount
+    
+    def only_selected(statement):
+        return statement if wound_ids is None else statement.where(Wound.id.in_(wound_ids))
+    
+    uploads = only_selected(select(Wound.upload_date, Wound.user_id, Wound.case_id))
+    for upload_date, user_id, case_id in db.execute(uploads.execution_options(yield_per=batch_size)):
+        add(upload_date.date(), None, user_id, case_id, {"uploads": 1})
+    
+    # Archived (superseded) rows still count towards history (see maintenance.py)
+    all_classifications = union_all(*[
+        select(table.wound_id, table.timestamp, table.wound_type, table.confidence, table.processing_time_ms)
+        for table in (Classification, ClassificationArchive)
+    ]).subquery()
+    classifications = only_selected(select(
+        all_classifications.c.timestamp, all_classifications.c.wound_type, all_classifications.c.confidence,
+        all_classifications.c.processing_time_ms, Wound.user_id, Wound.case_id
+    ).join(Wound, Wound.id == all_classifications.c.wound_id))
+    for timestamp, wound_type, confidence, processing_ms, user_id, case_id in db.execute(
+        classifications.execution_options(yield_per=batch_size)
+    ):
+        add(timestamp.date(), wound_type, user_id, case_id, {
+            "classifications": 1,
+            "confidence_sum": float(confidence or 0),
+            "processing_ms_sum": int(processing_ms or 0),
+            _latency_column(processing_ms): 1,
+        })
+    
+    all_recommendations = union_all(
+        select(Classification.wound_id, Recommendation.created_at).join(
+            Classification, Classification.id == Recommendation.classification_id
+        ),
+        select(RecommendationArchive.wound_id, RecommendationArchive.created_at),
+    ).subquery()
+    recommendations = only_selected(select(all_recommendations.c.created_at, Wound.user_id, Wound.case_id).join(
+        Wound, Wound.id == all_recommendations.c.wound_id
+    ))
+    for created_at, user_id, case_id in db.execute(recommendations.execution_options(yield_per=batch_size)):
+        add(created_at.date(), None, user_id, case_id, {"recommendations": 1})
+    
+    return totals
+
+
+def record_deletion(db: Session, wound_ids):
+    """
+    Take wounds about to be deleted (a list or a select of ids) out of the
+    summaries, so the totals keep matching rebuild(). Run before the rows are
+    deleted, in the same transaction (caller commits).
+    """
+    totals = _contributions(db, wound_ids)
+    if not totals:
+        return
+    # One executemany UPDATE; rows that were never counted (or were rebuilt away) are left alone
+    table = AnalyticsDaily.__table__
+    same_row = (
+        (table.c.scope == bindparam("k_scope"))
+        & (table.c.scope_id == bindparam("k_scope_id"))
+        & (table.c.day == bindparam("k_day"))
+        & (table.c.wound_type == bindparam("k_wound_type"))
+    )
+    keys = [
+        {"k_scope": scope, "k_scope_id": scope_id, "k_day": day, "k_wound_type": wound_type}
+        for scope, scope_id, day, wound_type in totals
+    ]
+    db.execute(
+        update(table).where(same_row).values({column: table.c[column] - bindparam(f"d_{column}") for column in COUNTER_COLUMNS}),
+        [{**key, **{f"d_{column}": deltas.get(column, 0) for column in COUNTER_COLUMNS}} for key, deltas in zip(keys, totals.values())]
+    )
+    # Rows left at zero go, as rebuild() would never have written them
+    db.execute(delete(table).where(same_row, *[table.c[column] == 0 for column in COUNTER_COLUMNS]), keys)
+
+
+def rebuild(db: Session, batch_size: int = 1000) -> int:
+    """Recompute every summary row from the base tables; returns the number of rows written"""
+    totals = _contributions(db, batch_size=batch_size)
+    
+    db.query(AnalyticsDaily).delete(synchronize_session=False)
+    db.bulk_insert_mappings(AnalyticsDaily, [
+        {
+            "scope": scope, "scope_id": scope_id, "day": day, "wound_type": wound_type,
+            **{column: 0 for column in COUNTER_COLUMNS},
+            **{column: (value if column == "confidence_sum" else int(value)) for column, value in deltas.items()},
+        }
+        for (scope, scope_id, day, wound_type), deltas in totals.items()
+    ])
+    db.commit()
+    return len(totals)
+
+
+def _percentile(histogram: dict, fraction: float):
+    """Upper bound (ms) of the latency bucket containing the given percentile"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    threshold = total * fraction
+    running = 0
+    for bound, column in LATENCY_BUCKETS:
+        running += histogram[column]
+        if running >= threshold:
+            return bound if bound is not None else f">{LATENCY_BUCKETS[-2][0]}"
+    return None
+
+
+def summary(db: Session, scope: str, scope_id: int, days: int) -> dict:
+    """Aggregate the summary rows of one scope over the last `days` days"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = db.query(AnalyticsDaily).filter(
+        AnalyticsDaily.scope == scope,
+        AnalyticsDaily.scope_id == scope_id,
+        AnalyticsDaily.day >= since
+    ).all()
+    
+    totals = {column: 0 for column in COUNTER_COLUMNS}
+    per_week = defaultdict(int)
+    distribution = {}
+    for row in rows:
+        if row.wound_type == ALL_TYPES:
+            for column in COUNTER_COLUMNS:
+                totals[column] += getattr(row, column)
+            iso_year, iso_week, _ = row.day.isocalendar()
+            per_week[f"{iso_year}-W{iso_week:02d}"] += row.uploads
+        elif row.classifications:
+            entry = distribution.setdefault(row.wound_type, {"count": 0, "confidence_sum": 0.0})
+            entry["count"] += row.classifications
+            entry["confidence_sum"] += row.confidence_sum
+    
+    classified = totals["classifications"]
+    histogram = {column: totals[column] for _, column in LATENCY_BUCKETS}
+    return {
+        "scope": scope,
+        "scope_id": scope_id if scope != "global" else None,
+        "since": since.isoformat(),
+        "days": days,
+        "uploads": totals["uploads"],
+        "classifications": classified,
+        "recommendations": totals["recommendations"],
+        "average_confidence": round(totals["confidence_sum"] / classified, 2) if classified else None,
+        "wounds_per_week": dict(sorted(per_week.items())),
+        "wound_type_distribution": {
+            wound_type: {
+                "count": entry["count"],
+                "share": round(100.0 * entry["count"] / classified, 1) if classified else None,
+                "average_confidence": round(entry["confidence_sum"] / entry["count"], 2),
+            }
+            for wound_type, entry in sorted(distribution.items(), key=lambda item: -item[1]["count"])
+        },
+        "processing_time_ms": {
+            "average": round(totals["processing_ms_sum"] / classified) if classified else None,
+            "p50": _percentile(histogram, 0.5),
+            "p90": _percentile(histogram, 0.9),
+            "p99": _percentile(histogram, 0.99),
+            "histogram": {column[len("latency_"):]: count for column, count in histogram.items()},
+        },
+    }
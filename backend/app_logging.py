@@ -0,0 +1,196 @@
+"""
+Structured logging that never blocks the event loop.
+
+Records go into a bounded in-memory queue (QueueHandler) and are written
+by a background QueueListener thread, so a slow stdout/log collector
+delays the log output, not the requests. When the queue is full, records
+are dropped and counted rather than waited on.
+
+LOG_FORMAT=json emits one JSON object per line with the request id and any
+`extra=` fields; LOG_FORMAT=text is a readable variant for development.
+
+`RequestLoggingMiddleware` assigns each request an id
+(X-Request-ID in and out), tags every log record emitted while handling it,
+and logs method/route/status/latency. Requests below 400 are sampled at
+LOG_SUCCESS_SAMPLE_RATE; errors and requests slower than
+LOG_SLOW_REQUEST_MS are always logged.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from config import config
+
+request_id_var = ContextVar("request_id", default=None)
+
+logger = logging.getLogger("wound_care.requests")
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "request_id"}
+
+_handler = None
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+def _extra_fields(record) -> dict:
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{datetime.fromtimestamp(record.created):%H:%M:%S} {record.levelname:<7} {record.getMessage()}"
+        fields = _extra_fields(record)
+        if record.request_id:
+            fields = {"request_id": record.request_id, **fields}
+        if fields:
+            line += "  " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback now (arguments may change after this
+        # returns) but leave the JSON/text formatting to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure(log_format: str = None, stream=None):
+    """Route the root logger through the queue; safe to call more than once"""
+    global _handler, _listener
+    if _listener is not None:
+        return
+    log_format = log_format or config.LOG_FORMAT
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE))
+    _handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(config.LOG_LEVEL.upper())
+    # Our request log replaces uvicorn's access log (also synchronous)
+    logging.getLogger("uvicorn.access").disabled = True
+
+    _listener = QueueListener(_handler.queue, output)
+    _listener.start()
+    atexit.register(shutdown)  # The listener thread is a daemon: flush what is queued on exit
+
+
+def shutdown():
+    """Flush queued records (app shutdown)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler else 0
+
+
+def _log_request(scope, status: int, duration_ms: float, failed: bool):
+    if status < 400 and duration_ms < config.LOG_SLOW_REQUEST_MS and random.random() >= config.LOG_SUCCESS_SAMPLE_RATE:
+        return
+    level = logging.ERROR if status >= 500 else logging.WARNING if status >= 400 else logging.INFO
+    route = scope.get("route")
+    logger.log(level, "%s %s %s", scope["method"], scope["path"], status, extra={
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": getattr(route, "path", None) or scope["path"],  # Template, e.g. /api/cases/{case_id}/trajectory
+        "status": status,
+        "duration_ms": round(duration_ms, 2),
+    }, exc_info=failed)
+
+
+class RequestLoggingMiddleware:
+    """
+    ASGI middleware: request id (X-Request-ID in and out) + one sampled
+    structured line per request. Plain ASGI rather than @app.middleware("http"),
+    whose call_next machinery costs more per request than the logging itself.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status, failed = 500, False
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _log_request(scope, status, (time.perf_counter() - started) * 1000, failed)
+            request_id_var.reset(token)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the database engine profiles.
+
+Simulates concurrent uploads (short write transactions) mixed with history
+reads against a scratch SQLite file, once per profile, and reports
+throughput and "database is locked" failures.
+
+    python bench_db_engine.py [--threads 16] [--ops 200]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from database import Base, Wound, create_db_engine, describe_engine
+
+
+def run_profile(profile: str, threads: int, ops: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db_engine = create_db_engine(f"sqlite:///{path}", profile=profile)
+    Base.metadata.create_all(bind=db_engine)
+    Session = sessionmaker(bind=db_engine)
+    
+    stats = {"writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+    
+    def worker(worker_id: int):
+        for i in range(ops):
+            db = Session()
+            try:
+                if i % 4 == 0:
+                    # Upload-like write transaction
+                    db.add(Wound(user_id=worker_id, image_path=f"bench_{worker_id}_{i}.jpg", status="pending"))
+                    db.flush()
+                    db.query(Wound).filter(Wound.user_id == worker_id).count()
+                    db.commit()
+                    key = "writes"
+                else:
+                    # History-like read
+                    db.query(Wound).filter(Wound.user_id == worker_id).order_by(Wound.upload_date.desc()).limit(50).all()
+                    key = "reads"
+                with lock:
+                    stats[key] += 1
+            except OperationalError as e:
+                db.rollback()
+                if "locked" in str(e):
+                    with lock:
+                        stats["locked"] += 1
+                else:
+                    raise
+            finally:
+                db.close()
+    
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    
+    settings = describe_engine(db_engine)
+    db_engine.dispose()
+    return {
+        "profile": profile,
+        "journal_mode": settings.get("journal_mode"),
+        "elapsed_s": round(elapsed, 2),
+        "ops_per_s": round((stats["writes"] + stats["reads"]) / elapsed, 1),
+        **stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQLite engine profiles under concurrent load")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200, help="Operations per thread")
+    args = parser.parse_args()
+    
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  threads={args.threads} ops/thread={args.ops}")
+    for profile in ("default", "tuned"):
+        result = run_profile(profile, args.threads, args.ops)
+        print(" | ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
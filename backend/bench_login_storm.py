@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Login-storm benchmark for password hashing.
+
+Starts the API (uvicorn, one worker) against a scratch SQLite database,
+fires concurrent /api/login requests, and meanwhile probes /health to see
+how much a burst of bcrypt work delays unrelated requests. Runs once with
+hashing on the event loop (PASSWORD_HASH_WORKERS=0, the old behaviour) and
+once with the hashing pool.
+
+    python bench_login_storm.py [--logins 200] [--concurrency 32] [--workers 2] [--rounds 12]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+from passlib.context import CryptContext
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _wait_until_up(client: httpx.AsyncClient, base_url: str):
+    for _ in range(200):
+        try:
+            if (await client.get(f"{base_url}/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def _probe(client: httpx.AsyncClient, base_url: str, latencies: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(f"{base_url}/health")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.02)
+
+
+async def _storm(client: httpx.AsyncClient, base_url: str, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def login():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(f"{base_url}/api/login", json={"email": EMAIL, "password": PASSWORD})
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    return {"elapsed_s": elapsed, "latencies": latencies, "failures": failures}
+
+
+async def _measure(base_url: str, logins: int, concurrency: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency + 4)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await _wait_until_up(client, base_url)
+
+        baseline, stop = [], asyncio.Event()
+        probe = asyncio.create_task(_probe(client, base_url, baseline, stop))
+        await asyncio.sleep(1.0)
+        stop.set()
+        await probe
+
+        during, stop = [], asyncio.Event()
+        probe = asyncio.create_task(_probe(client, base_url, during, stop))
+        storm = await _storm(client, base_url, logins, concurrency)
+        stop.set()
+        await probe
+
+    return {
+        "logins_per_s": round(logins / storm["elapsed_s"], 1),
+        "login_p50_ms": round(statistics.median(storm["latencies"]), 1),
+        "login_failures": storm["failures"],
+        "health_idle_p50_ms": round(statistics.median(baseline), 1),
+        "health_storm_p50_ms": round(statistics.median(during), 1) if during else None,
+        "health_storm_p95_ms": round(_percentile(during, 0.95), 1),
+        "health_storm_max_ms": round(max(during), 1) if during else None,
+    }
+
+
+def run_mode(label: str, workers: int, rounds: int, logins: int, concurrency: int) -> dict:
+    scratch = tempfile.mkdtemp()
+    db_path = os.path.join(scratch, "bench.db")
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "UPLOAD_DIR": os.path.join(scratch, "uploads"),
+        "PASSWORD_HASH_WORKERS": str(workers),
+        "BCRYPT_ROUNDS": str(rounds),
+        "MAINTENANCE_INTERVAL_SECONDS": "0",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    try:
+        # Wait for startup to create the schema, then add the storm user directly
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                with sqlite3.connect(db_path) as conn:
+                    conn.execute("SELECT 1 FROM users LIMIT 1")
+                break
+            except sqlite3.Error:
+                time.sleep(0.1)
+        password_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).hash(PASSWORD)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(
+                "INSERT INTO users (name, email, password_hash, email_verified, created_at) VALUES (?, ?, ?, 1, ?)",
+                ("Storm", EMAIL, password_hash, datetime.utcnow().isoformat(" "))
+            )
+        return {"mode": label, **asyncio.run(_measure(f"http://127.0.0.1:{port}", logins, concurrency))}
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure request latency during a burst of logins")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2, help="Hashing pool size for the pooled run")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor")
+    args = parser.parse_args()
+
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  logins={args.logins} concurrency={args.concurrency} rounds={args.rounds}")
+    for label, workers in (("on-loop", 0), (f"pool({args.workers})", args.workers)):
+        result = run_mode(label, workers, args.rounds, args.logins, args.concurrency)
+        print(" | ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of the request-logging middleware.
+
+Drives a trivial endpoint in-process (httpx ASGITransport) with no logging,
+with the old two-print() middleware, and with app_logging's
+RequestLoggingMiddleware at full and reduced sampling. Log output goes to a
+sink that can be made slow (--sink-delay-us per write) to mimic a
+back-pressured stdout pipe.
+
+    python bench_request_logging.py [--requests 5000] [--sink-delay-us 0] [--sample-rate 0.1]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+from datetime import datetime
+
+import httpx
+from fastapi import FastAPI
+
+import app_logging
+from config import config
+
+
+class SlowSink:
+    """File-like sink that takes `delay_us` per write (0 = just discard)"""
+
+    def __init__(self, delay_us: float):
+        self.delay = delay_us / 1_000_000
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+async def print_middleware(request, call_next):
+    # The middleware main.py used before app_logging
+    print(f"Incoming request: {request.method} {request.url}")
+    response = await call_next(request)
+    print(f"Response status: {response.status_code}")
+    return response
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+    if middleware is print_middleware:
+        app.middleware("http")(middleware)
+    elif middleware is not None:
+        app.add_middleware(middleware)
+
+    @app.get("/ping/{item_id}")
+    async def ping(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+async def _drive(app: FastAPI, requests: int) -> list:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(50):
+            await client.get(f"/ping/{i}")  # Warm-up
+        for i in range(requests):
+            started = time.perf_counter()
+            await client.get(f"/ping/{i}")
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+    return latencies
+
+
+def run_mode(label: str, middleware, requests: int, sink: SlowSink, sample_rate: float = 1.0) -> dict:
+    config.LOG_SUCCESS_SAMPLE_RATE = sample_rate
+    dropped_before = app_logging.dropped_records()
+    with contextlib.redirect_stdout(sink):
+        latencies = asyncio.run(_drive(build_app(middleware), requests))
+    return {
+        "mode": label,
+        "mean_us": round(statistics.mean(latencies), 1),
+        "p50_us": round(statistics.median(latencies), 1),
+        "p99_us": round(sorted(latencies)[int(len(latencies) * 0.99)], 1),
+        "dropped": app_logging.dropped_records() - dropped_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure request-logging middleware overhead")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sink-delay-us", type=float, default=0, help="Simulated cost of each write to stdout")
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="LOG_SUCCESS_SAMPLE_RATE for the sampled run")
+    args = parser.parse_args()
+
+    sink = SlowSink(args.sink_delay_us)
+    app_logging.configure("json", stream=sink)
+
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  requests={args.requests} sink_delay_us={args.sink_delay_us}")
+    modes = [
+        ("none", None, 1.0),
+        ("print", print_middleware, 1.0),
+        ("queued", app_logging.RequestLoggingMiddleware, 1.0),
+        (f"queued@{args.sample_rate}", app_logging.RequestLoggingMiddleware, args.sample_rate),
+    ]
+    baseline = None
+    for label, middleware, sample_rate in modes:
+        result = run_mode(label, middleware, args.requests, sink, sample_rate)
+        baseline = baseline if baseline is not None else result["mean_us"]
+        result["overhead_us"] = round(result["mean_us"] - baseline, 1)
+        print(" | ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
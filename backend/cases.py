@@ -0,0 +1,52 @@
+"""
+Maintenance of the denormalized per-case wound counters
+(Case.wound_count, Case.latest_wound_id, Case.latest_upload_date).
+
+All updates are single set-based statements that run inside the caller's
+transaction, so the counters commit or roll back together with the wound rows.
+"""
+
+from sqlalchemy import case as sql_case, func, select, update
+from sqlalchemy.orm import Session
+from database import Case, Wound
+
+
+def record_upload(db: Session, wound: Wound):
+    """Bump counters for a freshly flushed wound (caller commits)"""
+    if not wound.case_id:
+        return
+    
+    is_latest = (Case.latest_upload_date.is_(None)) | (Case.latest_upload_date <= wound.upload_date)
+    db.execute(
+        update(Case)
+        .where(Case.id == wound.case_id)
+        .values(
+            wound_count=func.coalesce(Case.wound_count, 0) + 1,
+            latest_wound_id=sql_case((is_latest, wound.id), else_=Case.latest_wound_id),
+            latest_upload_date=sql_case((is_latest, wound.upload_date), else_=Case.latest_upload_date),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refresh_counters(db: Session, case_ids=None):
+    """Recompute counters from the wounds table for the given cases (or all cases)"""
+    case_wounds = select(Wound.id).where(Wound.case_id == Case.id)
+    statement = update(Case).values(
+        wound_count=select(func.count(Wound.id)).where(Wound.case_id == Case.id).scalar_subquery(),
+        latest_wound_id=case_wounds.order_by(Wound.upload_date.desc(), Wound.id.desc()).limit(1).scalar_subquery(),
+        latest_upload_date=select(func.max(Wound.upload_date)).where(Wound.case_id == Case.id).scalar_subquery(),
+    )
+    if case_ids is not None:
+        case_ids = [cid for cid in case_ids if cid]
+        if not case_ids:
+            return
+        statement = statement.where(Case.id.in_(case_ids))
+    db.execute(statement.execution_options(synchronize_session=False))
+
+
+def backfill(db: Session) -> int:
+    """Populate counters for every existing case; returns the number of cases"""
+    refresh_counters(db)
+    db.commit()
+    return db.query(func.count(Case.id)).scalar()
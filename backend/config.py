@@ -9,16 +9,103 @@ class Config:
     
     # Database
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./wound_care.db")
+    AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"  # Apply pending migrations on startup
+
+    # Large JSON columns (analysis, recommendation details): zlib-compress values at least this big
+    COMPACT_JSON = os.getenv("COMPACT_JSON", "true").lower() == "true"
+    COMPACT_JSON_MIN_BYTES = int(os.getenv("COMPACT_JSON_MIN_BYTES", 256))
+
+    # Read replicas (comma-separated URLs) serving GET endpoints; empty = everything on the primary
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))  # Reads stay on the primary this long after a user's write
+    # Where those windows live: "sqlite" (a file shared by every worker on the host) or "memory" (per worker)
+    REPLICA_STICKY_STORE = os.getenv("REPLICA_STICKY_STORE", "sqlite")
+    REPLICA_STICKY_PATH = os.getenv("REPLICA_STICKY_PATH", "./replica_sticky.db")
+
+    # Engine profile: "tuned" applies the settings below, "default" uses SQLAlchemy/driver defaults
+    DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+    
+    # SQLite (applied as PRAGMAs on every new connection)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 10000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))  # 64MB page cache per connection
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))  # 256MB memory-mapped I/O
+    
+    # PostgreSQL connection pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+    DB_LOCK_TIMEOUT_MS = int(os.getenv("DB_LOCK_TIMEOUT_MS", 10000))
     
     # Server
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
     
+    # Logging (see app_logging.py)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" (one object per line) or "text"
+    LOG_SUCCESS_SAMPLE_RATE = float(os.getenv("LOG_SUCCESS_SAMPLE_RATE", 1.0))  # Share of <400 requests logged
+    LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", 1000))  # Always logged, like errors
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # Records beyond this are dropped, not waited on
+
+    # Prometheus-format metrics at /metrics (see metrics.py)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Per-request SQL statement stats (see query_stats.py)
+    QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "true").lower() == "true"
+    QUERY_DEBUG_HEADERS = os.getenv("QUERY_DEBUG_HEADERS", "false").lower() == "true"  # X-DB-Queries + Server-Timing on responses (dev only)
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))  # One statement shape run more often per request = N+1 warning
+
+    # Admin endpoints (/api/admin/...) and on-demand profiling need this in X-Admin-Token; empty = disabled
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+    # Request profiling (see profiling.py)
+    PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", 0))  # Profile every Nth request; 0 = only on request
+    PROFILE_CLOCK = os.getenv("PROFILE_CLOCK", "wall")  # For sampled requests: "wall" or "cpu"
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))  # Oldest profiles are deleted beyond this
+
     # File Upload
     UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
     MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10485760))  # 10MB
     ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png"}
     
+    # Local image comparison (process pool size for wound_metrics)
+    METRICS_WORKERS = int(os.getenv("METRICS_WORKERS", 2))  # 0 = a thread in the server process
+    
+    # Response cache for read endpoints: "memory", "sqlite" (shared by workers) or "none"
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "./response_cache.db")
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2000))
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300))
+
+    # Password hashing (see password_hasher.py); raising BCRYPT_ROUNDS upgrades stored hashes on next login
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))  # 0 = hash on the event loop
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))  # Queued + running per worker process
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 5))  # Seconds to wait for a slot
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))  # Seconds per hash/verify
+
+    # Session-token cache for verify_session / current_user (see session_cache.py)
+    SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE_ENABLED", "true").lower() == "true"
+    SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", 10000))
+    SESSION_CACHE_TTL_SECONDS = int(os.getenv("SESSION_CACHE_TTL_SECONDS", 120))
+    # Cross-worker invalidation: "sqlite" (shared file polled by workers) or "none" (single worker only:
+    # a token revoked on one worker would stay valid on the others for up to the TTL)
+    SESSION_CACHE_CHANNEL = os.getenv("SESSION_CACHE_CHANNEL", "sqlite")
+    SESSION_CACHE_CHANNEL_PATH = os.getenv("SESSION_CACHE_CHANNEL_PATH", "./session_invalidations.db")
+    SESSION_CACHE_SYNC_SECONDS = float(os.getenv("SESSION_CACHE_SYNC_SECONDS", 1.0))
+
+    # Retention: purge expired sessions/OTPs, archive superseded classifications (see maintenance.py)
+    MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", 3600))  # 0 = no in-process scheduler
+    MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", 1000))  # Rows per transaction
+    MAINTENANCE_MAX_BATCHES = int(os.getenv("MAINTENANCE_MAX_BATCHES", 50))  # Per job per scheduled run
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 30))  # Keep superseded rows hot this long
+
     # Email/SMTP Configuration (kept for reference, no longer used on Render)
     SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
     SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
@@ -31,6 +118,19 @@ class Config:
     # Resend API (used for production email delivery — works on Render free tier)
     RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
     RESEND_FROM_EMAIL = os.getenv("RESEND_FROM_EMAIL", "Surgical Wound Care <onboarding@resend.dev>")
+    RESEND_API_URL = os.getenv("RESEND_API_URL", "https://api.resend.com/emails")  # Point at fake_resend.py for local testing
+
+    # Email outbox dispatcher (see email_outbox.py)
+    EMAIL_DISPATCHER_ENABLED = os.getenv("EMAIL_DISPATCHER_ENABLED", "true").lower() == "true"
+    EMAIL_DISPATCH_CONCURRENCY = int(os.getenv("EMAIL_DISPATCH_CONCURRENCY", 8))  # Parallel sends (also keep-alive connections)
+    EMAIL_DISPATCH_BATCH_SIZE = int(os.getenv("EMAIL_DISPATCH_BATCH_SIZE", 50))
+    EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", 5))  # Idle poll; new rows in this worker wake it at once
+    EMAIL_SEND_TIMEOUT = float(os.getenv("EMAIL_SEND_TIMEOUT", 20))
+    EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", 60))  # A claimed row is retried after this if its worker died
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 8))  # Then the row is dead-lettered
+    EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 2))
+    EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", 600))
+    EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 7))  # Sent/dead rows are purged by maintenance
 
     
     # CORS
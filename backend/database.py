@@ -1,11 +1,68 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON
+from sqlalchemy import create_engine, event, text, Select, Column, Integer, String, Float, Date, DateTime, Text, Boolean, ForeignKey, JSON, LargeBinary, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, relationship, deferred, Session as OrmSession
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 from config import config
+from fastapi import Request
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import weakref
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # Only needed to read values older versions wrote as msgpack
+    msgpack = None
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# First byte of a compressed CompactJSON value; anything else is plain JSON text
+_ZLIB_JSON = b"\x01"
+_ZLIB_MSGPACK = b"\x02"  # Read-only: no longer written, every worker must be able to decode what others write
+
+
+class CompactJSON(TypeDecorator):
+    """
+    JSON stored as bytes. Values of COMPACT_JSON_MIN_BYTES or more are written
+    as zlib-compressed JSON behind a one-byte format tag; smaller ones stay
+    plain JSON. Reads accept every format, including rows written as JSON text
+    before the column switched types and zlib+msgpack rows from earlier builds.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        data = json.dumps(value, separators=(",", ":")).encode()
+        if not config.COMPACT_JSON or len(data) < config.COMPACT_JSON_MIN_BYTES:
+            return data
+        return _ZLIB_JSON + zlib.compress(data)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, (dict, list)):
+            return value  # Driver already decoded a native JSON column (pre-migration)
+        if isinstance(value, str):
+            return json.loads(value)
+        value = bytes(value)
+        tag = value[:1]
+        if tag == _ZLIB_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("msgpack is required to read this column (pip install msgpack)")
+            return msgpack.unpackb(zlib.decompress(value[1:]))
+        if tag == _ZLIB_JSON:
+            return json.loads(zlib.decompress(value[1:]))
+        return json.loads(value)
+
+
 class User(Base):
     __tablename__ = "users"
     
@@ -29,6 +86,9 @@ class User(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        Index("ix_sessions_expires_at", "expires_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -41,6 +101,9 @@ class Session(Base):
 
 class EmailVerificationOTP(Base):
     __tablename__ = "email_verification_otps"
+    __table_args__ = (
+        Index("ix_otps_email_code_verified", "email", "otp_code", "verified"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(100), index=True, nullable=False)
@@ -50,8 +113,34 @@ class EmailVerificationOTP(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_due", "status", "next_attempt_at"),
+    )
+
+    # Written in the same transaction as the OTP it delivers; sent by email_outbox.py
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(30), nullable=False)  # "otp", "password_reset"
+    to_email = Column(String(100), nullable=False)
+    subject = Column(String(255), nullable=False)
+    html_body = Column(Text, nullable=False)
+    text_body = Column(Text, nullable=False)
+    status = Column(String(20), default="pending", nullable=False)  # pending, sent, dead
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Also the lease while a worker sends it
+    claim_token = Column(String(32))
+    last_error = Column(Text)
+    provider_id = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+
 class Case(Base):
     __tablename__ = "cases"
+    __table_args__ = (
+        Index("ix_cases_user_created", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -59,12 +148,21 @@ class Case(Base):
     description = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    # Denormalized wound counters, maintained by upload/delete (see cases.py)
+    wound_count = Column(Integer, default=0, nullable=False)
+    latest_wound_id = Column(Integer)  # Plain pointer, no FK so wound deletes don't need ordering
+    latest_upload_date = Column(DateTime)
+    
     user = relationship("User", back_populates="cases")
     wounds = relationship("Wound", back_populates="case")
 
 
 class Wound(Base):
     __tablename__ = "wounds"
+    __table_args__ = (
+        Index("ix_wounds_user_upload", "user_id", "upload_date", "id"),
+        Index("ix_wounds_case_upload", "case_id", "upload_date", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -83,7 +181,8 @@ class Wound(Base):
     discharge_type = Column(String(50))
     edge_quality = Column(Integer)
     tissue_composition = Column(JSON)
-    analysis = Column(JSON)  # Full analysis JSON
+    analysis = deferred(Column(CompactJSON))  # Full analysis JSON, only loaded where a route needs it
+    image_sha256 = Column(String(64))  # Content hash, used as part of comparison cache keys
     
     user = relationship("User", back_populates="wounds")
     case = relationship("Case", back_populates="wounds")
@@ -111,43 +210,429 @@ class Recommendation(Base):
     id = Column(Integer, primary_key=True, index=True)
     classification_id = Column(Integer, ForeignKey("classifications.id"), index=True)
     summary = Column(Text, nullable=False)
-    cleaning_instructions = Column(JSON)
-    dressing_recommendations = Column(JSON)
-    medication_suggestions = Column(JSON)
+    # Instruction lists: deferred as one group, loaded only where a route needs them
+    cleaning_instructions = deferred(Column(CompactJSON), group="details")
+    dressing_recommendations = deferred(Column(CompactJSON), group="details")
+    medication_suggestions = deferred(Column(CompactJSON), group="details")
     expected_healing_time = Column(String(100))
-    follow_up_schedule = Column(JSON)
-    warning_signs = Column(JSON)
-    when_to_seek_help = Column(JSON)
-    diet_advice = Column(JSON)
-    activity_restrictions = Column(JSON)
+    follow_up_schedule = deferred(Column(CompactJSON), group="details")
+    warning_signs = deferred(Column(CompactJSON), group="details")
+    when_to_seek_help = deferred(Column(CompactJSON), group="details")
+    diet_advice = deferred(Column(CompactJSON), group="details")
+    activity_restrictions = deferred(Column(CompactJSON), group="details")
     ai_confidence = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     classification = relationship("Classification", back_populates="recommendations")
 
 
+class ClassificationArchive(Base):
+    __tablename__ = "classifications_archive"
+    
+    # Superseded classifications moved out of the hot table (see maintenance.py); ids are preserved
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    wound_id = Column(Integer, index=True)
+    wound_type = Column(String(100), nullable=False)
+    confidence = Column(Float, nullable=False)
+    all_probabilities = Column(JSON)
+    processing_time_ms = Column(Integer)
+    timestamp = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RecommendationArchive(Base):
+    __tablename__ = "recommendations_archive"
+    
+    # Superseded recommendations (see maintenance.py); wound_id denormalized for deletes and stats rebuilds
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    classification_id = Column(Integer, index=True)
+    wound_id = Column(Integer, index=True)
+    summary = Column(Text, nullable=False)
+    cleaning_instructions = Column(CompactJSON)
+    dressing_recommendations = Column(CompactJSON)
+    medication_suggestions = Column(CompactJSON)
+    expected_healing_time = Column(String(100))
+    follow_up_schedule = Column(CompactJSON)
+    warning_signs = Column(CompactJSON)
+    when_to_seek_help = Column(CompactJSON)
+    diet_advice = Column(CompactJSON)
+    activity_restrictions = Column(CompactJSON)
+    ai_confidence = Column(Integer)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Comparison(Base):
     __tablename__ = "comparisons"
+    __table_args__ = (
+        Index("ix_comparisons_wound_pair", "wound_id_before", "wound_id_after"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     case_id = Column(Integer, ForeignKey("cases.id"))
     wound_id_before = Column(Integer, ForeignKey("wounds.id"))
     wound_id_after = Column(Integer, ForeignKey("wounds.id"))
-    analysis = Column(JSON)
+    analysis = Column(CompactJSON)
+    metrics = Column(JSON)  # Local image-diff metrics (wound_metrics)
+    # sha256(before image hash, after image hash, prompt version); NULL for manually saved rows
+    cache_key = Column(String(64))
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class CaseTrajectory(Base):
+    __tablename__ = "case_trajectories"
+    
+    # One row per case, maintained incrementally as wounds are classified
+    case_id = Column(Integer, ForeignKey("cases.id"), primary_key=True)
+    points = Column(JSON, default=list)  # Time-ordered per-wound snapshots
+    point_count = Column(Integer, default=0)
+    first_date = Column(DateTime)
+    last_date = Column(DateTime)
+    latest_severity = Column(Float)
+    ema_severity = Column(Float)
+    ema_tissue = Column(JSON)
+    
+    # Running sums for the least-squares severity slope (t in days since first_date)
+    sum_t = Column(Float, default=0.0)
+    sum_y = Column(Float, default=0.0)
+    sum_tt = Column(Float, default=0.0)
+    sum_ty = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class WoundSearchIndex(Base):
+    __tablename__ = "wound_search_index"
+    __table_args__ = (
+        Index("ix_wound_search_user_date", "user_id", "upload_date"),
+        Index("ix_wound_search_user_type_date", "user_id", "final_wound_type", "upload_date"),
+        Index("ix_wound_search_case_type", "case_id", "final_wound_type"),
+        Index("ix_wound_search_user_black", "user_id", "tissue_black"),
+        Index("ix_wound_search_user_slough", "user_id", "tissue_yellow"),
+        Index("ix_wound_search_user_severity", "user_id", "severity_score"),
+    )
+    
+    # Typed copy of the key analysis fields, written at classification time (see search_index.py)
+    wound_id = Column(Integer, ForeignKey("wounds.id"), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    case_id = Column(Integer)
+    upload_date = Column(DateTime, nullable=False)
+    final_wound_type = Column(String(100))
+    severity_score = Column(Float)
+    tissue_pink = Column(Float)
+    tissue_red = Column(Float)
+    tissue_yellow = Column(Float)
+    tissue_black = Column(Float)
+    tissue_white = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AnalyticsDaily(Base):
+    __tablename__ = "analytics_daily"
+    __table_args__ = (
+        UniqueConstraint("scope", "scope_id", "day", "wound_type", name="uq_analytics_daily_bucket"),
+    )
+    
+    # Incrementally maintained summary rows (see analytics.py)
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(10), nullable=False)  # "global", "user" or "case"
+    scope_id = Column(Integer, nullable=False)  # 0 for global
+    day = Column(Date, nullable=False)
+    wound_type = Column(String(100), nullable=False)  # "*" for all-type totals
+    uploads = Column(Integer, default=0, nullable=False)
+    classifications = Column(Integer, default=0, nullable=False)
+    recommendations = Column(Integer, default=0, nullable=False)
+    confidence_sum = Column(Float, default=0.0, nullable=False)
+    processing_ms_sum = Column(Integer, default=0, nullable=False)
+    # Classification latency histogram (Gemini processing_time_ms)
+    latency_le_1s = Column(Integer, default=0, nullable=False)
+    latency_le_2s = Column(Integer, default=0, nullable=False)
+    latency_le_5s = Column(Integer, default=0, nullable=False)
+    latency_le_10s = Column(Integer, default=0, nullable=False)
+    latency_le_20s = Column(Integer, default=0, nullable=False)
+    latency_gt_20s = Column(Integer, default=0, nullable=False)
+
+
 # Database setup
-engine = create_engine(config.DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in config.DATABASE_URL else {})
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+# Settings each engine was actually built with, reported by describe_engine
+_engine_settings = weakref.WeakKeyDictionary()
+
+
+def _pool_options(profile: str) -> dict:
+    """Pool arguments for server databases; the default profile passes SQLAlchemy's own defaults explicitly"""
+    if profile != "tuned":
+        return {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30, "pool_recycle": -1, "pool_pre_ping": False}
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def _remember(db_engine, settings: dict):
+    _engine_settings[getattr(db_engine, "sync_engine", db_engine)] = settings
+    return db_engine
+
+
+def create_db_engine(url: str, profile: str = None):
+    """Build an engine for `url` using the configured (or given) profile"""
+    profile = profile or config.DB_PROFILE
+    
+    if url.startswith("sqlite"):
+        if profile != "tuned":
+            return _remember(create_engine(url, connect_args={"check_same_thread": False}), {"profile": profile})
+        db_engine = create_engine(url, connect_args={
+            "check_same_thread": False,
+            "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        })
+        event.listen(db_engine, "connect", _apply_sqlite_pragmas)
+        return _remember(db_engine, {"profile": profile})
+    
+    pool_options = _pool_options(profile)
+    if profile != "tuned":
+        return _remember(create_engine(url, **pool_options), {"profile": profile, **pool_options})
+    
+    connect_args = {}
+    if url.startswith("postgresql"):
+        connect_args["options"] = (
+            f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS} -c lock_timeout={config.DB_LOCK_TIMEOUT_MS}"
+        )
+    return _remember(create_engine(url, **pool_options, connect_args=connect_args), {"profile": profile, **pool_options})
+
+
+def describe_engine(db_engine=None) -> dict:
+    """Settings an engine was built with, plus what the database reports back where possible"""
+    db_engine = db_engine or engine
+    settings = _engine_settings.get(db_engine, {})
+    report = {
+        "dialect": db_engine.dialect.name,
+        "profile": settings.get("profile", "unknown"),
+        "pool": db_engine.pool.status(),
+    }
+    with db_engine.connect() as conn:
+        if db_engine.dialect.name == "sqlite":
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size"):
+                report[pragma] = conn.execute(text(f"PRAGMA {pragma}")).scalar()
+        elif db_engine.dialect.name == "postgresql":
+            for setting in ("statement_timeout", "lock_timeout", "max_connections"):
+                report[setting] = conn.execute(text(f"SHOW {setting}")).scalar()
+    report.update({key: value for key, value in settings.items() if key != "profile"})
+    return report
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
+def create_async_db_engine(url: str, profile: str = None):
+    """Async counterpart of create_db_engine with the same profile settings"""
+    profile = profile or config.DB_PROFILE
+    url = async_database_url(url)
+    
+    if url.startswith("sqlite"):
+        if profile != "tuned":
+            return _remember(create_async_engine(url, connect_args={"check_same_thread": False}), {"profile": profile})
+        db_engine = create_async_engine(url, connect_args={
+            "check_same_thread": False,
+            "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        })
+        event.listen(db_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        return _remember(db_engine, {"profile": profile})
+    
+    pool_options = _pool_options(profile)
+    if profile != "tuned":
+        return _remember(create_async_engine(url, **pool_options), {"profile": profile, **pool_options})
+    
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        connect_args["server_settings"] = {
+            "statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS),
+            "lock_timeout": str(config.DB_LOCK_TIMEOUT_MS),
+        }
+    return _remember(create_async_engine(url, **pool_options, connect_args=connect_args), {"profile": profile, **pool_options})
+
+
+# Sync engine: migrations, CLI commands and streaming exports (run in worker threads)
+engine = create_db_engine(config.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
-    db = SessionLocal()
-    try:
+# Async engine: request handlers, so DB waits never block the event loop
+async_engine = create_async_db_engine(config.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Read replicas: async engines for request handlers, sync ones for streaming exports
+replica_engines = [create_db_engine(url) for url in config.DATABASE_REPLICA_URLS]
+async_replica_engines = [create_async_db_engine(url) for url in config.DATABASE_REPLICA_URLS]
+
+
+class RoutingSession(OrmSession):
+    """
+    Sync session behind the read AsyncSession: plain SELECTs go to one replica
+    (picked once per session), flushes and any other statement go to the
+    primary. Once a session touches the primary, or has info["primary"] set,
+    it stays there so it always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("primary") or self._flushing or not isinstance(clause, Select):
+            self.info["primary"] = True
+            return async_engine.sync_engine
+        if "replica" not in self.info:
+            self.info["replica"] = random.randrange(len(async_replica_engines))
+        return async_replica_engines[self.info["replica"]].sync_engine
+
+
+AsyncReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
+class MemoryStickiness:
+    """Sticky windows in this worker's memory: a request served by another worker may read a replica"""
+
+    def __init__(self):
+        self._until = {}
+
+    def mark(self, keys, until: float):
+        now = time.time()
+        if len(self._until) > 10000:
+            for key in [key for key, deadline in self._until.items() if deadline < now]:
+                del self._until[key]
+        for key in keys:
+            self._until[key] = until
+
+    def active(self, keys) -> bool:
+        now = time.time()
+        return any(self._until.get(key, 0) >= now for key in keys)
+
+
+class SQLiteStickiness:
+    """Sticky windows in a local SQLite file, so every worker on the host honours them"""
+
+    # Drop expired windows roughly every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS sticky_reads (key TEXT PRIMARY KEY, until REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def mark(self, keys, until: float):
+        conn = self._conn()
+        conn.executemany("INSERT OR REPLACE INTO sticky_reads (key, until) VALUES (?, ?)", [(key, until) for key in keys])
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM sticky_reads WHERE until < ?", (time.time(),))
+
+    def active(self, keys) -> bool:
+        keys = list(keys)
+        if not keys:
+            return False
+        row = self._conn().execute(
+            f"SELECT 1 FROM sticky_reads WHERE key IN ({', '.join('?' * len(keys))}) AND until >= ? LIMIT 1",
+            (*keys, time.time())
+        ).fetchone()
+        return row is not None
+
+
+_stickiness = None
+_stickiness_lock = threading.Lock()
+
+
+def get_stickiness():
+    global _stickiness
+    if _stickiness is None:
+        with _stickiness_lock:
+            if _stickiness is None:
+                if config.REPLICA_STICKY_STORE == "sqlite":
+                    _stickiness = SQLiteStickiness(config.REPLICA_STICKY_PATH)
+                else:
+                    _stickiness = MemoryStickiness()
+    return _stickiness
+
+
+def _sticky_keys(user_id=None, case_id=None):
+    if user_id is not None:
+        yield f"user:{user_id}"
+    if case_id is not None:
+        yield f"case:{case_id}"
+
+
+def mark_primary_sticky(user_id, case_id=None):
+    """
+    Pin reads of this user (and of this case, for routes keyed by case_id
+    alone) to the primary for REPLICA_STICKY_SECONDS. Call after a write.
+    """
+    if not async_replica_engines:
+        return
+    keys = list(_sticky_keys(user_id, case_id))
+    if keys:
+        get_stickiness().mark(keys, time.time() + config.REPLICA_STICKY_SECONDS)
+
+
+def use_replica(user_id=None, case_id=None) -> bool:
+    """Whether reads for this user / case may be served by a replica right now"""
+    if not async_replica_engines:
+        return False
+    return not get_stickiness().active(_sticky_keys(user_id, case_id))
+
+
+def replica_session():
+    """Sync session on a random replica (primary when none are configured)"""
+    if not replica_engines:
+        return SessionLocal()
+    return SessionLocal(bind=random.choice(replica_engines))
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def get_read_db(request: Request):
+    """
+    Session for read-only endpoints: routed to a replica unless the caller
+    (the `user_id` query parameter) or the case in the path (`case_id`)
+    was written within the sticky window
+    """
+    if use_replica(request.query_params.get("user_id"), request.path_params.get("case_id")):
+        async with AsyncReadSessionLocal() as db:
+            yield db
+    else:
+        async with AsyncSessionLocal() as db:
+            yield db
 
 def init_db():
     Base.metadata.create_all(bind=engine)
-    print("Database initialized successfully!")
+    if config.AUTO_MIGRATE:
+        import migrations
+        migrations.run_migrations(engine)
+    logger.info("Database initialized successfully!")
@@ -0,0 +1,230 @@
+"""
+Transactional email outbox.
+
+Handlers add an EmailOutbox row in the same transaction as the OTP it
+delivers (email_service.queue_*), so a committed OTP always has its email
+queued and a rolled-back one never sends. The dispatcher started on app
+startup claims due rows, sends them to Resend over a pooled keep-alive
+httpx client, EMAIL_DISPATCH_CONCURRENCY at a time, and records the result:
+
+- 2xx: sent
+- 429 / 5xx / network errors: retried with exponential backoff (plus jitter)
+- other 4xx, or EMAIL_MAX_ATTEMPTS reached: dead-lettered (status "dead")
+
+Claiming pushes next_attempt_at out by EMAIL_LEASE_SECONDS, so several
+workers can dispatch side by side and a row held by a crashed worker is
+picked up again once its lease runs out. Each row is sent with an
+Idempotency-Key, so such a retry does not deliver twice.
+
+    python manage.py email-outbox [--requeue-dead] [--drain]
+"""
+
+import asyncio
+import logging
+import random
+import secrets
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import config
+from database import AsyncSessionLocal, EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_wakeup = None
+
+
+def enqueue(db, kind: str, to_email: str, subject: str, html_body: str, text_body: str) -> EmailOutbox:
+    """Add an email to the caller's transaction; call notify() after the commit"""
+    row = EmailOutbox(
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        html_body=html_body,
+        text_body=text_body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(row)
+    return row
+
+
+def notify():
+    """Wake this worker's dispatcher (rows committed by other workers are found by polling)"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(config.EMAIL_SEND_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=config.EMAIL_DISPATCH_CONCURRENCY,
+                max_keepalive_connections=config.EMAIL_DISPATCH_CONCURRENCY,
+                keepalive_expiry=60
+            )
+        )
+    return _client
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt after `attempts` failed ones"""
+    delay = min(config.EMAIL_RETRY_MAX_SECONDS, config.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def _claim(db: AsyncSession) -> list:
+    now = datetime.utcnow()
+    due = EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now
+    ids = (await db.execute(
+        select(EmailOutbox.id).where(*due).order_by(EmailOutbox.next_attempt_at).limit(config.EMAIL_DISPATCH_BATCH_SIZE)
+    )).scalars().all()
+    if not ids:
+        return []
+
+    # Conditional update: rows another worker claimed in the meantime no longer match
+    token = secrets.token_hex(16)
+    await db.execute(
+        update(EmailOutbox).where(EmailOutbox.id.in_(ids), *due)
+        .values(
+            claim_token=token,
+            attempts=EmailOutbox.attempts + 1,
+            next_attempt_at=now + timedelta(seconds=config.EMAIL_LEASE_SECONDS)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return (await db.execute(select(EmailOutbox).where(EmailOutbox.claim_token == token))).scalars().all()
+
+
+async def _send(client: httpx.AsyncClient, row: EmailOutbox):
+    """Deliver one row; returns (outcome, provider id or error, minimum retry delay)"""
+    try:
+        response = await client.post(
+            config.RESEND_API_URL,
+            json={
+                "from": config.RESEND_FROM_EMAIL,
+                "to": [row.to_email],
+                "subject": row.subject,
+                "html": row.html_body,
+                "text": row.text_body,
+            },
+            headers={
+                "Authorization": f"Bearer {config.RESEND_API_KEY}",
+                "Idempotency-Key": f"outbox-{row.id}",
+            }
+        )
+    except httpx.HTTPError as e:
+        return "retry", f"{type(e).__name__}: {e}", 0
+
+    if response.is_success:
+        try:
+            provider_id = response.json().get("id")
+        except ValueError:
+            provider_id = None
+        return "sent", provider_id, 0
+    error = f"HTTP {response.status_code}: {response.text[:500]}"
+    if response.status_code == 429 or response.status_code >= 500:
+        retry_after = response.headers.get("retry-after", "")
+        return "retry", error, float(retry_after) if retry_after.isdigit() else 0
+    return "dead", error, 0
+
+
+async def dispatch_once(db: AsyncSession) -> int:
+    """Send one batch of due emails; returns how many rows were claimed"""
+    rows = await _claim(db)
+    if not rows:
+        return 0
+
+    client = get_client()
+    slots = asyncio.Semaphore(config.EMAIL_DISPATCH_CONCURRENCY)
+
+    async def send(row):
+        async with slots:
+            return await _send(client, row)
+
+    results = await asyncio.gather(*(send(row) for row in rows))
+    now = datetime.utcnow()
+    for row, (outcome, detail, min_delay) in zip(rows, results):
+        if outcome == "retry" and row.attempts >= config.EMAIL_MAX_ATTEMPTS:
+            outcome = "dead"
+        if outcome == "sent":
+            values = {"status": "sent", "sent_at": now, "provider_id": detail, "last_error": None}
+            logger.info(f"✅ Email {row.id} ({row.kind}) sent → id={detail}")
+        elif outcome == "retry":
+            delay = max(min_delay, retry_delay(row.attempts))
+            values = {"next_attempt_at": now + timedelta(seconds=delay), "last_error": detail}
+            logger.warning(f"⚠️  Email {row.id} ({row.kind}) attempt {row.attempts} failed, retrying in {delay:.0f}s: {detail}")
+        else:
+            values = {"status": "dead", "last_error": detail}
+            logger.error(f"❌ Email {row.id} ({row.kind}) dead-lettered after {row.attempts} attempts: {detail}")
+        # Only if we still hold the claim (a lease that ran out may have been re-claimed)
+        await db.execute(
+            update(EmailOutbox).where(EmailOutbox.id == row.id, EmailOutbox.claim_token == row.claim_token)
+            .values(claim_token=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    return len(rows)
+
+
+async def drain() -> int:
+    """Dispatch until nothing is due (manage.py, benchmarks); returns rows processed"""
+    processed = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            count = await dispatch_once(db)
+            processed += count
+            if count == 0:
+                return processed
+
+
+async def run_forever():
+    """Dispatcher loop (started on app startup)"""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    while True:
+        _wakeup.clear()
+        try:
+            async with AsyncSessionLocal() as db:
+                claimed = await dispatch_once(db)
+        except Exception as e:
+            logger.exception(f"⚠️  Email dispatch failed: {e}")
+            claimed = 0
+        if claimed >= config.EMAIL_DISPATCH_BATCH_SIZE:
+            continue  # Probably more waiting
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=config.EMAIL_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def shutdown():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def status_counts(db: Session) -> dict:
+    rows = db.execute(select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)).all()
+    return {status: count for status, count in rows}
+
+
+def requeue_dead(db: Session) -> int:
+    """Give dead-lettered emails a fresh set of attempts"""
+    result = db.execute(
+        update(EmailOutbox).where(EmailOutbox.status == "dead")
+        .values(status="pending", attempts=0, next_attempt_at=datetime.utcnow(), claim_token=None)
+    )
+    db.commit()
+    return result.rowcount
+
@@ -1,9 +1,12 @@
+import logging
 import random
 import json
 import urllib.request
 import urllib.error
 from config import config
 
+logger = logging.getLogger(__name__)
+
 
 def generate_otp() -> str:
     """Generate a 6-digit OTP"""
@@ -33,7 +36,7 @@ def _send_via_resend(to_email: str, subject: str, html_body: str, text_body: str
     }).encode("utf-8")
 
     req = urllib.request.Request(
-        "https://api.resend.com/emails",
+        config.RESEND_API_URL,
         data=payload,
         headers={
             "Authorization": f"Bearer {api_key}",
@@ -45,22 +48,19 @@ def _send_via_resend(to_email: str, subject: str, html_body: str, text_body: str
     try:
         with urllib.request.urlopen(req, timeout=20) as resp:
             result = json.loads(resp.read().decode())
-            print(f"✅ Resend email sent → id={result.get('id')}")
+            logger.info(f"✅ Resend email sent → id={result.get('id')}")
             return True
     except urllib.error.HTTPError as e:
         body = e.read().decode()
-        print(f"❌ Resend API error {e.code}: {body}")
+        logger.error(f"❌ Resend API error {e.code}: {body}")
         return False
     except Exception as e:
-        print(f"❌ Resend request failed: {e}")
+        logger.error(f"❌ Resend request failed: {e}")
         return False
 
 
-def send_otp_email(to_email: str, otp_code: str, user_name: str = "User") -> bool:
-    """
-    Send OTP verification email.
-    Uses Resend API (RESEND_API_KEY) if configured, otherwise prints to console (dev mode).
-    """
+def otp_email(otp_code: str, user_name: str = "User"):
+    """(subject, html body, text body) of the OTP verification email"""
     subject = f"Your Verification Code: {otp_code}"
 
     html_body = f"""
@@ -100,23 +100,30 @@ If you didn't request this, please ignore this email.
 
 — Surgical Wound Care Team
 """
+    return subject, html_body, text_body
+
+
+def send_otp_email(to_email: str, otp_code: str, user_name: str = "User") -> bool:
+    """
+    Send OTP verification email.
+    Uses Resend API (RESEND_API_KEY) if configured, otherwise prints to console (dev mode).
+    """
+    subject, html_body, text_body = otp_email(otp_code, user_name)
 
     api_key = getattr(config, 'RESEND_API_KEY', None)
     if not api_key:
-        print("⚠️  RESEND_API_KEY not configured — printing OTP to console (dev mode).")
-        print(f"📧 OTP for {to_email}: {otp_code}")
+        logger.warning("⚠️  RESEND_API_KEY not configured — printing OTP to console (dev mode).")
+        logger.warning(f"📧 OTP for {to_email}: {otp_code}")
         return True  # Allow dev flow to continue
 
     sent = _send_via_resend(to_email, subject, html_body, text_body)
     if not sent:
-        print(f"📧 [DEV fallback] OTP for {to_email}: {otp_code}")
+        logger.warning(f"📧 [DEV fallback] OTP for {to_email}: {otp_code}")
     return sent
 
 
-def send_password_reset_email(to_email: str, otp_code: str, user_name: str = "User") -> bool:
-    """
-    Send a password-reset OTP email via Resend HTTP API.
-    """
+def password_reset_email(otp_code: str, user_name: str = "User"):
+    """(subject, html body, text body) of the password-reset email"""
     subject = f"Password Reset Code: {otp_code}"
 
     html_body = f"""
@@ -156,13 +163,46 @@ If you did not request this, please ignore this email.
 
 — Surgical Wound Care Team
 """
+    return subject, html_body, text_body
+
+
+def send_password_reset_email(to_email: str, otp_code: str, user_name: str = "User") -> bool:
+    """
+    Send a password-reset OTP email via Resend HTTP API.
+    """
+    subject, html_body, text_body = password_reset_email(otp_code, user_name)
 
     api_key = getattr(config, 'RESEND_API_KEY', None)
     if not api_key:
-        print(f"📧 [DEV] Reset OTP for {to_email}: {otp_code}")
+        logger.warning(f"📧 [DEV] Reset OTP for {to_email}: {otp_code}")
         return True
 
     sent = _send_via_resend(to_email, subject, html_body, text_body)
     if not sent:
-        print(f"📧 [DEV fallback] Reset OTP for {to_email}: {otp_code}")
+        logger.warning(f"📧 [DEV fallback] Reset OTP for {to_email}: {otp_code}")
     return sent
+
+
+def queue_otp_email(db, to_email: str, otp_code: str, user_name: str = "User") -> bool:
+    """
+    Add the OTP email to the outbox in the caller's transaction (the caller commits).
+    Without RESEND_API_KEY the OTP is printed to the console instead (dev mode).
+    Returns True if a row was queued.
+    """
+    if not getattr(config, 'RESEND_API_KEY', None):
+        logger.warning("⚠️  RESEND_API_KEY not configured — printing OTP to console (dev mode).")
+        logger.warning(f"📧 OTP for {to_email}: {otp_code}")
+        return False
+    import email_outbox
+    email_outbox.enqueue(db, "otp", to_email, *otp_email(otp_code, user_name))
+    return True
+
+
+def queue_password_reset_email(db, to_email: str, otp_code: str, user_name: str = "User") -> bool:
+    """Outbox counterpart of send_password_reset_email (the caller commits)"""
+    if not getattr(config, 'RESEND_API_KEY', None):
+        logger.warning(f"📧 [DEV] Reset OTP for {to_email}: {otp_code}")
+        return False
+    import email_outbox
+    email_outbox.enqueue(db, "password_reset", to_email, *password_reset_email(otp_code, user_name))
+    return True
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Resend email API.
+
+Accepts POST /emails like api.resend.com, keeps the messages in memory
+(GET /emails lists them, DELETE /emails clears them) and can add latency
+or fail a share of requests to exercise the outbox retries:
+
+    python fake_resend.py [--port 8025] [--latency-ms 0] [--fail-rate 0.0] [--fail-status 503]
+    RESEND_API_URL=http://127.0.0.1:8025/emails RESEND_API_KEY=test python main.py
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import uuid
+
+from fastapi import FastAPI, Header, HTTPException, Request
+
+app = FastAPI(title="Fake Resend")
+app.state.latency_ms = float(os.getenv("FAKE_RESEND_LATENCY_MS", 0))
+app.state.fail_rate = float(os.getenv("FAKE_RESEND_FAIL_RATE", 0))
+app.state.fail_status = int(os.getenv("FAKE_RESEND_FAIL_STATUS", 503))
+
+_sent = []
+_by_idempotency_key = {}
+
+
+@app.post("/emails")
+async def send_email(
+    request: Request,
+    authorization: str = Header(None),
+    idempotency_key: str = Header(None)
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing API key")
+    if app.state.latency_ms:
+        await asyncio.sleep(app.state.latency_ms / 1000)
+    if random.random() < app.state.fail_rate:
+        raise HTTPException(status_code=app.state.fail_status, detail="Injected failure")
+
+    # Replays of an already accepted request return the original id, like Resend
+    if idempotency_key and idempotency_key in _by_idempotency_key:
+        return {"id": _by_idempotency_key[idempotency_key]}
+
+    payload = await request.json()
+    for field in ("from", "to", "subject"):
+        if not payload.get(field):
+            raise HTTPException(status_code=422, detail=f"Missing `{field}` field")
+    email_id = str(uuid.uuid4())
+    _sent.append({"id": email_id, **payload})
+    if idempotency_key:
+        _by_idempotency_key[idempotency_key] = email_id
+    return {"id": email_id}
+
+
+@app.get("/emails")
+async def list_emails():
+    return {"count": len(_sent), "data": _sent}
+
+
+@app.delete("/emails")
+async def clear_emails():
+    _sent.clear()
+    _by_idempotency_key.clear()
+    return {"success": True}
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Run a fake Resend API")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=app.state.latency_ms)
+    parser.add_argument("--fail-rate", type=float, default=app.state.fail_rate, help="Share of requests to fail (0-1)")
+    parser.add_argument("--fail-status", type=int, default=app.state.fail_status)
+    args = parser.parse_args()
+    app.state.latency_ms = args.latency_ms
+    app.state.fail_rate = args.fail_rate
+    app.state.fail_status = args.fail_status
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,26 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from config import config
-from database import init_db
+from database import init_db, describe_engine, async_engine, async_replica_engines
+import app_logging
+import email_outbox
+import maintenance
+import metrics
+import password_hasher
+import profiling
+import query_stats
+import wound_metrics
+import asyncio
+import logging
 import os
 
+app_logging.configure()
+logger = logging.getLogger(__name__)
+
 # Import routers
-from routes import upload, classify, recommend, history, comparison, auth
+from routes import upload, classify, recommend, history, comparison, auth, search, stats, admin
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -24,12 +38,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.middleware("http")
-async def log_requests(request, call_next):
-    print(f"Incoming request: {request.method} {request.url}")
-    response = await call_next(request)
-    print(f"Response status: {response.status_code}")
-    return response
+# Request ids + structured, sampled request log (see app_logging.py)
+app.add_middleware(app_logging.RequestLoggingMiddleware)
+
+# Per-route latency, in-flight requests and SQL per request, served at /metrics
+if config.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# SQL statements per request: debug headers, per-route histograms, N+1 warnings
+if config.QUERY_STATS_ENABLED:
+    app.add_middleware(query_stats.QueryStatsMiddleware)
+
+# cProfile of requests asked for by an admin or sampled 1-in-N (see profiling.py)
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
 
 # Create uploads directory if it doesn't exist
 os.makedirs(config.UPLOAD_DIR, exist_ok=True)
@@ -43,14 +65,40 @@ app.include_router(classify.router, prefix="/api", tags=["Classification"])
 app.include_router(recommend.router, prefix="/api", tags=["Recommendations"])
 app.include_router(history.router, prefix="/api", tags=["History"])
 app.include_router(comparison.router, prefix="/api", tags=["Comparison"])
+app.include_router(search.router, prefix="/api", tags=["Search"])
+app.include_router(stats.router, prefix="/api", tags=["Statistics"])
 app.include_router(auth.router, prefix="/api", tags=["Authentication"])
+app.include_router(admin.router, prefix="/api", tags=["Admin"])
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     init_db()
-    print(f"🚀 Server started on http://{config.HOST}:{config.PORT}")
-    print(f"📚 API Documentation: http://{config.HOST}:{config.PORT}/docs")
+    settings = ", ".join(f"{k}={v}" for k, v in describe_engine().items())
+    logger.info(f"🗄️  Database engine: {settings}")
+    if async_replica_engines:
+        logger.info(f"📖 Read replicas: {len(async_replica_engines)} (sticky-to-primary {config.REPLICA_STICKY_SECONDS}s after writes, {config.REPLICA_STICKY_STORE})")
+    if config.MAINTENANCE_INTERVAL_SECONDS > 0:
+        app.state.maintenance_task = asyncio.create_task(maintenance.run_forever())
+    if config.EMAIL_DISPATCHER_ENABLED:
+        app.state.email_task = asyncio.create_task(email_outbox.run_forever())
+    logger.info(f"🚀 Server started on http://{config.HOST}:{config.PORT}")
+    logger.info(f"📚 API Documentation: http://{config.HOST}:{config.PORT}/docs")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker pools and database connections"""
+    for task_name in ("maintenance_task", "email_task"):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+    await email_outbox.shutdown()
+    wound_metrics.shutdown()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    for replica in async_replica_engines:
+        await replica.dispose()
+    app_logging.shutdown()
 
 @app.get("/")
 async def root():
@@ -71,6 +119,13 @@ async def health_check():
         "gemini_api": "configured" if config.GEMINI_API_KEY else "not configured"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics (see metrics.py)"""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,204 @@
+"""
+Retention jobs for tables that otherwise grow forever.
+
+- Expired login sessions and OTP codes are deleted, and so are sent or
+  dead-lettered outbox emails older than EMAIL_OUTBOX_RETENTION_DAYS.
+- Classifications superseded by a newer one for the same wound, and
+  recommendations superseded by a newer one for the same classification,
+  move to the *_archive tables once older than ARCHIVE_AFTER_DAYS. The
+  latest classification/recommendation (what the routers read) never moves.
+
+Every job works in bounded batches with one short transaction each, so it
+can run next to live traffic. Runs in-process every
+MAINTENANCE_INTERVAL_SECONDS, or on demand via:
+    python manage.py maintenance
+"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, delete, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import config
+from database import (
+    SessionLocal, Session as DBSession, EmailVerificationOTP, EmailOutbox,
+    Classification, ClassificationArchive, Recommendation, RecommendationArchive,
+)
+
+logger = logging.getLogger(__name__)
+
+CLASSIFICATION_COLUMNS = ["id", "wound_id", "wound_type", "confidence", "all_probabilities", "processing_time_ms", "timestamp"]
+
+RECOMMENDATION_COLUMNS = [
+    "id", "classification_id", "summary", "cleaning_instructions", "dressing_recommendations",
+    "medication_suggestions", "expected_healing_time", "follow_up_schedule", "warning_signs",
+    "when_to_seek_help", "diet_advice", "activity_restrictions", "ai_confidence", "created_at",
+]
+
+
+def _batches(max_batches):
+    """Batch counter; None means run until a job runs out of rows"""
+    count = 0
+    while max_batches is None or count < max_batches:
+        yield count
+        count += 1
+
+
+def _delete_in_batches(db: Session, model, condition, batch_size: int, max_batches) -> int:
+    deleted = 0
+    for _ in _batches(max_batches):
+        ids = db.execute(select(model.id).where(condition).limit(batch_size)).scalars().all()
+        if ids:
+            db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+            db.commit()
+            deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    return deleted
+
+
+def purge_expired_sessions(db: Session, batch_size: int, max_batches=None) -> int:
+    return _delete_in_batches(db, DBSession, DBSession.expires_at < datetime.utcnow(), batch_size, max_batches)
+
+
+def purge_expired_otps(db: Session, batch_size: int, max_batches=None) -> int:
+    # Verified codes are only needed until they expire (the reset flow checks expiry too)
+    return _delete_in_batches(
+        db, EmailVerificationOTP, EmailVerificationOTP.expires_at < datetime.utcnow(), batch_size, max_batches
+    )
+
+
+def purge_finished_emails(db: Session, before: datetime, batch_size: int, max_batches=None) -> int:
+    # Pending rows stay whatever their age; the dispatcher owns them
+    return _delete_in_batches(
+        db, EmailOutbox, EmailOutbox.status.in_(("sent", "dead")) & (EmailOutbox.created_at < before),
+        batch_size, max_batches
+    )
+
+
+def _superseded(model, partition_column, order_column, cutoff):
+    """Ids of rows that have a newer sibling in the same partition and are older than cutoff"""
+    ranked = select(
+        model.id.label("id"),
+        order_column.label("ordered_at"),
+        func.row_number().over(partition_by=partition_column, order_by=(order_column.desc(), model.id.desc())).label("rn")
+    ).subquery()
+    return select(ranked.c.id).where(ranked.c.rn > 1, ranked.c.ordered_at < cutoff).order_by(ranked.c.id)
+
+
+def _move_recommendations(db: Session, recommendation_ids, archived_at: datetime):
+    """Copy recommendations into the archive and delete them (caller commits)"""
+    db.execute(insert(RecommendationArchive).from_select(
+        RECOMMENDATION_COLUMNS + ["wound_id", "archived_at"],
+        select(
+            *[getattr(Recommendation, column) for column in RECOMMENDATION_COLUMNS],
+            Classification.wound_id,
+            literal(archived_at, DateTime)
+        ).join(Classification, Classification.id == Recommendation.classification_id)
+        .where(Recommendation.id.in_(recommendation_ids))
+    ))
+    db.execute(
+        delete(Recommendation).where(Recommendation.id.in_(recommendation_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def archive_superseded(db: Session, cutoff: datetime, batch_size: int, max_batches=None) -> dict:
+    """Move superseded classifications (with their recommendations) and superseded recommendations to the archive"""
+    archived = {"classifications": 0, "recommendations": 0}
+
+    superseded_classifications = _superseded(Classification, Classification.wound_id, Classification.timestamp, cutoff)
+    for _ in _batches(max_batches):
+        ids = db.execute(superseded_classifications.limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        now = datetime.utcnow()
+        recommendation_ids = db.execute(
+            select(Recommendation.id).where(Recommendation.classification_id.in_(ids))
+        ).scalars().all()
+        try:
+            if recommendation_ids:
+                _move_recommendations(db, recommendation_ids, now)
+            db.execute(insert(ClassificationArchive).from_select(
+                CLASSIFICATION_COLUMNS + ["archived_at"],
+                select(
+                    *[getattr(Classification, column) for column in CLASSIFICATION_COLUMNS],
+                    literal(now, DateTime)
+                ).where(Classification.id.in_(ids))
+            ))
+            db.execute(
+                delete(Classification).where(Classification.id.in_(ids)).execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except IntegrityError:
+            # Another worker archived the same rows first
+            db.rollback()
+            break
+        archived["classifications"] += len(ids)
+        archived["recommendations"] += len(recommendation_ids)
+        if len(ids) < batch_size:
+            break
+
+    superseded_recommendations = _superseded(
+        Recommendation, Recommendation.classification_id, Recommendation.created_at, cutoff
+    )
+    for _ in _batches(max_batches):
+        ids = db.execute(superseded_recommendations.limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        try:
+            _move_recommendations(db, ids, datetime.utcnow())
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            break
+        archived["recommendations"] += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    return archived
+
+
+def run_all(db: Session, batch_size: int = None, max_batches=None) -> dict:
+    """Run every retention job; returns rows reclaimed per kind"""
+    batch_size = batch_size or config.MAINTENANCE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=config.ARCHIVE_AFTER_DAYS)
+    return {
+        "sessions": purge_expired_sessions(db, batch_size, max_batches),
+        "otps": purge_expired_otps(db, batch_size, max_batches),
+        "emails": purge_finished_emails(
+            db, datetime.utcnow() - timedelta(days=config.EMAIL_OUTBOX_RETENTION_DAYS), batch_size, max_batches
+        ),
+        **archive_superseded(db, cutoff, batch_size, max_batches),
+    }
+
+
+def format_report(report: dict) -> str:
+    return (
+        f"purged {report['sessions']} sessions, {report['otps']} OTPs, {report['emails']} outbox emails; "
+        f"archived {report['classifications']} classifications, {report['recommendations']} recommendations"
+    )
+
+
+def _scheduled_run() -> dict:
+    db = SessionLocal()
+    try:
+        return run_all(db, config.MAINTENANCE_BATCH_SIZE, config.MAINTENANCE_MAX_BATCHES)
+    finally:
+        db.close()
+
+
+async def run_forever():
+    """In-process scheduler (started on app startup); intervals are jittered so workers drift apart"""
+    while True:
+        await asyncio.sleep(config.MAINTENANCE_INTERVAL_SECONDS * random.uniform(0.9, 1.1))
+        try:
+            report = await asyncio.to_thread(_scheduled_run)
+            if any(report.values()):
+                logger.info(f"🧹 Maintenance: {format_report(report)}")
+        except Exception as e:
+            logger.exception(f"⚠️  Maintenance run failed: {e}")
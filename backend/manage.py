@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the Wound Care backend.
+
+Usage:
+    python manage.py backfill-case-counters
+    python manage.py sweep-uploads [--batch-size N] [--min-age SECONDS] [--delete]
+    python manage.py maintenance [--batch-size N] [--max-batches N]
+    python manage.py email-outbox [--requeue-dead] [--drain]
+    python manage.py backfill-search-index
+    python manage.py rebuild-stats
+    python manage.py migrate
+    python manage.py explain
+    python manage.py sync-sqlite-replicas
+"""
+
+import argparse
+import app_logging
+from database import SessionLocal, engine, init_db
+
+
+def backfill_case_counters(args):
+    import cases
+    db = SessionLocal()
+    try:
+        count = cases.backfill(db)
+        print(f"✅ Case counters backfilled for {count} cases")
+    finally:
+        db.close()
+
+
+def backfill_search_index(args):
+    import search_index
+    db = SessionLocal()
+    try:
+        count = search_index.backfill(db)
+        print(f"✅ Search index rebuilt for {count} wounds")
+    finally:
+        db.close()
+
+
+def rebuild_stats(args):
+    import analytics
+    db = SessionLocal()
+    try:
+        count = analytics.rebuild(db)
+        print(f"✅ Analytics summaries rebuilt ({count} rows)")
+    finally:
+        db.close()
+
+
+def sweep_uploads(args):
+    import storage
+    db = SessionLocal()
+    try:
+        dry_run = not args.delete
+        stats = storage.sweep_orphans(db, batch_size=args.batch_size, min_age_seconds=args.min_age, dry_run=dry_run)
+        action = "would remove" if dry_run else "removed"
+        print(f"🧹 Scanned {stats['scanned']} files, {stats['orphaned']} orphaned, {action} "
+              f"{stats['orphaned'] if dry_run else stats['removed']} ({stats['skipped_recent']} too recent to check)")
+        if dry_run and stats["orphaned"]:
+            print("   Re-run with --delete to remove them")
+    finally:
+        db.close()
+
+
+def _sweep_uploads_arguments(parser):
+    parser.add_argument("--batch-size", type=int, default=500, help="Files checked against the database (and removed) per batch")
+    parser.add_argument("--min-age", type=int, default=3600, help="Skip files modified within this many seconds")
+    parser.add_argument("--delete", action="store_true", help="Delete the orphans (default: only report them)")
+
+
+def run_maintenance(args):
+    import maintenance
+    db = SessionLocal()
+    try:
+        report = maintenance.run_all(db, batch_size=args.batch_size, max_batches=args.max_batches)
+        print(f"🧹 Maintenance: {maintenance.format_report(report)}")
+    finally:
+        db.close()
+
+
+def _maintenance_arguments(parser):
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per transaction (default MAINTENANCE_BATCH_SIZE)")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop each job after this many batches (default: until done)")
+
+
+def email_outbox_status(args):
+    import asyncio
+    import email_outbox
+    db = SessionLocal()
+    try:
+        if args.requeue_dead:
+            print(f"🔁 Requeued {email_outbox.requeue_dead(db)} dead-lettered emails")
+        if args.drain:
+            print(f"📧 Dispatched {asyncio.run(email_outbox.drain())} emails")
+        counts = email_outbox.status_counts(db)
+        print("📬 Outbox: " + (", ".join(f"{status}={count}" for status, count in sorted(counts.items())) or "empty"))
+    finally:
+        db.close()
+
+
+def _email_outbox_arguments(parser):
+    parser.add_argument("--requeue-dead", action="store_true", help="Retry dead-lettered emails from scratch")
+    parser.add_argument("--drain", action="store_true", help="Send every due email now, then exit")
+
+
+def migrate(args):
+    import migrations
+    pending = migrations.pending_migrations(engine)
+    if not pending:
+        print("✅ Schema is up to date")
+        return
+    applied = migrations.run_migrations(engine)
+    print(f"✅ Applied migrations: {', '.join(f'{v:03d}' for v in applied)}")
+
+
+def explain(args):
+    import query_plans
+    query_plans.print_query_plans()
+
+
+def sync_sqlite_replicas(args):
+    """Snapshot the primary SQLite file onto each replica file (local replica testing)"""
+    import sqlite3
+    from database import replica_engines
+    if engine.dialect.name != "sqlite" or not replica_engines:
+        print("⚠️  Needs a SQLite DATABASE_URL and SQLite DATABASE_REPLICA_URLS")
+        return
+    source = sqlite3.connect(engine.url.database)
+    try:
+        for replica_engine in replica_engines:
+            if replica_engine.dialect.name != "sqlite":
+                print(f"⚠️  Skipping non-SQLite replica {replica_engine.url}")
+                continue
+            target = sqlite3.connect(replica_engine.url.database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+            print(f"✅ Copied primary to {replica_engine.url.database}")
+    finally:
+        source.close()
+
+
+COMMANDS = {
+    "backfill-case-counters": (backfill_case_counters, "Recompute denormalized wound counters on every case", None),
+    "backfill-search-index": (backfill_search_index, "Rebuild the clinical search columns from stored analysis JSON", None),
+    "rebuild-stats": (rebuild_stats, "Recompute the analytics summary tables from scratch", None),
+    "sweep-uploads": (sweep_uploads, "Report (or with --delete remove) upload files no wound references", _sweep_uploads_arguments),
+    "maintenance": (run_maintenance, "Purge expired sessions/OTPs and archive superseded classifications", _maintenance_arguments),
+    "email-outbox": (email_outbox_status, "Show outbox counts; optionally requeue dead letters or send due emails", _email_outbox_arguments),
+    "migrate": (migrate, "Apply pending schema migrations", None),
+    "explain": (explain, "Print the execution plan of every hot router query", None),
+    "sync-sqlite-replicas": (sync_sqlite_replicas, "Copy the primary SQLite database onto the replica files", None),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wound Care backend maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (handler, help_text, add_arguments) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if add_arguments:
+            add_arguments(subparser)
+        subparser.set_defaults(handler=handler)
+    
+    args = parser.parse_args()
+    app_logging.configure("text")
+    if args.handler is not migrate:
+        init_db()
+    else:
+        from database import Base
+        Base.metadata.create_all(bind=engine)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+In-process metrics, exposed at GET /metrics in the Prometheus text format.
+
+- HTTP: per-route latency histogram, request counter by status, in-flight gauge
+- Database: query count/time overall and per request, requests repeating a
+  statement (fed by query_stats.py)
+- Gemini: calls, latency and errors per model and operation (upload/generate),
+  plus time spent parsing AI JSON
+- Password hashing: hash/verify latency (including pool queueing) and rejections
+- Caches: response cache and session cache hits/misses, with hit ratios
+
+Every update is a dict lookup and a few additions under an uncontended lock
+(about 1µs). Numbers are per process: with several uvicorn
+workers each one reports its own, so scrape them individually.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; the HTTP/DB default and a longer set for Gemini calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AI_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+_registry = []
+_collectors = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        names = self.labelnames + ("le",)
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(bounds, series[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", _format_labels(names, labels + (bound,)), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), series[-1]
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative
+
+
+# HTTP
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+HTTP_IN_FLIGHT.set(0)
+
+# Database
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed by operation", ("operation",))
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "SQL statement latency by operation", ("operation",))
+DB_REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements per HTTP request", ("route",), buckets=QUERY_COUNT_BUCKETS
+)
+DB_REQUEST_TIME = Histogram("http_request_db_seconds", "Time in SQL per HTTP request", ("route",))
+DB_REPEATED_STATEMENTS = Counter(
+    "db_repeated_statement_requests_total", "Requests running one statement shape above QUERY_REPEAT_THRESHOLD times", ("route",)
+)
+
+# Gemini
+AI_CALLS = Counter("gemini_calls_total", "Gemini API calls by model, operation and outcome", ("model", "operation", "outcome"))
+AI_LATENCY = Histogram(
+    "gemini_call_duration_seconds", "Gemini API call latency by model and operation", ("model", "operation"), buckets=AI_BUCKETS
+)
+AI_ERRORS = Counter("gemini_errors_total", "Failed Gemini API calls by model and error type", ("model", "operation", "error"))
+AI_PARSE_LATENCY = Histogram("ai_response_parse_seconds", "Time spent parsing AI JSON responses", ("endpoint",))
+
+# Password hashing
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify latency including pool queueing", ("operation",)
+)
+PASSWORD_HASH_REJECTED = Counter("password_hash_rejected_total", "Hash calls refused with a 503", ("reason",))
+
+# Caches
+RESPONSE_CACHE = Counter("response_cache_requests_total", "Response cache lookups by result", ("result",))
+
+
+def observe_ai_call(model: str, operation: str, started: float, error: Exception = None):
+    """Record a Gemini call that began at time.perf_counter() `started`"""
+    AI_LATENCY.observe(time.perf_counter() - started, model, operation)
+    AI_CALLS.inc(model, operation, "error" if error else "ok")
+    if error:
+        AI_ERRORS.inc(model, operation, type(error).__name__)
+
+
+@contextmanager
+def ai_call(model: str, operation: str):
+    """`with metrics.ai_call(model, "generate"): ...` records latency and outcome (errors re-raised)"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        observe_ai_call(model, operation, started, e)
+        raise
+    observe_ai_call(model, operation, started)
+
+
+@contextmanager
+def timed(histogram: Histogram, *labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, *labels)
+
+
+def collector(fn):
+    """Register fn() -> iterable of (name, kind, help, [(labels dict, value)]) evaluated at scrape time"""
+    _collectors.append(fn)
+    return fn
+
+
+@collector
+def _cache_stats():
+    import session_cache
+    cache = session_cache.get_cache()
+    if cache:
+        yield ("session_cache_lookups_total", "counter", "Session-token cache lookups by result",
+               [({"result": "hit"}, cache.hits), ({"result": "miss"}, cache.misses)])
+    ratios = []
+    hits, misses = RESPONSE_CACHE.value("HIT"), RESPONSE_CACHE.value("MISS")
+    if hits + misses:
+        ratios.append(({"cache": "response"}, hits / (hits + misses)))
+    if cache and cache.hits + cache.misses:
+        ratios.append(({"cache": "session"}, cache.hits / (cache.hits + cache.misses)))
+    if ratios:
+        yield "cache_hit_ratio", "gauge", "Hits / (hits + misses) since start", ratios
+
+
+@collector
+def _log_stats():
+    import app_logging
+    yield ("log_records_dropped_total", "counter", "Log records dropped because the log queue was full",
+           [({}, app_logging.dropped_records())])
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+    for fn in _collectors:
+        for name, kind, help_text, samples in fn():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, route, status)
+            HTTP_LATENCY.observe(elapsed, method, route)
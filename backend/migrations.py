@@ -0,0 +1,180 @@
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables, so columns and
+indexes added to existing tables need a migration here. Migrations are
+idempotent (they check the live schema / use IF NOT EXISTS) so a fresh
+database created by create_all simply records them as applied.
+
+On PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY so they can
+be added to a live deployment without blocking writes.
+
+Run automatically on startup (config.AUTO_MIGRATE) or via:
+    python manage.py migrate
+"""
+
+import logging
+from datetime import datetime
+from sqlalchemy import LargeBinary, bindparam, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column_if_missing(conn, table: str, column: str, ddl: str):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_index(engine, name: str, table: str, columns: str):
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def _m001_denormalized_and_cache_columns(engine):
+    """Columns added for comparison caching and case counters"""
+    with engine.begin() as conn:
+        _add_column_if_missing(conn, "wounds", "image_sha256", "VARCHAR(64)")
+        _add_column_if_missing(conn, "comparisons", "metrics", "JSON")
+        _add_column_if_missing(conn, "comparisons", "cache_key", "VARCHAR(64)")
+        _add_column_if_missing(conn, "cases", "wound_count", "INTEGER NOT NULL DEFAULT 0")
+        _add_column_if_missing(conn, "cases", "latest_wound_id", "INTEGER")
+        _add_column_if_missing(conn, "cases", "latest_upload_date", "TIMESTAMP")
+    
+    # Populate the new case counters from existing wounds
+    import cases
+    from database import SessionLocal
+    db = SessionLocal(bind=engine)
+    try:
+        cases.backfill(db)
+    finally:
+        db.close()
+
+
+def _m002_hot_query_indexes(engine):
+    """Composite indexes for the history, case list, OTP and session queries"""
+    _create_index(engine, "ix_wounds_user_upload", "wounds", "user_id, upload_date, id")
+    _create_index(engine, "ix_wounds_case_upload", "wounds", "case_id, upload_date, id")
+    _create_index(engine, "ix_cases_user_created", "cases", "user_id, created_at")
+    _create_index(engine, "ix_otps_email_code_verified", "email_verification_otps", "email, otp_code, verified")
+    _create_index(engine, "ix_sessions_expires_at", "sessions", "expires_at")
+    _create_index(engine, "ix_comparisons_wound_pair", "comparisons", "wound_id_before, wound_id_after")
+
+
+def _m003_backfill_search_index(engine):
+    """Populate wound_search_index from the analysis JSON of already-classified wounds"""
+    import search_index
+    from database import SessionLocal
+    db = SessionLocal(bind=engine)
+    try:
+        search_index.backfill(db)
+    finally:
+        db.close()
+
+
+def _m004_rebuild_analytics(engine):
+    """Build analytics_daily from existing wounds, classifications and recommendations"""
+    import analytics
+    from database import SessionLocal
+    db = SessionLocal(bind=engine)
+    try:
+        analytics.rebuild(db)
+    finally:
+        db.close()
+
+
+# Columns stored as CompactJSON (see database.py)
+COMPACT_JSON_COLUMNS = {
+    "wounds": ["analysis"],
+    "recommendations": [
+        "cleaning_instructions", "dressing_recommendations", "medication_suggestions", "follow_up_schedule",
+        "warning_signs", "when_to_seek_help", "diet_advice", "activity_restrictions",
+    ],
+    "comparisons": ["analysis"],
+}
+
+
+def _m005_compact_json_columns(engine, batch_size: int = 500):
+    """Switch the large JSON columns to bytes and re-encode existing rows in the compact format"""
+    from database import Base
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for table, columns in COMPACT_JSON_COLUMNS.items():
+                types = {c["name"]: c["type"] for c in inspect(conn).get_columns(table)}
+                for column in columns:
+                    if not isinstance(types[column], LargeBinary):
+                        conn.execute(text(
+                            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BYTEA USING convert_to({column}::text, 'UTF8')"
+                        ))
+    
+    # Read through CompactJSON (accepts legacy JSON text) and write back compact, one batch per transaction
+    for table_name, columns in COMPACT_JSON_COLUMNS.items():
+        table = Base.metadata.tables[table_name]
+        update = table.update().where(table.c.id == bindparam("row_id")).values(
+            {column: bindparam(column) for column in columns}
+        )
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    select(table.c.id, *[table.c[column] for column in columns])
+                    .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                conn.execute(update, [{"row_id": row.id, **{c: row._mapping[c] for c in columns}} for row in rows])
+            last_id = rows[-1].id
+
+
+# (version, name, function) — append only, never renumber
+MIGRATIONS = [
+    (1, "denormalized_and_cache_columns", _m001_denormalized_and_cache_columns),
+    (2, "hot_query_indexes", _m002_hot_query_indexes),
+    (3, "backfill_search_index", _m003_backfill_search_index),
+    (4, "rebuild_analytics", _m004_rebuild_analytics),
+    (5, "compact_json_columns", _m005_compact_json_columns),
+]
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def applied_versions(engine) -> set:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations(engine) -> list:
+    applied = applied_versions(engine)
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def run_migrations(engine) -> list:
+    """Apply every pending migration in order; returns the versions applied"""
+    applied = []
+    for version, name, migrate in pending_migrations(engine):
+        logger.info(f"🛠️  Applying migration {version:03d} {name}")
+        migrate(engine)
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": version, "n": name, "t": datetime.utcnow()}
+                )
+        except IntegrityError:
+            # Another worker applied it concurrently; migrations are idempotent
+            pass
+        applied.append(version)
+    return applied
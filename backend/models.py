@@ -93,6 +93,18 @@ class HistoryResponse(BaseModel):
     total: Optional[int] = None
     limit: Optional[int] = None
     offset: Optional[int] = None
+    next_cursor: Optional[str] = None
+    error: Optional[str] = None
+
+class WoundSearchResponse(BaseModel):
+    success: bool
+    wounds: Optional[List[Dict[str, Any]]] = None
+    count: Optional[int] = None
+    error: Optional[str] = None
+
+class StatsResponse(BaseModel):
+    success: bool
+    stats: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
 class CaseResponse(BaseModel):
@@ -101,9 +113,16 @@ class CaseResponse(BaseModel):
     cases: Optional[List[Dict[str, Any]]] = None
     error: Optional[str] = None
 
+class TrajectoryResponse(BaseModel):
+    success: bool
+    trajectory: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
 class ComparisonResponse(BaseModel):
     success: bool
     comparison: Optional[Dict[str, Any]] = None
+    metrics: Optional[Dict[str, Any]] = None
+    cached: Optional[bool] = None
     error: Optional[str] = None
 
 class UserResponse(BaseModel):
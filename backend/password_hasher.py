@@ -0,0 +1,100 @@
+"""
+bcrypt hashing and verification off the event loop.
+
+Each hash/verify costs ~100-300ms of CPU at the default work factor, so it
+runs in a dedicated process pool of PASSWORD_HASH_WORKERS. At most
+PASSWORD_HASH_MAX_PENDING calls are queued or running per worker process;
+callers that cannot get a slot within PASSWORD_HASH_QUEUE_TIMEOUT, or whose
+hash takes longer than PASSWORD_HASH_TIMEOUT, get a 503 instead of piling up.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from config import config
+import metrics
+import process_pools
+
+# bcrypt has a 72-byte limit, so we configure it to automatically truncate
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=config.BCRYPT_ROUNDS,
+    bcrypt__truncate_error=False  # Allow passwords longer than 72 bytes by truncating
+)
+
+_executor = None
+_slots = None
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str):
+    """(matches, new hash if the stored one uses an outdated work factor else None)"""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, initializer=process_pools.init_worker)
+    return _executor
+
+
+def _release_slot(loop):
+    # Pool futures complete on the executor's management thread
+    try:
+        loop.call_soon_threadsafe(_slots.release)
+    except RuntimeError:
+        pass  # Loop already closed (shutdown)
+
+
+async def _run(fn, *args):
+    global _slots
+    if config.PASSWORD_HASH_WORKERS <= 0:
+        # Pool disabled: hash on the event loop (blocks every other request meanwhile)
+        return fn(*args)
+    if _slots is None:
+        _slots = asyncio.Semaphore(config.PASSWORD_HASH_MAX_PENDING)
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=config.PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics.PASSWORD_HASH_REJECTED.inc("queue_timeout")
+        raise HTTPException(status_code=503, detail="Authentication is busy, please retry shortly")
+    loop = asyncio.get_running_loop()
+    try:
+        job = get_executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # The slot belongs to the job, not to this caller: a call that times out
+    # leaves its hash running in the pool, and the slot stays taken until the
+    # process is done with it (or the job is cancelled before it started)
+    job.add_done_callback(lambda _: _release_slot(loop))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(job), timeout=config.PASSWORD_HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics.PASSWORD_HASH_REJECTED.inc("hash_timeout")
+        raise HTTPException(status_code=503, detail="Authentication timed out, please retry")
+
+
+async def hash_password(password: str) -> str:
+    with metrics.timed(metrics.PASSWORD_HASH_LATENCY, "hash"):
+        return await _run(_hash, password)
+
+
+async def verify_and_update(password: str, hashed_password: str):
+    with metrics.timed(metrics.PASSWORD_HASH_LATENCY, "verify"):
+        return await _run(_verify_and_update, password, hashed_password)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
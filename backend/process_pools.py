@@ -0,0 +1,28 @@
+"""
+Shared setup for the server's ProcessPoolExecutors (password_hasher,
+wound_metrics).
+
+Workers are forked from the uvicorn process and inherit its signal
+handlers and listening socket. `init_worker` restores default SIGTERM
+handling, leaves Ctrl+C to the server, and exits the worker once the
+server process is gone, so no worker outlives it holding the port.
+"""
+
+import os
+import signal
+import threading
+import time
+
+
+def _exit_with_parent(parent_pid: int):
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+    os._exit(0)
+
+
+def init_worker():
+    # uvicorn's inherited handlers only flag the (parent's) server to stop, so SIGTERM would be ignored here
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the server
+    # If the server dies without shutting the pool down, don't linger holding its listening socket
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
@@ -0,0 +1,180 @@
+"""
+On-demand cProfile capture of individual requests.
+
+A request is profiled when it carries the admin token and asks for it:
+
+    curl -H "X-Admin-Token: $ADMIN_TOKEN" -H "X-Profile: wall" .../api/history?user_id=1
+    .../api/history?user_id=1&_profile=cpu&_admin_token=...
+
+or when PROFILE_SAMPLE_EVERY=N picks it (every Nth request, PROFILE_CLOCK).
+"wall" times functions by elapsed time, "cpu" by thread CPU time (waits
+vanish, only computation is left). Each profile is a pstats file plus a small
+JSON sidecar in PROFILE_DIR, kept as a ring of the newest PROFILE_MAX_FILES;
+list/download them via routes/admin.py.
+
+cProfile follows the event-loop thread, so coroutines of other requests
+that run while the profiled one awaits show up too, and work handed to
+threads (sync endpoints, run_in_executor) does not. Only one request is
+profiled at a time; others with the trigger are simply served unprofiled.
+
+When nothing triggers, the cost is a header scan and a counter per request;
+with no ADMIN_TOKEN and no sampling the middleware isn't installed at all.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import itertools
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+CLOCKS = {"wall": time.perf_counter, "cpu": time.thread_time}
+
+_active = False  # cProfile can't nest, and profiles on one thread would overlap anyway
+_request_counter = itertools.count(1)
+
+
+def enabled() -> bool:
+    return bool(config.ADMIN_TOKEN) or config.PROFILE_SAMPLE_EVERY > 0
+
+
+def token_matches(token) -> bool:
+    return bool(config.ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, config.ADMIN_TOKEN)
+
+
+def _requested_clock(scope):
+    """Clock asked for by an admin (header or query flag), else None"""
+    clock = token = None
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            clock = value.decode("latin-1").lower()
+        elif name == b"x-admin-token":
+            token = value.decode("latin-1")
+    query_string = scope.get("query_string", b"")
+    if clock is None and b"_profile=" in query_string:
+        params = parse_qs(query_string.decode("latin-1"))
+        clock = params.get("_profile", [""])[0].lower()
+        token = params.get("_admin_token", [token])[0]
+    if clock is None or not token_matches(token):
+        return None
+    return clock if clock in CLOCKS else "wall"
+
+
+def _choose_clock(scope):
+    if not config.ADMIN_TOKEN and config.PROFILE_SAMPLE_EVERY <= 0:
+        return None
+    clock = _requested_clock(scope) if config.ADMIN_TOKEN else None
+    if clock is None and config.PROFILE_SAMPLE_EVERY > 0 and next(_request_counter) % config.PROFILE_SAMPLE_EVERY == 0:
+        clock = config.PROFILE_CLOCK if config.PROFILE_CLOCK in CLOCKS else "wall"
+    return clock
+
+
+def _profile_path(profile_id: str, suffix: str) -> str:
+    return os.path.join(config.PROFILE_DIR, f"{profile_id}{suffix}")
+
+
+def _save(profiler: cProfile.Profile, meta: dict):
+    """Write <id>.prof + <id>.json, then trim the ring to PROFILE_MAX_FILES"""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(_profile_path(meta["id"], ".prof"))
+    with open(_profile_path(meta["id"], ".json"), "w") as f:
+        json.dump(meta, f)
+    for stale in list_profiles()[config.PROFILE_MAX_FILES:]:
+        delete_profile(stale["id"])
+
+
+def list_profiles() -> list:
+    """Sidecar metadata of stored profiles, newest first"""
+    if not os.path.isdir(config.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(config.PROFILE_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(config.PROFILE_DIR, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # Being written or trimmed right now
+    profiles.sort(key=lambda meta: meta["id"], reverse=True)
+    return profiles
+
+
+def profile_file(profile_id: str):
+    """Path of a stored .prof, or None (ids are generated here, so anything else is rejected)"""
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = _profile_path(profile_id, ".prof")
+    return path if os.path.exists(path) else None
+
+
+def delete_profile(profile_id: str):
+    for suffix in (".json", ".prof"):
+        try:
+            os.remove(_profile_path(profile_id, suffix))
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests picked by _choose_clock"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        clock = _choose_clock(scope)
+        if clock is None or _active:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _active = True
+        profiler = cProfile.Profile(CLOCKS[clock])
+        wall_started, cpu_started = time.perf_counter(), time.thread_time()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            profiler.disable()
+            wall_ms = (time.perf_counter() - wall_started) * 1000
+            cpu_ms = (time.thread_time() - cpu_started) * 1000
+            _active = False
+            route = scope.get("route")
+            meta = {
+                # Sortable: newest first when listed
+                "id": f"{datetime.now(timezone.utc):%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:6]}",
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None) or scope["path"],
+                "status": status,
+                "clock": clock,
+                "wall_ms": round(wall_ms, 2),
+                "cpu_ms": round(cpu_ms, 2),  # Event-loop thread, all coroutines
+            }
+            try:
+                await asyncio.to_thread(_save, profiler, meta)
+                logger.info(f"🔬 Profiled {meta['method']} {meta['path']} ({clock}, {meta['wall_ms']}ms) as {meta['id']}")
+            except OSError as e:
+                logger.warning(f"⚠️ Could not store profile: {e}")
@@ -0,0 +1,72 @@
+"""
+Print the database's execution plan for each hot router query
+(EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL).
+
+    python manage.py explain
+"""
+
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from database import SessionLocal, Wound, Case, Comparison, EmailVerificationOTP, Session as DBSession
+
+
+def hot_queries(db):
+    """(label, statement) pairs mirroring what the routers run, with sample parameters"""
+    from routes.history import latest_classification_query
+    
+    now = datetime.utcnow()
+    user_id, case_id = 1, 1
+    history = select(Wound).where(Wound.user_id == user_id)
+    
+    return [
+        ("history: page (offset)",
+         history.order_by(Wound.upload_date.desc(), Wound.id.desc()).offset(50).limit(51)),
+        ("history: page (cursor)",
+         history.where(tuple_(Wound.upload_date, Wound.id) < (now, 1000))
+         .order_by(Wound.upload_date.desc(), Wound.id.desc()).limit(51)),
+        ("history: case filter",
+         select(Wound).where(Wound.user_id == user_id, Wound.case_id == case_id)
+         .order_by(Wound.upload_date.desc(), Wound.id.desc()).limit(51)),
+        ("history: latest classification + recommendation",
+         latest_classification_query([1, 2, 3])),
+        ("cases: list",
+         select(Case, Wound.image_path).outerjoin(Wound, Wound.id == Case.latest_wound_id)
+         .where(Case.user_id == user_id).order_by(Case.created_at.desc())),
+        ("compare: cached result lookup",
+         select(Comparison).where(
+             Comparison.wound_id_before == 1, Comparison.wound_id_after == 2, Comparison.cache_key == "0" * 64
+         ).order_by(Comparison.created_at.desc()).limit(1)),
+        ("auth: OTP lookup",
+         select(EmailVerificationOTP).where(
+             EmailVerificationOTP.email == "user@example.com",
+             EmailVerificationOTP.otp_code == "123456",
+             EmailVerificationOTP.verified == False
+         ).limit(1)),
+        ("auth: session by token",
+         select(DBSession).where(DBSession.session_token == "token").limit(1)),
+        ("auth: expired session sweep",
+         select(DBSession.id).where(DBSession.expires_at < now).limit(1000)),
+    ]
+
+
+def explain(statement, conn) -> list:
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    rows = conn.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    # SQLite rows are (id, parent, notused, detail); Postgres rows are single text lines
+    return [row[-1] for row in rows]
+
+
+def print_query_plans():
+    db = SessionLocal()
+    try:
+        conn = db.connection()
+        for label, statement in hot_queries(db):
+            print(f"\n▶ {label}")
+            for line in explain(statement, conn):
+                print(f"    {line}")
+    finally:
+        db.close()
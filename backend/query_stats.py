@@ -0,0 +1,214 @@
+"""
+SQL statement accounting per request, and a query budget for tests.
+
+Engine-wide cursor events time every statement. The time feeds the
+db_queries_total / db_query_duration_seconds metrics and whichever
+QueryStats is collecting:
+
+- QueryStatsMiddleware gives each request one. With QUERY_DEBUG_HEADERS
+  (off by default: not for production) the response carries X-DB-Queries
+  (count, time, most repeats of one statement shape) and a Server-Timing
+  "db" entry. The totals go to the per-route histograms in
+  metrics.py. A shape run more than QUERY_REPEAT_THRESHOLD times in one
+  request (a query inside a loop, i.e. N+1) is logged with its SQL and
+  counted in db_repeated_statement_requests_total.
+- query_budget() collects the statements run in its context while it is
+  open (including requests made through TestClient, which carries the
+  caller's context into the app) and raises QueryBudgetExceeded (an
+  AssertionError) past its limits. Background tasks started elsewhere,
+  such as the email dispatcher, are not counted:
+
+      with query_stats.query_budget(max_queries=6, max_repeats=2):
+          client.get("/api/history?user_id=1")
+
+  tests/conftest.py exposes it as the `query_budget` fixture.
+
+A statement's "shape" is its SQL with literals and bound parameters
+replaced by ? and IN (?, ?, ...) lists collapsed, so the same query with
+different ids counts as a repeat. Shapes are cached per distinct SQL
+string; recording a statement costs a few microseconds.
+"""
+
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_NUMBERED_PARAMS = re.compile(r"\$\d+|%\(\w+\)s|(?<![:\w]):\w+")  # asyncpg / psycopg / named styles
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def normalize(statement: str) -> str:
+    """SQL shape: literals/parameters -> ?, IN lists -> (?), whitespace collapsed"""
+    shape = _NUMBERED_PARAMS.sub("?", statement)
+    shape = _LITERALS.sub("?", shape)
+    shape = _SPACES.sub(" ", shape).strip()
+    return _PARAM_LISTS.sub("(?)", shape)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    """Statement count, time and per-shape repeats of one request (or budget)"""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}  # shape -> [count, seconds]
+
+    def add(self, statement: str, elapsed: float):
+        self.count += 1
+        self.seconds += elapsed
+        shape = normalize(statement)
+        entry = self.statements.get(shape)
+        if entry is None:
+            self.statements[shape] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def max_repeat(self) -> int:
+        return max((entry[0] for entry in self.statements.values()), default=0)
+
+    def repeated(self, threshold: int) -> list:
+        """(shape, count, seconds) of shapes run more than `threshold` times, most first"""
+        return sorted(
+            ((shape, count, seconds) for shape, (count, seconds) in self.statements.items() if count > threshold),
+            key=lambda item: -item[1]
+        )
+
+    def report(self, limit: int = 10) -> str:
+        lines = [f"{self.count} statements in {self.seconds * 1000:.2f}ms"]
+        top = sorted(self.statements.items(), key=lambda item: -item[1][0])[:limit]
+        for shape, (count, seconds) in top:
+            lines.append(f"  {count:>4}x {seconds * 1000:8.2f}ms  {shape[:200]}")
+        return "\n".join(lines)
+
+
+_current = ContextVar("query_stats", default=None)
+_budgets = ContextVar("query_budgets", default=())  # Open query_budget() collectors, innermost last
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_stats_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    operation = statement.lstrip()[:6].upper()
+    if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+        operation = "OTHER"
+    metrics.DB_QUERIES.inc(operation)
+    metrics.DB_QUERY_LATENCY.observe(elapsed, operation)
+    stats = _current.get()
+    if stats is not None:
+        stats.add(statement, elapsed)
+    for budget in _budgets.get():
+        budget.add(statement, elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None:
+        starts = connection.info.get("query_stats_start")
+        if starts:
+            starts.pop()
+
+
+@contextmanager
+def query_budget(max_queries: int = None, max_repeats: int = None):
+    """
+    Fail (QueryBudgetExceeded) if the block runs more than `max_queries`
+    statements, or any one statement shape more than `max_repeats` times.
+    Budgets nest; each counts everything run inside it.
+    """
+    stats = QueryStats()
+    token = _budgets.set((*_budgets.get(), stats))
+    try:
+        yield stats
+    finally:
+        _budgets.reset(token)
+
+    problems = []
+    if max_queries is not None and stats.count > max_queries:
+        problems.append(f"{stats.count} statements (budget {max_queries})")
+    if max_repeats is not None:
+        for shape, count, _ in stats.repeated(max_repeats):
+            problems.append(f"{count}x the same statement (budget {max_repeats}): {shape[:200]}")
+    if problems:
+        raise QueryBudgetExceeded("Query budget exceeded: " + "; ".join(problems) + "\n" + stats.report())
+
+
+def _log_repeats(scope, route: str, stats: QueryStats):
+    repeated = stats.repeated(config.QUERY_REPEAT_THRESHOLD)
+    if not repeated:
+        return
+    metrics.DB_REPEATED_STATEMENTS.inc(route)
+    shape, count, seconds = repeated[0]
+    logger.warning(f"🔁 Statement repeated {count}x in one request (N+1?)", extra={
+        "method": scope["method"],
+        "route": route,
+        "repeats": count,
+        "repeat_ms": round(seconds * 1000, 2),
+        "statement": shape[:500],
+        "queries": stats.count,
+    })
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware: per-request statement stats as headers, metrics and N+1 warnings"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+
+        async def send_with_stats(message):
+            # Statements run while a response streams come after these headers
+            if message["type"] == "http.response.start" and config.QUERY_DEBUG_HEADERS:
+                time_ms = round(stats.seconds * 1000, 2)
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"x-db-queries", f"count={stats.count}; time_ms={time_ms}; max_repeat={stats.max_repeat()}".encode()),
+                    (b"server-timing", f'db;dur={time_ms};desc="{stats.count} queries"'.encode()),
+                ]
+            await send(message)
+
+        token = _current.set(stats)
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or metrics.UNMATCHED_ROUTE
+            metrics.DB_REQUEST_QUERIES.observe(stats.count, route)
+            metrics.DB_REQUEST_TIME.observe(stats.seconds, route)
+            _log_repeats(scope, route, stats)
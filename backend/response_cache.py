@@ -0,0 +1,211 @@
+"""
+Per-user response cache for read endpoints.
+
+Entries are keyed by user, path, query string and a per-user generation
+counter. Every write route bumps the user's generation, which makes all of
+that user's cached pages unreachable at once; stale entries then age out via
+LRU/TTL. Responses carry an ETag so clients can revalidate with 304s.
+
+Backends:
+- "memory": in-process LRU (per worker)
+- "sqlite": a local SQLite file shared by every worker on the host
+- "none":   caching disabled
+"""
+
+import hashlib
+import inspect
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from config import config
+import metrics
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, 0)
+
+    def bump(self, user_id: int):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            etag, body, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return etag, body
+
+    def set(self, key: str, etag: str, body: bytes):
+        with self._lock:
+            self._entries[key] = (etag, body, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteBackend:
+    """Cache stored in a local SQLite file so all workers share entries and generations"""
+
+    # Trim to max_entries roughly every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, etag TEXT NOT NULL, body BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_generations (user_id INTEGER PRIMARY KEY, generation INTEGER NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def generation(self, user_id: int) -> int:
+        row = self._conn().execute(
+            "SELECT generation FROM cache_generations WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, user_id: int):
+        self._conn().execute(
+            "INSERT INTO cache_generations (user_id, generation) VALUES (?, 1) "
+            "ON CONFLICT(user_id) DO UPDATE SET generation = generation + 1",
+            (user_id,)
+        )
+
+    def get(self, key: str):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT etag, body FROM cache_entries WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0], bytes(row[1])
+
+    def set(self, key: str, etag: str, body: bytes):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, etag, body, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, etag, body, now + self.ttl_seconds, now)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                "SELECT key FROM cache_entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = config.RESPONSE_CACHE_BACKEND
+                if kind == "sqlite":
+                    _backend = SQLiteBackend(
+                        config.RESPONSE_CACHE_PATH, config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_TTL_SECONDS
+                    )
+                elif kind == "memory":
+                    _backend = MemoryBackend(config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_TTL_SECONDS)
+                else:
+                    _backend = False
+    return _backend
+
+
+def bump(user_id):
+    """Invalidate every cached read for this user (call after a successful write)"""
+    backend = get_backend()
+    if backend and user_id is not None:
+        backend.bump(user_id)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+async def _render(build) -> bytes:
+    result = build()
+    if inspect.isawaitable(result):
+        result = await result
+    return result.model_dump_json().encode()
+
+
+def _respond(request: Request, etag: str, body: bytes, cache_status: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "X-Cache": cache_status}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def cached_response(request: Request, user_id: int, build) -> Response:
+    """
+    Serve `build()` (returning a pydantic model, or an awaitable of one) through
+    the cache. Errors raised by `build` propagate and are never cached.
+    """
+    backend = get_backend()
+    if not backend:
+        metrics.RESPONSE_CACHE.inc("BYPASS")
+        body = await _render(build)
+        return _respond(request, _etag(body), body, "BYPASS")
+
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    key = f"{user_id}:{backend.generation(user_id)}:{request.url.path}?{query}"
+
+    hit = backend.get(key)
+    if hit is not None:
+        metrics.RESPONSE_CACHE.inc("HIT")
+        etag, body = hit
+        return _respond(request, etag, body, "HIT")
+
+    metrics.RESPONSE_CACHE.inc("MISS")
+    body = await _render(build)
+    etag = _etag(body)
+    backend.set(key, etag, body)
+    return _respond(request, etag, body, "MISS")
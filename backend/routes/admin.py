@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import Optional
+import asyncio
+import io
+import pstats
+from config import config
+import profiling
+
+router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints exist only when ADMIN_TOKEN is set, and need it in X-Admin-Token"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.token_matches(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Stored request profiles, newest first (see profiling.py)"""
+    profiles = await asyncio.to_thread(profiling.list_profiles)
+    return {"success": True, "profiles": profiles}
+
+def _stats_text(path: str, sort: str, limit: int) -> str:
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(
+    profile_id: str,
+    format: str = Query("prof", pattern="^(prof|text)$", description="prof = pstats file (snakeviz, pstats), text = top functions"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    limit: int = Query(40, ge=1, le=500)
+):
+    """Download one profile, or read its hottest functions as text"""
+    path = profiling.profile_file(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    if format == "text":
+        return PlainTextResponse(await asyncio.to_thread(_stats_text, path, sort, limit))
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
@@ -1,41 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db, User, Session as DBSession, EmailVerificationOTP
-from models import SignupRequest, LoginRequest, LogoutRequest, VerifySessionRequest, AuthResponse, UserResponse
-from passlib.context import CryptContext
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_read_db, User, Session as DBSession, EmailVerificationOTP
+from models import SignupRequest, LoginRequest, LogoutRequest, VerifySessionRequest, AuthResponse
 from datetime import datetime, timedelta
-from email_service import generate_otp, send_otp_email
+from email_service import generate_otp, queue_otp_email, queue_password_reset_email
 from config import config
+import email_outbox
+import password_hasher
 import secrets
+import session_cache
 
 router = APIRouter()
 
-# Password hashing - Configure bcrypt to handle long passwords
-# bcrypt has a 72-byte limit, so we configure it to automatically truncate
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__truncate_error=False  # Allow passwords longer than 72 bytes by truncating
-)
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 def generate_session_token() -> str:
     return secrets.token_urlsafe(32)
 
 @router.post("/signup")
 async def signup(
     request: SignupRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new user account and send OTP for verification"""
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == request.email).first()
+    existing_user = (await db.execute(select(User).where(User.email == request.email))).scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -43,48 +32,34 @@ async def signup(
     user = User(
         name=request.name,
         email=request.email,
-        password_hash=hash_password(request.password),
+        password_hash=await password_hasher.hash_password(request.password),
         email_verified=False
     )
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Generate OTP
     otp_code = generate_otp()
     expires_at = datetime.utcnow() + timedelta(minutes=config.OTP_EXPIRY_MINUTES)
     
     # Clean up old OTPs for this email
-    db.query(EmailVerificationOTP).filter(
+    await db.execute(delete(EmailVerificationOTP).where(
         EmailVerificationOTP.email == request.email,
         EmailVerificationOTP.verified == False
-    ).delete()
+    ))
     
-    # Save OTP to database
+    # Save OTP to database, with its email queued in the same transaction
     otp_record = EmailVerificationOTP(
         email=request.email,
         otp_code=otp_code,
         expires_at=expires_at
     )
     db.add(otp_record)
-    db.commit()
-    
-    # Send OTP email
-    email_sent = send_otp_email(request.email, otp_code, request.name)
-
-    if not email_sent:
-        # Email delivery failed but we keep the account + OTP alive.
-        # The OTP was already printed to server logs (dev fallback).
-        # Return success so the user can still proceed — they can resend later.
-        print(f"⚠️  Email delivery failed for {request.email}. OTP={otp_code} (check server logs)")
-        return {
-            "success": True,
-            "message": "Account created. Email delivery failed — please use the Resend Code option on the next screen.",
-            "email": request.email,
-            "otp_sent": False,
-            "email_delivery_failed": True
-        }
+    queue_otp_email(db, request.email, otp_code, request.name)
+    await db.commit()
+    email_outbox.notify()
 
     return {
         "success": True,
@@ -98,16 +73,16 @@ async def signup(
 async def verify_otp(
     email: str,
     otp_code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Verify OTP and complete user registration"""
     
     # Find OTP record
-    otp_record = db.query(EmailVerificationOTP).filter(
+    otp_record = (await db.execute(select(EmailVerificationOTP).where(
         EmailVerificationOTP.email == email,
         EmailVerificationOTP.otp_code == otp_code,
         EmailVerificationOTP.verified == False
-    ).first()
+    ))).scalars().first()
     
     if not otp_record:
         raise HTTPException(status_code=400, detail="Invalid OTP code")
@@ -120,7 +95,7 @@ async def verify_otp(
     otp_record.verified = True
     
     # Update user email verification status
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -137,24 +112,13 @@ async def verify_otp(
     )
     
     db.add(session)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    session_cache.remember(session_token, user, expires_at)
     
     return AuthResponse(
         success=True,
-        user=UserResponse(
-            id=user.id,
-            name=user.name,
-            email=user.email,
-            email_verified=user.email_verified,
-            phone=user.phone,
-            date_of_birth=user.date_of_birth,
-            blood_type=user.blood_type,
-            emergency_contact=user.emergency_contact,
-            emergency_phone=user.emergency_phone,
-            profile_image=user.profile_image,
-            created_at=user.created_at
-        ),
+        user=session_cache.user_snapshot(user),
         session_token=session_token,
         expires_at=expires_at.isoformat()
     )
@@ -163,12 +127,12 @@ async def verify_otp(
 @router.post("/resend-otp")
 async def resend_otp(
     email: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Resend OTP to user's email"""
     
     # Check if user exists
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -181,10 +145,10 @@ async def resend_otp(
     expires_at = datetime.utcnow() + timedelta(minutes=config.OTP_EXPIRY_MINUTES)
     
     # Clean up old OTPs for this email
-    db.query(EmailVerificationOTP).filter(
+    await db.execute(delete(EmailVerificationOTP).where(
         EmailVerificationOTP.email == email,
         EmailVerificationOTP.verified == False
-    ).delete()
+    ))
     
     # Save new OTP
     otp_record = EmailVerificationOTP(
@@ -193,10 +157,9 @@ async def resend_otp(
         expires_at=expires_at
     )
     db.add(otp_record)
-    db.commit()
-    
-    # Send OTP email
-    send_otp_email(email, otp_code, user.name)
+    queue_otp_email(db, email, otp_code, user.name)
+    await db.commit()
+    email_outbox.notify()
     
     return {
         "success": True,
@@ -207,14 +170,21 @@ async def resend_otp(
 @router.post("/login", response_model=AuthResponse)
 async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Login with email and password"""
     
     # Find user
-    user = db.query(User).filter(User.email == request.email).first()
-    if not user or not verify_password(request.password, user.password_hash):
+    user = (await db.execute(select(User).where(User.email == request.email))).scalars().first()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    # bcrypt runs in the hashing pool; hashes made with an older work factor are upgraded here
+    valid, new_hash = await password_hasher.verify_and_update(request.password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        user.password_hash = new_hash
     
     # Create session
     session_token = generate_session_token()
@@ -227,23 +197,12 @@ async def login(
     )
     
     db.add(session)
-    db.commit()
+    await db.commit()
+    session_cache.remember(session_token, user, expires_at)
     
     return AuthResponse(
         success=True,
-        user=UserResponse(
-            id=user.id,
-            name=user.name,
-            email=user.email,
-            email_verified=user.email_verified,
-            phone=user.phone,
-            date_of_birth=user.date_of_birth,
-            blood_type=user.blood_type,
-            emergency_contact=user.emergency_contact,
-            emergency_phone=user.emergency_phone,
-            profile_image=user.profile_image,
-            created_at=user.created_at
-        ),
+        user=session_cache.user_snapshot(user),
         session_token=session_token,
         expires_at=expires_at.isoformat()
     )
@@ -252,17 +211,18 @@ async def login(
 @router.post("/logout")
 async def logout(
     request: LogoutRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Logout and invalidate session"""
     
-    session = db.query(DBSession).filter(
+    session = (await db.execute(select(DBSession).where(
         DBSession.session_token == request.session_token
-    ).first()
+    ))).scalars().first()
     
     if session:
-        db.delete(session)
-        db.commit()
+        await db.delete(session)
+        await db.commit()
+    session_cache.forget(request.session_token)
     
     return {"success": True, "message": "Logged out successfully"}
 
@@ -270,37 +230,16 @@ async def logout(
 @router.post("/verify_session")
 async def verify_session(
     request: VerifySessionRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Verify if session is valid"""
     
-    session = db.query(DBSession).filter(
-        DBSession.session_token == request.session_token
-    ).first()
-    
-    if not session or session.expires_at < datetime.utcnow():
+    # Cache hit: no database round-trips (see session_cache.py)
+    user = await session_cache.lookup(db, request.session_token)
+    if user is None:
         return AuthResponse(success=False, error="Invalid or expired session")
     
-    user = db.query(User).filter(User.id == session.user_id).first()
-    if not user:
-        return AuthResponse(success=False, error="User not found")
-    
-    return AuthResponse(
-        success=True,
-        user=UserResponse(
-            id=user.id,
-            name=user.name,
-            email=user.email,
-            email_verified=user.email_verified,
-            phone=user.phone,
-            date_of_birth=user.date_of_birth,
-            blood_type=user.blood_type,
-            emergency_contact=user.emergency_contact,
-            emergency_phone=user.emergency_phone,
-            profile_image=user.profile_image,
-            created_at=user.created_at
-        )
-    )
+    return AuthResponse(success=True, user=user)
 
 
 # ─── Forgot Password Flow ───────────────────────────────────────────────────
@@ -308,20 +247,20 @@ async def verify_session(
 @router.post("/forgot-password")
 async def forgot_password(
     email: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Send a password-reset OTP to the user's email"""
 
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if not user:
         # Return success even when user not found to avoid email enumeration
         return {"success": True, "message": "If this email exists, a reset code has been sent."}
 
     # Clean up any old UNVERIFIED reset OTPs for this email
-    db.query(EmailVerificationOTP).filter(
+    await db.execute(delete(EmailVerificationOTP).where(
         EmailVerificationOTP.email == "reset:" + email,
         EmailVerificationOTP.verified == False
-    ).delete()
+    ))
 
     otp_code = generate_otp()
     expires_at = datetime.utcnow() + timedelta(minutes=config.OTP_EXPIRY_MINUTES)
@@ -332,20 +271,9 @@ async def forgot_password(
         expires_at=expires_at
     )
     db.add(otp_record)
-    db.commit()
-
-    from email_service import send_password_reset_email
-    email_sent = send_password_reset_email(email, otp_code, user.name)
-
-    if not email_sent:
-        db.query(EmailVerificationOTP).filter(
-            EmailVerificationOTP.email == "reset:" + email
-        ).delete()
-        db.commit()
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to send reset email. Please try again."
-        )
+    queue_password_reset_email(db, email, otp_code, user.name)
+    await db.commit()
+    email_outbox.notify()
 
     return {"success": True, "message": "Password reset code sent to your email."}
 
@@ -354,15 +282,15 @@ async def forgot_password(
 async def verify_reset_otp(
     email: str,
     otp_code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Verify the password-reset OTP without changing the password yet"""
 
-    otp_record = db.query(EmailVerificationOTP).filter(
+    otp_record = (await db.execute(select(EmailVerificationOTP).where(
         EmailVerificationOTP.email == "reset:" + email,
         EmailVerificationOTP.otp_code == otp_code,
         EmailVerificationOTP.verified == False
-    ).first()
+    ))).scalars().first()
 
     if not otp_record:
         raise HTTPException(status_code=400, detail="Invalid or already used reset code.")
@@ -372,7 +300,7 @@ async def verify_reset_otp(
 
     # Mark as verified so it can be used once for the reset step
     otp_record.verified = True
-    db.commit()
+    await db.commit()
 
     return {"success": True, "message": "Code verified. You may now set a new password."}
 
@@ -382,16 +310,16 @@ async def reset_password(
     email: str,
     otp_code: str,
     new_password: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Reset the user's password — requires a previously verified OTP"""
 
     # Check that a VERIFIED record exists (set in verify-reset-otp)
-    otp_record = db.query(EmailVerificationOTP).filter(
+    otp_record = (await db.execute(select(EmailVerificationOTP).where(
         EmailVerificationOTP.email == "reset:" + email,
         EmailVerificationOTP.otp_code == otp_code,
         EmailVerificationOTP.verified == True
-    ).first()
+    ))).scalars().first()
 
     if not otp_record:
         raise HTTPException(status_code=400, detail="Reset code not verified or already used.")
@@ -399,14 +327,15 @@ async def reset_password(
     if otp_record.expires_at < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Reset code has expired. Please restart the process.")
 
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
 
-    user.password_hash = hash_password(new_password)
+    user.password_hash = await password_hasher.hash_password(new_password)
 
     # Delete the used OTP record
-    db.delete(otp_record)
-    db.commit()
+    await db.delete(otp_record)
+    await db.commit()
+    session_cache.forget_user(user.id)
 
     return {"success": True, "message": "Password has been reset successfully."}
@@ -1,9 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db, Wound, Classification
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, mark_primary_sticky, Wound, Classification
 from models import ClassifyRequest, ClassificationResponse
 import google.generativeai as genai
 from config import config
+import analytics
+import metrics
+import response_cache
+import search_index
+import trajectory
+from tissue import apply_override
+import asyncio
+import copy
 import json
 import time
 from pathlib import Path
@@ -16,12 +25,12 @@ genai.configure(api_key=config.GEMINI_API_KEY)
 @router.post("/classify", response_model=ClassificationResponse)
 async def classify_wound(
     request: ClassifyRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Classify wound using Gemini Vision API"""
     
     # Get wound from database
-    wound = db.query(Wound).filter(Wound.id == request.wound_id).first()
+    wound = (await db.execute(select(Wound).where(Wound.id == request.wound_id))).scalar_one_or_none()
     if not wound:
         raise HTTPException(status_code=404, detail="Wound not found")
     
@@ -33,7 +42,8 @@ async def classify_wound(
         start_time = time.time()
         
         # Upload image to Gemini
-        uploaded_file = genai.upload_file(wound.image_path)
+        with metrics.ai_call("-", "upload"):
+            uploaded_file = await asyncio.to_thread(genai.upload_file, wound.image_path)
         
         # Create prompt for wound classification
         prompt = """Act as a specialized Wound Care AI. Your task is to calculate the TISSUE COMPOSITION with extreme cynicism.
@@ -104,15 +114,19 @@ Provide your response in this exact JSON format:
         last_error = None
         
         for m_name in model_names:
+            started = time.perf_counter()
             try:
                 model = genai.GenerativeModel(m_name)
-                response = model.generate_content(
+                response = await asyncio.to_thread(
+                    model.generate_content,
                     [uploaded_file, prompt],
                     generation_config={"response_mime_type": "application/json"}
                 )
+                metrics.observe_ai_call(m_name, "generate", started)
                 if response:
                     break
             except Exception as e:
+                metrics.observe_ai_call(m_name, "generate", started, e)
                 last_error = e
                 continue
         
@@ -125,16 +139,17 @@ Provide your response in this exact JSON format:
         response_text = response.text.strip()
         
         # Robust JSON extraction
-        try:
-            result = json.loads(response_text)
-        except json.JSONDecodeError:
-            # Fallback: extract substring between { and }
-            start = response_text.find("{")
-            end = response_text.rfind("}") + 1
-            if start >= 0 and end > start:
-                result = json.loads(response_text[start:end])
-            else:
-                raise
+        with metrics.timed(metrics.AI_PARSE_LATENCY, "classify"):
+            try:
+                result = json.loads(response_text)
+            except json.JSONDecodeError:
+                # Fallback: extract substring between { and }
+                start = response_text.find("{")
+                end = response_text.rfind("}") + 1
+                if start >= 0 and end > start:
+                    result = json.loads(response_text[start:end])
+                else:
+                    raise
         
         # Save classification to database
         classification = Classification(
@@ -157,45 +172,26 @@ Provide your response in this exact JSON format:
         wound.tissue_composition = result.get("tissue_composition")
         wound.analysis = result
         
-        db.commit()
-        db.refresh(classification)
-        
         # ---------------------------------------------------------
         # DETERMINISTIC OVERRIDE: Force Classification based on Tissue
+        # (on a copy: the classification and wound keep the model's own answer)
         # ---------------------------------------------------------
-        t_comp = result.get("tissue_composition", {})
-        p_pink = t_comp.get("pink", 0)
-        p_red = t_comp.get("red", 0)
-        p_yellow = t_comp.get("yellow", 0)
-        p_black = t_comp.get("black", 0)
-        p_white = t_comp.get("white", 0)
-        
-        total_slough = p_yellow + p_white
-        total_necrosis = p_black
-        
-        # Default to AI's analysis, but override if logic dictates
-        final_wound_type = result.get("wound_type", "Unknown")
-        final_probabilities = result.get("probabilities", {})
-        
-        if total_necrosis >= 10:
-            final_wound_type = "High Urgency"
-            final_probabilities["High Urgency"] = 100
-        elif total_slough >= 20:
-            if result.get("discharge_detected") and result.get("discharge_type") in ["yellow", "green"]:
-                 final_wound_type = "Active Infection"
-                 final_probabilities["Active Infection"] = 90
-            else:
-                 final_wound_type = "Delayed Healing"
-                 final_probabilities["Delayed Healing"] = 90
-        elif total_slough >= 5 and "Normal" in final_wound_type:
-             # Prevent "Normal" tag if visible slough exists
-             final_wound_type = "Delayed Healing"
-             final_probabilities["Delayed Healing"] = 80
-             
-        # Apply override
-        result["wound_type"] = final_wound_type
-        result["probabilities"] = final_probabilities
-        # ---------------------------------------------------------
+        final_wound_type, final_probabilities = apply_override(copy.deepcopy(result))
+        
+        # Analytics, searchable columns and the case's healing trajectory are
+        # written in the same transaction as the classification itself
+        await db.run_sync(analytics.record_classification, wound, classification)
+        await db.run_sync(search_index.index_wound, wound, result, final_wound_type)
+        if wound.case_id:
+            await db.run_sync(
+                trajectory.record_classification,
+                wound, result.get("tissue_composition"), final_wound_type, result.get("confidence")
+            )
+        await db.commit()
+        
+        response_cache.bump(wound.user_id)
+        
+        mark_primary_sticky(wound.user_id, wound.case_id)
 
         return ClassificationResponse(
             success=True,
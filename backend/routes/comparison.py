@@ -1,27 +1,108 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db, Wound, Comparison
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from database import get_db, mark_primary_sticky, Wound, Comparison, Classification
 from models import CompareRequest, ComparisonResponse, SaveComparisonRequest
 import google.generativeai as genai
 from config import config
+from PIL import Image
+import response_cache
+import wound_metrics
+import asyncio
+import hashlib
+import io
 import json
+import logging
+import metrics
 from pathlib import Path
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Bump whenever the comparison prompt changes so cached results are not reused
+PROMPT_VERSION = "compare-v2"
+
+# Longest side (px) of images sent to Gemini; larger photos are downscaled first
+MAX_UPLOAD_DIMENSION = 1536
 
 # Configure Gemini
 genai.configure(api_key=config.GEMINI_API_KEY)
 
-@router.post("/compare", response_model=ComparisonResponse)
-async def compare_wounds(
-    request: CompareRequest,
-    db: Session = Depends(get_db)
-):
-    """Compare two wounds using Gemini Vision API"""
-    
-    # Get both wounds
-    base_wound = db.query(Wound).filter(Wound.id == request.base_wound_id).first()
-    current_wound = db.query(Wound).filter(Wound.id == request.current_wound_id).first()
+def _prepare_image(image_path: str) -> io.BytesIO:
+    """Downscale and re-encode an image so the Gemini upload stays small"""
+    with Image.open(image_path) as img:
+        img = img.convert("RGB")
+        img.thumbnail((MAX_UPLOAD_DIMENSION, MAX_UPLOAD_DIMENSION))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=90)
+    buffer.seek(0)
+    return buffer
+
+
+def _prepare_and_upload(image_path: str):
+    """Prepare one wound image and upload it to Gemini (runs in a worker thread)"""
+    with metrics.ai_call("-", "upload"):
+        return genai.upload_file(_prepare_image(image_path), mime_type="image/jpeg")
+
+
+def _stored_analysis(wound: Wound) -> dict:
+    """What we already know about a wound (the prompt's ground truth, and part of the cache key)"""
+    analysis = wound.analysis or {}
+    known = {
+        "wound_type": wound.classification or analysis.get("wound_type"),
+        "confidence": wound.confidence,
+        "tissue_composition": wound.tissue_composition or analysis.get("tissue_composition"),
+        "redness_level": wound.redness_level,
+        "discharge_detected": wound.discharge_detected,
+        "discharge_type": wound.discharge_type,
+        "edge_quality": wound.edge_quality,
+        "wound_location": analysis.get("wound_location"),
+        "notes": analysis.get("notes"),
+    }
+    return {k: v for k, v in known.items() if v is not None}
+
+
+def _describe_stored_analysis(label: str, wound: Wound) -> str:
+    """Summarise what we already know about a wound so the model doesn't re-derive it"""
+    known = _stored_analysis(wound)
+    if not known:
+        return f"- {label} image: no stored analysis available."
+    return f"- {label} image ({wound.upload_date.isoformat()}): {json.dumps(known)}"
+
+
+def _describe_metrics(image_metrics) -> str:
+    """Render locally measured deltas for the prompt"""
+    if not image_metrics:
+        return "- Not available."
+    return "\n".join([
+        f"- Wound area: {image_metrics['baseline']['wound_area_percent']}% -> {image_metrics['current']['wound_area_percent']}% of frame "
+        f"(change: {image_metrics['wound_area_change_percent']}%)",
+        f"- Tissue composition baseline: {json.dumps(image_metrics['baseline']['tissue_composition'])}",
+        f"- Tissue composition current: {json.dumps(image_metrics['current']['tissue_composition'])}",
+        f"- Tissue delta (percentage points): {json.dumps(image_metrics['tissue_delta'])}",
+        f"- Edge sharpness change: {image_metrics['edge_sharpness_change']} (positive = crisper margins)",
+    ])
+
+
+async def _safe_metrics(base_path: str, current_path: str):
+    """Local metrics are best-effort grounding; never fail the comparison on them"""
+    try:
+        return await wound_metrics.compare_images_async(base_path, current_path)
+    except Exception as e:
+        logger.warning(f"⚠️  Local comparison metrics failed: {e}")
+        return None
+
+
+async def _load_wound_pair(db: AsyncSession, base_wound_id: int, current_wound_id: int, with_analysis: bool = False):
+    """Fetch both wounds in a single query and make sure their images exist"""
+    query = select(Wound).where(Wound.id.in_([base_wound_id, current_wound_id]))
+    if with_analysis:
+        query = query.options(undefer(Wound.analysis))
+    wounds = (await db.execute(query)).scalars().all()
+    wounds_by_id = {w.id: w for w in wounds}
+    base_wound = wounds_by_id.get(base_wound_id)
+    current_wound = wounds_by_id.get(current_wound_id)
     
     if not base_wound or not current_wound:
         raise HTTPException(status_code=404, detail="One or both wounds not found")
@@ -30,16 +111,114 @@ async def compare_wounds(
     if not Path(base_wound.image_path).exists() or not Path(current_wound.image_path).exists():
         raise HTTPException(status_code=404, detail="One or both image files not found")
     
+    return base_wound, current_wound
+
+
+def _file_sha256(image_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _comparison_cache_key(db: AsyncSession, base_wound: Wound, current_wound: Wound) -> str:
+    """
+    Cache key from both images' content hashes, the prompt version, and what
+    the prompt says about each wound: its stored analysis and latest
+    classification id, so /save_analysis or a re-classify invalidates it
+    """
+    missing = [w for w in (base_wound, current_wound) if not w.image_sha256]
+    if missing:
+        # Wounds uploaded before hashes were recorded: hash once and remember
+        hashes = await asyncio.gather(*(asyncio.to_thread(_file_sha256, w.image_path) for w in missing))
+        for wound, image_hash in zip(missing, hashes):
+            wound.image_sha256 = image_hash
+        await db.commit()
+    
+    latest_classifications = dict((await db.execute(
+        select(Classification.wound_id, func.max(Classification.id))
+        .where(Classification.wound_id.in_([base_wound.id, current_wound.id]))
+        .group_by(Classification.wound_id)
+    )).all())
+    stored = json.dumps([
+        [_stored_analysis(wound), latest_classifications.get(wound.id)] for wound in (base_wound, current_wound)
+    ], sort_keys=True, default=str)
+    raw = f"{base_wound.image_sha256}:{current_wound.image_sha256}:{PROMPT_VERSION}:{hashlib.sha256(stored.encode()).hexdigest()}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+@router.post("/compare/metrics", response_model=ComparisonResponse)
+async def compare_wound_metrics(
+    request: CompareRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Compute local, reproducible image-diff metrics for two wounds (no AI call)"""
+    
+    base_wound, current_wound = await _load_wound_pair(db, request.base_wound_id, request.current_wound_id)
+    
+    try:
+        image_metrics = await wound_metrics.compare_images_async(base_wound.image_path, current_wound.image_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Metric computation failed: {str(e)}")
+    
+    return ComparisonResponse(success=True, metrics=image_metrics)
+
+
+@router.post("/compare", response_model=ComparisonResponse)
+async def compare_wounds(
+    request: CompareRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Compare two wounds using Gemini Vision API"""
+    
+    base_wound, current_wound = await _load_wound_pair(
+        db, request.base_wound_id, request.current_wound_id, with_analysis=True
+    )
+    
+    # Serve a stored comparison of the same image pair if we have one
+    cache_key = await _comparison_cache_key(db, base_wound, current_wound)
+    cached = (await db.execute(
+        select(Comparison).where(
+            Comparison.wound_id_before == base_wound.id,
+            Comparison.wound_id_after == current_wound.id,
+            Comparison.cache_key == cache_key
+        ).order_by(Comparison.created_at.desc()).limit(1)
+    )).scalar_one_or_none()
+    if cached:
+        return ComparisonResponse(
+            success=True,
+            comparison=cached.analysis,
+            metrics=cached.metrics,
+            cached=True
+        )
+    
     try:
-        # Upload images to Gemini
-        base_file = genai.upload_file(base_wound.image_path)
-        current_file = genai.upload_file(current_wound.image_path)
+        # Compute local metrics and upload both images to Gemini concurrently
+        image_metrics, base_file, current_file = await asyncio.gather(
+            _safe_metrics(base_wound.image_path, current_wound.image_path),
+            asyncio.to_thread(_prepare_and_upload, base_wound.image_path),
+            asyncio.to_thread(_prepare_and_upload, current_wound.image_path),
+        )
+        
+        # Stored per-wound analysis lets the model focus on the change itself
+        stored_context = "\n".join([
+            _describe_stored_analysis("Baseline", base_wound),
+            _describe_stored_analysis("Current", current_wound),
+        ])
         
         # Create comparison prompt
-        prompt = """Compare these two surgical wound images (first image is the baseline, second is current state).
+        prompt = f"""Compare these two surgical wound images (first image is the baseline, second is current state).
+
+Each image has already been analysed individually. Treat these stored findings as ground truth
+and do not re-derive them; focus on what changed between the two images:
+{stored_context}
+
+Locally measured image deltas (pixel-based, use them to ground sizeChange and colorChange):
+{_describe_metrics(image_metrics)}
 
 Provide a detailed comparative analysis in JSON format:
-{
+{{
   "overallAssessment": "improving/stable/worsening",
   "healingProgress": 0-100,
   "sizeChange": "percentage change",
@@ -53,11 +232,12 @@ Provide a detailed comparative analysis in JSON format:
   "positiveChanges": ["array of improvements"],
   "summary": "overall comparison summary",
   "confidence": 0-100
-}"""
+}}"""
         
-        # Call Gemini API with both images
+        # Call Gemini API with both images (off the event loop)
         model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content([base_file, current_file, prompt])
+        with metrics.ai_call('gemini-1.5-flash', "generate"):
+            response = await asyncio.to_thread(model.generate_content, [base_file, current_file, prompt])
         
         response_text = response.text.strip()
         
@@ -71,11 +251,26 @@ Provide a detailed comparative analysis in JSON format:
             json_end = response_text.find("```", json_start)
             response_text = response_text[json_start:json_end].strip()
         
-        result = json.loads(response_text)
+        with metrics.timed(metrics.AI_PARSE_LATENCY, "compare"):
+            result = json.loads(response_text)
+        
+        # Persist so repeat views are served from the database
+        comparison = Comparison(
+            case_id=current_wound.case_id or base_wound.case_id,
+            wound_id_before=base_wound.id,
+            wound_id_after=current_wound.id,
+            analysis=result,
+            metrics=image_metrics,
+            cache_key=cache_key
+        )
+        db.add(comparison)
+        await db.commit()
         
         return ComparisonResponse(
             success=True,
-            comparison=result
+            comparison=result,
+            metrics=image_metrics,
+            cached=False
         )
         
     except json.JSONDecodeError as e:
@@ -87,7 +282,7 @@ Provide a detailed comparative analysis in JSON format:
 @router.post("/save_comparison")
 async def save_comparison(
     request: SaveComparisonRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Save comparison analysis to database"""
     
@@ -99,7 +294,7 @@ async def save_comparison(
     )
     
     db.add(comparison)
-    db.commit()
+    await db.commit()
     
     return {"success": True, "message": "Comparison saved"}
 
@@ -107,7 +302,7 @@ async def save_comparison(
 @router.post("/save_analysis")
 async def save_analysis(
     request: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Save or update wound analysis"""
     
@@ -117,11 +312,13 @@ async def save_analysis(
     if not wound_id or not analysis:
         raise HTTPException(status_code=400, detail="Missing wound_id or analysis")
     
-    wound = db.query(Wound).filter(Wound.id == wound_id).first()
+    wound = await db.get(Wound, wound_id)
     if not wound:
         raise HTTPException(status_code=404, detail="Wound not found")
     
     wound.analysis = analysis
-    db.commit()
+    await db.commit()
+    response_cache.bump(wound.user_id)
+    mark_primary_sticky(wound.user_id, wound.case_id)
     
     return {"success": True, "message": "Analysis saved"}
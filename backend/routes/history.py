@@ -1,64 +1,165 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from database import get_db, Wound, Classification, Recommendation, Case
-from models import HistoryResponse, CaseResponse, CreateCaseRequest
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select, func, and_, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from database import get_db, get_read_db, mark_primary_sticky, replica_session, use_replica, SessionLocal, Wound, Classification, Recommendation, Case, CaseTrajectory, Comparison, WoundSearchIndex, ClassificationArchive, RecommendationArchive
+from models import HistoryResponse, CaseResponse, CreateCaseRequest, TrajectoryResponse
 from typing import Optional
+from datetime import datetime
+from tissue import normalize_tissue
+import analytics
+import base64
+import binascii
+import csv
+import io
+import json
+import zlib
+import cases as case_counters
+import response_cache
+import storage
+import trajectory
 
 router = APIRouter()
 
+def _encode_cursor(wound: Wound) -> str:
+    """Opaque keyset cursor pointing just past `wound` in (upload_date, id) order"""
+    raw = json.dumps([wound.upload_date.isoformat(), wound.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        upload_date, wound_id = json.loads(raw)
+        return datetime.fromisoformat(upload_date), int(wound_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _ranked_latest_subqueries(wound_ids):
+    """
+    ROW_NUMBER()-ranked classifications per wound and recommendations per
+    classification (rn == 1 is the latest). `wound_ids` is a list or a select().
+    """
+    ranked_classifications = select(
+        Classification.id.label("id"),
+        Classification.wound_id.label("wound_id"),
+        func.row_number().over(
+            partition_by=Classification.wound_id,
+            order_by=(Classification.timestamp.desc(), Classification.id.desc())
+        ).label("rn")
+    ).where(Classification.wound_id.in_(wound_ids)).subquery()
+    
+    ranked_recommendations = select(
+        Recommendation.id.label("id"),
+        Recommendation.classification_id.label("classification_id"),
+        func.row_number().over(
+            partition_by=Recommendation.classification_id,
+            order_by=(Recommendation.created_at.desc(), Recommendation.id.desc())
+        ).label("rn")
+    ).where(
+        Recommendation.classification_id.in_(
+            select(Classification.id).where(Classification.wound_id.in_(wound_ids))
+        )
+    ).subquery()
+    
+    return ranked_classifications, ranked_recommendations
+
+
+def latest_classification_query(wound_ids):
+    """
+    Latest classification of each wound plus that classification's latest
+    recommendation, as one set-based query of (Classification, Recommendation|None).
+    """
+    ranked_classifications, ranked_recommendations = _ranked_latest_subqueries(wound_ids)
+    
+    return select(Classification, Recommendation).options(
+        undefer(Recommendation.cleaning_instructions),
+        undefer(Recommendation.dressing_recommendations),
+        undefer(Recommendation.warning_signs)
+    ).join(
+        ranked_classifications,
+        and_(ranked_classifications.c.id == Classification.id, ranked_classifications.c.rn == 1)
+    ).outerjoin(
+        ranked_recommendations,
+        and_(ranked_recommendations.c.classification_id == Classification.id, ranked_recommendations.c.rn == 1)
+    ).outerjoin(
+        Recommendation, Recommendation.id == ranked_recommendations.c.id
+    )
+
+
 @router.get("/history", response_model=HistoryResponse)
 async def get_history(
+    request: Request,
     user_id: int = Query(1),
     case_id: Optional[int] = Query(None),
     limit: int = Query(50),
     offset: int = Query(0),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page (keyset pagination)"),
+    include_total: Optional[bool] = Query(None, description="Count all matching wounds (default: only in offset mode)"),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get wound history with classifications and recommendations"""
     
+    return await response_cache.cached_response(
+        request, user_id,
+        lambda: _build_history(db, user_id, case_id, limit, offset, cursor, include_total)
+    )
+
+
+async def _build_history(db: AsyncSession, user_id: int, case_id, limit: int, offset: int, cursor, include_total) -> HistoryResponse:
     # Build query
-    query = db.query(Wound).filter(Wound.user_id == user_id)
+    query = select(Wound).where(Wound.user_id == user_id)
     
     if case_id:
-        query = query.filter(Wound.case_id == case_id)
+        query = query.where(Wound.case_id == case_id)
+    
+    # Counting re-scans every matching row, so cursor clients must opt in
+    if include_total is None:
+        include_total = cursor is None
+    total = None
+    if include_total:
+        total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
     
-    # Get total count
-    total = query.count()
+    # Get wounds with pagination: keyset on (upload_date, id) when a cursor is given,
+    # otherwise classic offset paging for older clients
+    query = query.order_by(Wound.upload_date.desc(), Wound.id.desc())
+    if cursor:
+        query = query.where(tuple_(Wound.upload_date, Wound.id) < _decode_cursor(cursor))
+    else:
+        query = query.offset(offset)
     
-    # Get wounds with pagination
-    wounds = query.order_by(Wound.upload_date.desc()).offset(offset).limit(limit).all()
+    # Fetch one extra row to know whether another page exists
+    wounds = (await db.execute(query.options(undefer(Wound.analysis)).limit(limit + 1))).scalars().all()
+    has_more = len(wounds) > limit
+    wounds = wounds[:limit]
+    next_cursor = _encode_cursor(wounds[-1]) if has_more and wounds else None
+    
+    # Latest classification + recommendation for the whole page in one query
+    latest = {}
+    if wounds:
+        for classification, rec in await db.execute(latest_classification_query([w.id for w in wounds])):
+            latest[classification.wound_id] = (classification, rec)
     
     # Format response
     wounds_data = []
     for wound in wounds:
-        # Get classification
-        classification = db.query(Classification).filter(
-            Classification.wound_id == wound.id
-        ).first()
+        classification, rec = latest.get(wound.id, (None, None))
         
-        # Get recommendation
         recommendation = None
-        if classification:
-            rec = db.query(Recommendation).filter(
-                Recommendation.classification_id == classification.id
-            ).first()
-            if rec:
-                recommendation = {
-                    "summary": rec.summary,
-                    "cleaning_instructions": rec.cleaning_instructions,
-                    "dressing_recommendations": rec.dressing_recommendations,
-                    "warning_signs": rec.warning_signs
-                }
-        
-        # Normalize image path for web (convert backslashes to forward slashes, remove ./ prefix)
-        img_path = wound.image_path.replace('\\', '/')
-        if img_path.startswith('./'):
-            img_path = img_path[2:]  # Remove ./ prefix
+        if rec:
+            recommendation = {
+                "summary": rec.summary,
+                "cleaning_instructions": rec.cleaning_instructions,
+                "dressing_recommendations": rec.dressing_recommendations,
+                "warning_signs": rec.warning_signs
+            }
         
         wound_data = {
             "wound_id": wound.id,
             "case_id": wound.case_id,
-            "image_path": img_path,
+            "image_path": storage.web_image_path(wound.image_path),
             "original_filename": wound.original_filename,
             "upload_date": wound.upload_date.isoformat(),
             "status": wound.status,
@@ -86,14 +187,167 @@ async def get_history(
         wounds=wounds_data,
         total=total,
         limit=limit,
-        offset=offset
+        offset=offset if not cursor else None,
+        next_cursor=next_cursor
+    )
+
+
+# Columns included in history exports, in CSV column order
+EXPORT_COLUMNS = [
+    ("wound_id", Wound.id),
+    ("case_id", Wound.case_id),
+    ("upload_date", Wound.upload_date),
+    ("original_filename", Wound.original_filename),
+    ("image_path", Wound.image_path),
+    ("status", Wound.status),
+    ("redness_level", Wound.redness_level),
+    ("discharge_detected", Wound.discharge_detected),
+    ("discharge_type", Wound.discharge_type),
+    ("edge_quality", Wound.edge_quality),
+    ("tissue_composition", Wound.tissue_composition),
+    ("classification_id", Classification.id),
+    ("wound_type", func.coalesce(Classification.wound_type, Wound.classification)),
+    ("confidence", func.coalesce(Classification.confidence, Wound.confidence)),
+    ("probabilities", Classification.all_probabilities),
+    ("classified_at", Classification.timestamp),
+    ("processing_time_ms", Classification.processing_time_ms),
+    ("recommendation_summary", Recommendation.summary),
+    ("cleaning_instructions", Recommendation.cleaning_instructions),
+    ("dressing_recommendations", Recommendation.dressing_recommendations),
+    ("warning_signs", Recommendation.warning_signs),
+    ("expected_healing_time", Recommendation.expected_healing_time),
+    ("recommendation_confidence", Recommendation.ai_confidence),
+]
+
+TISSUE_EXPORT_FIELDS = ["tissue_pink", "tissue_red", "tissue_yellow", "tissue_black", "tissue_white"]
+
+# Rows fetched per round-trip from the server-side cursor
+EXPORT_BATCH_SIZE = 500
+
+# Buffer this much output before yielding a chunk to the client
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _export_records(user_id: int, case_id):
+    """Yield one flat dict per wound using a streaming cursor; memory stays constant"""
+    # The request-scoped session is closed before a streaming body is sent,
+    # so the export owns its own session for the lifetime of the stream
+    db = replica_session() if use_replica(user_id, case_id) else SessionLocal()
+    try:
+        user_wounds = select(Wound.id).where(Wound.user_id == user_id)
+        if case_id:
+            user_wounds = user_wounds.where(Wound.case_id == case_id)
+        ranked_classifications, ranked_recommendations = _ranked_latest_subqueries(user_wounds)
+        
+        statement = select(*[column.label(name) for name, column in EXPORT_COLUMNS]).select_from(Wound).outerjoin(
+            ranked_classifications,
+            and_(ranked_classifications.c.wound_id == Wound.id, ranked_classifications.c.rn == 1)
+        ).outerjoin(
+            Classification, Classification.id == ranked_classifications.c.id
+        ).outerjoin(
+            ranked_recommendations,
+            and_(ranked_recommendations.c.classification_id == Classification.id, ranked_recommendations.c.rn == 1)
+        ).outerjoin(
+            Recommendation, Recommendation.id == ranked_recommendations.c.id
+        ).where(Wound.user_id == user_id)
+        if case_id:
+            statement = statement.where(Wound.case_id == case_id)
+        statement = statement.order_by(Wound.upload_date.desc(), Wound.id.desc())
+        
+        # Plain column rows (no ORM identity map) + server-side cursor
+        result = db.execute(statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+        for row in result:
+            record = dict(row._mapping)
+            record["image_path"] = storage.web_image_path(record["image_path"])
+            tissue = normalize_tissue(record["tissue_composition"]) if record["tissue_composition"] else {}
+            for field in TISSUE_EXPORT_FIELDS:
+                record[field] = tissue.get(field[len("tissue_"):])
+            yield record
+    finally:
+        db.close()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return " | ".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=_json_default)
+    return value
+
+
+def _export_lines(user_id: int, case_id, export_format: str):
+    if export_format == "csv":
+        fieldnames = [name for name, _ in EXPORT_COLUMNS if name != "tissue_composition"] + TISSUE_EXPORT_FIELDS
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        for record in _export_records(user_id, case_id):
+            writer.writerow({k: _csv_cell(v) for k, v in record.items()})
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for record in _export_records(user_id, case_id):
+            yield json.dumps(record, default=_json_default) + "\n"
+
+
+def _export_stream(user_id: int, case_id, export_format: str, compress: bool):
+    """Encode, optionally gzip, and batch export lines into chunks"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31 -> gzip container
+    pending = []
+    pending_size = 0
+    for line in _export_lines(user_id, case_id, export_format):
+        data = line.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+        if pending_size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, pending_size = [], 0
+    if compressor:
+        pending.append(compressor.flush())
+    if pending:
+        yield b"".join(pending)
+
+
+@router.get("/history/export")
+async def export_history(
+    user_id: int = Query(1),
+    case_id: Optional[int] = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False, description="gzip the stream (sent with Content-Encoding: gzip)"),
+):
+    """Stream a user's full wound history (wound, classification, recommendation, tissue) as NDJSON or CSV"""
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="wound_history_{user_id}.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        _export_stream(user_id, case_id, format, gzip),
+        media_type=media_type,
+        headers=headers
     )
 
 
 @router.post("/create_case", response_model=CaseResponse)
 async def create_case(
     request: CreateCaseRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new wound case"""
     
@@ -104,8 +358,10 @@ async def create_case(
     )
     
     db.add(case)
-    db.commit()
-    db.refresh(case)
+    await db.commit()
+    await db.refresh(case)
+    response_cache.bump(case.user_id)
+    mark_primary_sticky(case.user_id, case.id)
     
     return CaseResponse(
         success=True,
@@ -121,38 +377,33 @@ async def create_case(
 
 @router.get("/cases", response_model=CaseResponse)
 async def get_cases(
+    request: Request,
     user_id: int = Query(1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all cases for a user"""
     
-    cases = db.query(Case).filter(Case.user_id == user_id).order_by(Case.created_at.desc()).all()
+    return await response_cache.cached_response(request, user_id, lambda: _build_cases(db, user_id))
+
+
+async def _build_cases(db: AsyncSession, user_id: int) -> CaseResponse:
+    # Single read: counters are denormalized on the case, latest image via one join
+    rows = (await db.execute(
+        select(Case, Wound.image_path).outerjoin(
+            Wound, Wound.id == Case.latest_wound_id
+        ).where(Case.user_id == user_id).order_by(Case.created_at.desc())
+    )).all()
     
     cases_data = []
-    for case in cases:
-        # Count wounds in this case
-        wound_count = db.query(Wound).filter(Wound.case_id == case.id).count()
-        
-        # Get latest wound image
-        latest_wound = db.query(Wound).filter(Wound.case_id == case.id).order_by(
-            Wound.upload_date.desc()
-        ).first()
-        
-        # Normalize path for web (convert backslashes to forward slashes, remove ./ prefix)
-        latest_image = None
-        if latest_wound:
-            img_path = latest_wound.image_path.replace('\\', '/')
-            if img_path.startswith('./'):
-                img_path = img_path[2:]  #Remove ./ prefix
-            latest_image = img_path
-        
+    for case, latest_image_path in rows:
         cases_data.append({
             "id": case.id,
             "name": case.name,
             "description": case.description,
             "created_at": case.created_at.isoformat(),
-            "wound_count": wound_count,
-            "latest_image": latest_image
+            "wound_count": case.wound_count or 0,
+            "latest_image": storage.web_image_path(latest_image_path) if latest_image_path else None,
+            "latest_upload_date": case.latest_upload_date.isoformat() if case.latest_upload_date else None
         })
     
     return CaseResponse(
@@ -161,24 +412,71 @@ async def get_cases(
     )
 
 
+@router.get("/cases/{case_id}/trajectory", response_model=TrajectoryResponse)
+async def get_case_trajectory(
+    case_id: int,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get the precomputed healing trajectory of a case (no AI calls)"""
+    
+    case_trajectory = await db.get(CaseTrajectory, case_id)
+    if case_trajectory is None:
+        if await db.get(Case, case_id) is None:
+            raise HTTPException(status_code=404, detail="Case not found")
+        return TrajectoryResponse(success=True, trajectory=trajectory.empty(case_id))
+    
+    return TrajectoryResponse(success=True, trajectory=trajectory.serialize(case_trajectory))
+
+
+async def _delete_wounds(db: AsyncSession, wound_ids):
+    """
+    Delete wounds and everything hanging off them with a handful of set-based
+    statements. `wound_ids` is a select() of wound ids; caller commits.
+    """
+    # Usage summaries stop counting them (needs the rows, so it goes first)
+    await db.run_sync(analytics.record_deletion, wound_ids)
+    
+    classification_ids = select(Classification.id).where(Classification.wound_id.in_(wound_ids))
+    
+    statements = [
+        delete(Recommendation).where(Recommendation.classification_id.in_(classification_ids)),
+        delete(Classification).where(Classification.wound_id.in_(wound_ids)),
+        delete(RecommendationArchive).where(RecommendationArchive.wound_id.in_(wound_ids)),
+        delete(ClassificationArchive).where(ClassificationArchive.wound_id.in_(wound_ids)),
+        delete(Comparison).where(
+            or_(Comparison.wound_id_before.in_(wound_ids), Comparison.wound_id_after.in_(wound_ids))
+        ),
+        delete(WoundSearchIndex).where(WoundSearchIndex.wound_id.in_(wound_ids)),
+        delete(Wound).where(Wound.id.in_(wound_ids)),
+    ]
+    for statement in statements:
+        await db.execute(statement.execution_options(synchronize_session=False))
+
+
 @router.delete("/wounds/{wound_id}")
 async def delete_wound(
     wound_id: int,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a wound record and its associated classifications and recommendations"""
 
-    wound = db.query(Wound).filter(Wound.id == wound_id).first()
+    wound = (await db.execute(
+        select(Wound.user_id, Wound.case_id, Wound.image_path).where(Wound.id == wound_id)
+    )).first()
     if not wound:
         raise HTTPException(status_code=404, detail="Wound not found")
 
-    # Delete child recommendations → classifications → wound (cascade order)
-    classifications = db.query(Classification).filter(Classification.wound_id == wound_id).all()
-    for clf in classifications:
-        db.query(Recommendation).filter(Recommendation.classification_id == clf.id).delete()
-    db.query(Classification).filter(Classification.wound_id == wound_id).delete()
-    db.delete(wound)
-    db.commit()
+    # Children and wound in one transaction, then fix up the case aggregates
+    await _delete_wounds(db, select(Wound.id).where(Wound.id == wound_id))
+    await db.run_sync(trajectory.remove_wound, wound.case_id, wound_id)
+    await db.run_sync(case_counters.refresh_counters, [wound.case_id])
+    await db.commit()
+    response_cache.bump(wound.user_id)
+    mark_primary_sticky(wound.user_id, wound.case_id)
+
+    # Image file goes only once the rows are gone for good
+    background_tasks.add_task(storage.remove_files, [wound.image_path])
 
     return {"success": True, "message": f"Wound {wound_id} deleted"}
 
@@ -186,25 +484,29 @@ async def delete_wound(
 @router.delete("/cases/{case_id}")
 async def delete_case(
     case_id: int,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a case and all its wounds, classifications, and recommendations"""
 
-    case = db.query(Case).filter(Case.id == case_id).first()
+    case = (await db.execute(select(Case.id, Case.user_id).where(Case.id == case_id))).first()
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
 
-    # Delete all wounds in this case and their children
-    wounds = db.query(Wound).filter(Wound.case_id == case_id).all()
-    for wound in wounds:
-        classifications = db.query(Classification).filter(Classification.wound_id == wound.id).all()
-        for clf in classifications:
-            db.query(Recommendation).filter(Recommendation.classification_id == clf.id).delete()
-        db.query(Classification).filter(Classification.wound_id == wound.id).delete()
-        db.delete(wound)
+    image_paths = (await db.execute(select(Wound.image_path).where(Wound.case_id == case_id))).scalars().all()
 
-    db.delete(case)
-    db.commit()
+    # Delete all wounds in this case and their children, then the case itself
+    await _delete_wounds(db, select(Wound.id).where(Wound.case_id == case_id))
+    for statement in (
+        delete(Comparison).where(Comparison.case_id == case_id),
+        delete(CaseTrajectory).where(CaseTrajectory.case_id == case_id),
+        delete(Case).where(Case.id == case_id),
+    ):
+        await db.execute(statement.execution_options(synchronize_session=False))
+    await db.commit()
+    response_cache.bump(case.user_id)
+    mark_primary_sticky(case.user_id, case.id)
 
-    return {"success": True, "message": f"Case {case_id} and all its wounds deleted"}
+    background_tasks.add_task(storage.remove_files, image_paths)
 
+    return {"success": True, "message": f"Case {case_id} and all its wounds deleted"}
@@ -1,10 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db, Classification, Recommendation
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from database import get_db, mark_primary_sticky, Classification, Recommendation
 from models import RecommendRequest, RecommendationResponse
 import google.generativeai as genai
 from config import config
+from tissue import normalize_tissue, severity_score as tissue_severity_score
+import analytics
+import asyncio
 import json
+import metrics
+import response_cache
 
 router = APIRouter()
 
@@ -14,14 +21,17 @@ genai.configure(api_key=config.GEMINI_API_KEY)
 @router.post("/recommend", response_model=RecommendationResponse)
 async def get_recommendations(
     request: RecommendRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get AI-powered care recommendations using Gemini"""
     
     # Verify classification exists
-    classification = db.query(Classification).filter(
-        Classification.id == request.classification_id
-    ).first()
+    # Eager-load the wound: async sessions cannot lazy-load relationships
+    classification = (await db.execute(
+        select(Classification)
+        .options(selectinload(Classification.wound))
+        .where(Classification.id == request.classification_id)
+    )).scalar_one_or_none()
     
     if not classification:
         raise HTTPException(status_code=404, detail="Classification not found")
@@ -49,34 +59,15 @@ async def get_recommendations(
                 tissue = {"pink": 50, "red": 50, "yellow": 0, "black": 0, "white": 0}
         
         # Normalize tissue composition to ensure it sums to ~100 (in case AI gives weird values)
-        pink = float(tissue.get("pink", 0))
-        red = float(tissue.get("red", 0))
-        yellow = float(tissue.get("yellow", 0))
-        black = float(tissue.get("black", 0))
-        white = float(tissue.get("white", 0))
-        
-        total = pink + red + yellow + black + white
-        if total > 0 and total != 100:
-            # Normalize to 100
-            factor = 100 / total
-            pink = round(pink * factor, 1)
-            red = round(red * factor, 1)
-            yellow = round(yellow * factor, 1)
-            black = round(black * factor, 1)
-            white = round(white * factor, 1)
-        
-        # Update tissue dict with normalized values
-        tissue = {
-            "pink": pink,
-            "red": red,
-            "yellow": yellow,
-            "black": black,
-            "white": white
-        }
+        tissue = normalize_tissue(tissue)
+        pink = tissue["pink"]
+        red = tissue["red"]
+        yellow = tissue["yellow"]
+        black = tissue["black"]
+        white = tissue["white"]
 
         # 2. Compute Severity Score
-        # Weights: Necrotic(Black)=3, Slough(Yellow/White)=2, Active(Red)=1, Healthy(Pink)=0
-        severity_score = (black * 3) + ((yellow + white) * 2) + (red * 1)
+        severity_score = tissue_severity_score(tissue)
         
         # 3. Map to Severity Level
         if severity_score < 50:
@@ -202,7 +193,8 @@ Provide the response in this exact JSON format:
 
         # Call Gemini API
         model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
+        with metrics.ai_call('gemini-1.5-flash', "generate"):
+            response = await asyncio.to_thread(model.generate_content, prompt)
         
         response_text = response.text.strip()
         
@@ -216,7 +208,8 @@ Provide the response in this exact JSON format:
             json_end = response_text.find("```", json_start)
             response_text = response_text[json_start:json_end].strip()
         
-        result = json.loads(response_text)
+        with metrics.timed(metrics.AI_PARSE_LATENCY, "recommend"):
+            result = json.loads(response_text)
         
         # Save recommendation to database
         recommendation = Recommendation(
@@ -234,8 +227,10 @@ Provide the response in this exact JSON format:
         )
         
         db.add(recommendation)
-        db.commit()
-        db.refresh(recommendation)
+        await db.run_sync(analytics.record_recommendation, classification.wound, recommendation)
+        await db.commit()
+        response_cache.bump(classification.wound.user_id)
+        mark_primary_sticky(classification.wound.user_id, classification.wound.case_id)
         
         return RecommendationResponse(
             success=True,
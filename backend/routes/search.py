@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_read_db, Wound, WoundSearchIndex
+from models import WoundSearchResponse
+from typing import List, Optional
+from datetime import datetime, timedelta
+import storage
+
+router = APIRouter()
+
+# Tissue filters exposed as min_<tissue> / max_<tissue> query parameters
+TISSUE_COLUMNS = {
+    "pink": WoundSearchIndex.tissue_pink,
+    "red": WoundSearchIndex.tissue_red,
+    "yellow": WoundSearchIndex.tissue_yellow,
+    "black": WoundSearchIndex.tissue_black,
+    "white": WoundSearchIndex.tissue_white,
+}
+
+@router.get("/wounds/search", response_model=WoundSearchResponse)
+async def search_wounds(
+    user_id: int = Query(1),
+    case_id: Optional[int] = Query(None),
+    wound_type: Optional[List[str]] = Query(None, description="Final (post-override) wound type; repeat for several"),
+    since_days: Optional[int] = Query(None, ge=0, description="Only wounds uploaded in the last N days"),
+    min_severity: Optional[float] = Query(None),
+    max_severity: Optional[float] = Query(None),
+    min_pink: Optional[float] = Query(None), max_pink: Optional[float] = Query(None),
+    min_red: Optional[float] = Query(None), max_red: Optional[float] = Query(None),
+    min_yellow: Optional[float] = Query(None), max_yellow: Optional[float] = Query(None),
+    min_black: Optional[float] = Query(None), max_black: Optional[float] = Query(None),
+    min_white: Optional[float] = Query(None), max_white: Optional[float] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Clinical search over classified wounds by type, severity and tissue thresholds"""
+    
+    query = select(WoundSearchIndex, Wound.image_path).join(
+        Wound, Wound.id == WoundSearchIndex.wound_id
+    ).where(WoundSearchIndex.user_id == user_id)
+    
+    if case_id:
+        query = query.where(WoundSearchIndex.case_id == case_id)
+    if wound_type:
+        query = query.where(WoundSearchIndex.final_wound_type.in_(wound_type))
+    if since_days is not None:
+        query = query.where(WoundSearchIndex.upload_date >= datetime.utcnow() - timedelta(days=since_days))
+    if min_severity is not None:
+        query = query.where(WoundSearchIndex.severity_score >= min_severity)
+    if max_severity is not None:
+        query = query.where(WoundSearchIndex.severity_score <= max_severity)
+    
+    tissue_bounds = {
+        "pink": (min_pink, max_pink),
+        "red": (min_red, max_red),
+        "yellow": (min_yellow, max_yellow),
+        "black": (min_black, max_black),
+        "white": (min_white, max_white),
+    }
+    for name, (low, high) in tissue_bounds.items():
+        if low is not None:
+            query = query.where(TISSUE_COLUMNS[name] >= low)
+        if high is not None:
+            query = query.where(TISSUE_COLUMNS[name] <= high)
+    
+    rows = (await db.execute(
+        query.order_by(WoundSearchIndex.upload_date.desc(), WoundSearchIndex.wound_id.desc()).limit(limit)
+    )).all()
+    
+    wounds_data = []
+    for entry, image_path in rows:
+        wounds_data.append({
+            "wound_id": entry.wound_id,
+            "case_id": entry.case_id,
+            "image_path": storage.web_image_path(image_path),
+            "upload_date": entry.upload_date.isoformat(),
+            "wound_type": entry.final_wound_type,
+            "severity_score": entry.severity_score,
+            "tissue_composition": {name: getattr(entry, f"tissue_{name}") for name in TISSUE_COLUMNS},
+        })
+    
+    return WoundSearchResponse(success=True, wounds=wounds_data, count=len(wounds_data))
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_read_db
+from models import StatsResponse
+from typing import Optional
+import analytics
+
+router = APIRouter()
+
+@router.get("/stats", response_model=StatsResponse)
+async def get_stats(
+    user_id: Optional[int] = Query(None),
+    case_id: Optional[int] = Query(None),
+    days: int = Query(30, ge=1, le=3650),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Usage and classification statistics from the precomputed daily summaries"""
+    
+    if case_id:
+        scope, scope_id = "case", case_id
+    elif user_id is not None:
+        scope, scope_id = "user", user_id
+    else:
+        scope, scope_id = "global", 0
+    
+    return StatsResponse(success=True, stats=await db.run_sync(analytics.summary, scope, scope_id, days))
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db, Wound
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, mark_primary_sticky, Wound
 from models import WoundUploadResponse
 from config import config
+import analytics
+import cases
+import response_cache
+import hashlib
 import os
 import time
 from pathlib import Path
@@ -18,7 +22,7 @@ async def upload_image(
     image: UploadFile = File(...),
     user_id: int = Form(1),
     case_id: int = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload wound image and save to database"""
     
@@ -57,11 +61,18 @@ async def upload_image(
             case_id=case_id if case_id else None,
             image_path=upload_path,
             original_filename=image.filename,
+            image_sha256=hashlib.sha256(contents).hexdigest(),
             status="pending"
         )
         db.add(wound)
-        db.commit()
-        db.refresh(wound)
+        await db.flush()
+        
+        # Keep the case's wound counters and the usage summaries in the same transaction
+        await db.run_sync(cases.record_upload, wound)
+        await db.run_sync(analytics.record_upload, wound)
+        await db.commit()
+        response_cache.bump(wound.user_id)
+        mark_primary_sticky(wound.user_id, wound.case_id)
         
         return WoundUploadResponse(
             success=True,
@@ -0,0 +1,51 @@
+"""
+Typed, indexed copy of the clinically interesting analysis fields
+(final wound type, severity score, the five tissue percentages) so triage
+queries run against indexes instead of parsing the opaque analysis JSON.
+"""
+
+import copy
+from sqlalchemy.orm import Session, undefer
+from database import Wound, WoundSearchIndex
+from tissue import apply_override, normalize_tissue, severity_score
+
+
+def index_wound(db: Session, wound: Wound, analysis: dict, final_wound_type: str):
+    """Insert or refresh the search row for a classified wound (caller commits)"""
+    tissue = normalize_tissue(analysis.get("tissue_composition"))
+    db.merge(WoundSearchIndex(
+        wound_id=wound.id,
+        user_id=wound.user_id,
+        case_id=wound.case_id,
+        upload_date=wound.upload_date,
+        final_wound_type=final_wound_type,
+        severity_score=round(severity_score(tissue), 1),
+        tissue_pink=tissue["pink"],
+        tissue_red=tissue["red"],
+        tissue_yellow=tissue["yellow"],
+        tissue_black=tissue["black"],
+        tissue_white=tissue["white"],
+    ))
+
+
+def backfill(db: Session, batch_size: int = 500) -> int:
+    """Build search rows from the stored analysis JSON of every classified wound"""
+    indexed = 0
+    last_id = 0
+    while True:
+        wounds = db.query(Wound).options(undefer(Wound.analysis)).filter(
+            Wound.id > last_id, Wound.analysis.isnot(None)
+        ).order_by(Wound.id).limit(batch_size).all()
+        if not wounds:
+            break
+        for wound in wounds:
+            analysis = copy.deepcopy(wound.analysis)
+            if not isinstance(analysis, dict):
+                continue
+            final_wound_type, _ = apply_override(analysis)
+            index_wound(db, wound, analysis, final_wound_type)
+            indexed += 1
+        last_id = wounds[-1].id
+        db.commit()
+        db.expunge_all()
+    return indexed
@@ -0,0 +1,243 @@
+"""
+Session-token cache: token -> (user snapshot, session expiry).
+
+Filled on login / verify-otp / a verify_session miss, invalidated on logout
+and password reset. Entries live at most SESSION_CACHE_TTL_SECONDS and never
+past the session's own expiry. Every worker publishes its invalidations to,
+and polls, a shared SQLite file (SESSION_CACHE_CHANNEL=sqlite, the default),
+so a token revoked on one worker is honoured by the others for at most
+SESSION_CACHE_SYNC_SECONDS. SESSION_CACHE_CHANNEL=none is only safe with a
+single worker: the others would keep a revoked token for up to the TTL.
+
+`current_user` is the FastAPI dependency for token-authenticated routes.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database import get_read_db, User, Session as DBSession
+from models import UserResponse
+
+
+def user_snapshot(user: User) -> UserResponse:
+    return UserResponse(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        email_verified=user.email_verified,
+        phone=user.phone,
+        date_of_birth=user.date_of_birth,
+        blood_type=user.blood_type,
+        emergency_contact=user.emergency_contact,
+        emergency_phone=user.emergency_phone,
+        profile_image=user.profile_image,
+        created_at=user.created_at
+    )
+
+
+class SQLiteChannel:
+    """Invalidation log in a local SQLite file shared by every worker on the host"""
+
+    # Events older than this are pruned; longer than any TTL so no worker misses one
+    RETENTION_SECONDS = 3600
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_invalidations ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        row = conn.execute("SELECT MAX(seq) FROM session_invalidations").fetchone()
+        self.last_seq = row[0] or 0
+        self._publishes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, kind: str, key):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO session_invalidations (kind, key, created_at) VALUES (?, ?, ?)",
+            (kind, str(key), time.time())
+        )
+        self._publishes += 1
+        if self._publishes % 100 == 0:
+            conn.execute("DELETE FROM session_invalidations WHERE created_at < ?", (time.time() - self.RETENTION_SECONDS,))
+
+    def poll(self):
+        """Events published (by any worker) since the last poll, as (kind, key) pairs"""
+        rows = self._conn().execute(
+            "SELECT seq, kind, key FROM session_invalidations WHERE seq > ? ORDER BY seq", (self.last_seq,)
+        ).fetchall()
+        if rows:
+            self.last_seq = rows[-1][0]
+        return [(kind, key) for _, kind, key in rows]
+
+
+class SessionCache:
+    def __init__(self, max_entries: int, ttl_seconds: int, channel=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.channel = channel
+        self._entries = OrderedDict()  # token -> (UserResponse, session expires_at, cache deadline)
+        self._tokens_by_user = {}
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user.get(entry[0].id)
+            if tokens:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[0].id]
+
+    def _drop_user(self, user_id: int):
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._drop(token)
+
+    def _sync(self):
+        if self.channel is None:
+            return
+        now = time.monotonic()
+        if now - self._last_sync < config.SESSION_CACHE_SYNC_SECONDS:
+            return
+        self._last_sync = now
+        for kind, key in self.channel.poll():
+            if kind == "token":
+                self._drop(key)
+            elif kind == "user":
+                self._drop_user(int(key))
+
+    def get(self, token: str) -> Optional[UserResponse]:
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(token)
+            if entry is not None:
+                user, expires_at, deadline = entry
+                if deadline > time.monotonic() and expires_at > datetime.utcnow():
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return user
+                self._drop(token)
+            self.misses += 1
+            return None
+
+    def set(self, token: str, user: UserResponse, expires_at: datetime):
+        with self._lock:
+            self._drop(token)
+            self._entries[token] = (user, expires_at, time.monotonic() + self.ttl_seconds)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._drop(token)
+        if self.channel is not None:
+            self.channel.publish("token", token)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            self._drop_user(user_id)
+        if self.channel is not None:
+            self.channel.publish("user", user_id)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if not config.SESSION_CACHE_ENABLED:
+                    _cache = False
+                else:
+                    channel = SQLiteChannel(config.SESSION_CACHE_CHANNEL_PATH) if config.SESSION_CACHE_CHANNEL == "sqlite" else None
+                    _cache = SessionCache(config.SESSION_CACHE_MAX_ENTRIES, config.SESSION_CACHE_TTL_SECONDS, channel)
+    return _cache
+
+
+def remember(token: str, user: User, expires_at: datetime):
+    """Cache a freshly created or verified session"""
+    cache = get_cache()
+    if cache:
+        cache.set(token, user_snapshot(user), expires_at)
+
+
+def forget(token: str):
+    cache = get_cache()
+    if cache:
+        cache.invalidate(token)
+
+
+def forget_user(user_id: int):
+    """Drop every cached session of a user (password reset, profile change)"""
+    cache = get_cache()
+    if cache:
+        cache.invalidate_user(user_id)
+
+
+async def lookup(db: AsyncSession, token: str) -> Optional[UserResponse]:
+    """User for a session token: cache first, then the database; None if invalid or expired"""
+    cache = get_cache()
+    if cache:
+        user = cache.get(token)
+        if user is not None:
+            return user
+
+    session_query = select(DBSession).where(DBSession.session_token == token)
+    session = (await db.execute(session_query)).scalars().first()
+    if not session and "replica" in db.info:
+        # A login from a moment ago may not have replicated yet: ask the primary
+        db.info["primary"] = True
+        session = (await db.execute(session_query)).scalars().first()
+    if not session or session.expires_at < datetime.utcnow():
+        return None
+
+    user = await db.get(User, session.user_id)
+    if not user:
+        return None
+    remember(token, user, session.expires_at)
+    return user_snapshot(user)
+
+
+async def current_user(
+    authorization: Optional[str] = Header(None),
+    x_session_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+) -> UserResponse:
+    """Dependency: the user behind `Authorization: Bearer <token>` (or X-Session-Token), else 401"""
+    token = x_session_token
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing session token")
+
+    user = await lookup(db, token)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    return user
@@ -0,0 +1,104 @@
+"""
+Upload directory housekeeping: the web path of a stored image, post-commit
+removal of deleted wounds' images and a sweeper that reconciles
+config.UPLOAD_DIR with the wounds table.
+"""
+
+import logging
+import os
+import time
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+from config import config
+from database import Wound
+
+logger = logging.getLogger(__name__)
+
+
+def web_image_path(image_path: str) -> str:
+    """Normalize image path for web (convert backslashes to forward slashes, remove ./ prefix)"""
+    img_path = image_path.replace('\\', '/')
+    if img_path.startswith('./'):
+        img_path = img_path[2:]  # Remove ./ prefix
+    return img_path
+
+
+def remove_files(paths):
+    """Best-effort removal of image files (run after the deleting transaction commits)"""
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"⚠️  Could not remove {path}: {e}")
+    return removed
+
+
+def _basename(stored_path: str) -> str:
+    # Rows may hold ./uploads/x.jpg, an absolute path, or a Windows path from another host
+    return os.path.basename(os.path.normpath(stored_path.replace("\\", "/")))
+
+
+# File names per suffix-match query (each is one LIKE term; SQLite caps expression depth at 1000)
+MATCH_CHUNK = 100
+
+
+def referenced_among(db: Session, names) -> set:
+    """Which of these file names some wound row points at, whatever directory it was stored under"""
+    names = list(names)
+    referenced = set()
+    for start in range(0, len(names), MATCH_CHUNK):
+        chunk = names[start:start + MATCH_CHUNK]
+        # The suffix match narrows the rows; the base name check drops look-alikes
+        # (a_b.jpg also ends with b.jpg, and _ is a LIKE wildcard)
+        rows = db.execute(select(Wound.image_path).where(or_(*(Wound.image_path.like(f"%{name}") for name in chunk))))
+        wanted = set(chunk)
+        for (path,) in rows:
+            if path and _basename(path) in wanted:
+                referenced.add(_basename(path))
+    return referenced
+
+
+def _sweep_batch(db: Session, entries: list, stats: dict, dry_run: bool):
+    referenced = referenced_among(db, [entry.name for entry in entries])
+    orphans = [entry.path for entry in entries if entry.name not in referenced]
+    stats["orphaned"] += len(orphans)
+    if orphans and not dry_run:
+        stats["removed"] += remove_files(orphans)
+
+
+def sweep_orphans(db: Session, batch_size: int = 500, min_age_seconds: int = 3600, dry_run: bool = True) -> dict:
+    """
+    Find (and unless `dry_run`, remove) files in UPLOAD_DIR that no wound
+    row references, `batch_size` files at a time: each batch is checked
+    against the wounds table and its orphans removed before the next one,
+    so memory stays flat however many files or rows there are. Matching is
+    by file name, so rows written under a different UPLOAD_DIR spelling
+    still protect their files. Files younger than `min_age_seconds` are
+    skipped so in-flight uploads (file written, row not yet committed) are
+    never touched.
+    """
+    stats = {"scanned": 0, "orphaned": 0, "removed": 0, "skipped_recent": 0}
+    cutoff = time.time() - min_age_seconds
+    
+    batch = []
+    with os.scandir(config.UPLOAD_DIR) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stats["scanned"] += 1
+            if entry.stat().st_mtime > cutoff:
+                stats["skipped_recent"] += 1
+                continue
+            # Checked after the stat: any file old enough to be a candidate had its row committed by now
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                _sweep_batch(db, batch, stats, dry_run)
+                batch = []
+    if batch:
+        _sweep_batch(db, batch, stats, dry_run)
+    
+    return stats
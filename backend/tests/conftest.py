@@ -0,0 +1,109 @@
+"""
+Shared fixtures: the app on a throwaway SQLite database and upload dir.
+
+The email dispatcher, maintenance scheduler and response cache are off, so
+every request really hits the database and nothing else runs queries
+alongside it. Run from backend/: python -m pytest -q
+"""
+
+import io
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="wound_care_tests_")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_TMP}/test.db",
+    "DATABASE_REPLICA_URLS": "",
+    "REPLICA_STICKY_PATH": os.path.join(_TMP, "replica_sticky.db"),
+    "UPLOAD_DIR": os.path.join(_TMP, "uploads"),
+    "MAINTENANCE_INTERVAL_SECONDS": "0",
+    "EMAIL_DISPATCHER_ENABLED": "false",
+    "RESEND_API_KEY": "",
+    "RESPONSE_CACHE_BACKEND": "none",
+    "SESSION_CACHE_CHANNEL_PATH": os.path.join(_TMP, "session_invalidations.db"),
+    "BCRYPT_ROUNDS": "4",
+    "PASSWORD_HASH_WORKERS": "0",
+    "LOG_FORMAT": "text",
+    "LOG_LEVEL": "WARNING",
+    "ADMIN_TOKEN": "test-admin-token",  # Installs the profiling middleware (see test_profiling.py)
+    "PROFILE_DIR": os.path.join(_TMP, "profiles"),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def query_budget():
+    """`with query_budget(max_queries=3, max_repeats=1): client.get(...)` (see query_stats.py)"""
+    import query_stats
+    return query_stats.query_budget
+
+
+@pytest.fixture
+def replica(client, tmp_path, monkeypatch):
+    """A second, empty SQLite file standing in for a replica that has not caught up"""
+    import database
+    from config import config
+    url = f"sqlite:///{tmp_path}/replica.db"
+    sync_engine = database.create_db_engine(url)
+    database.Base.metadata.create_all(sync_engine)
+    async_engine = database.create_async_db_engine(url)
+    monkeypatch.setattr(database, "replica_engines", [sync_engine])
+    monkeypatch.setattr(database, "async_replica_engines", [async_engine])
+    monkeypatch.setattr(database, "_stickiness", database.SQLiteStickiness(str(tmp_path / "sticky.db")))
+    monkeypatch.setattr(config, "REPLICA_STICKY_SECONDS", 0.5)
+    yield
+    client.portal.call(async_engine.dispose)
+    sync_engine.dispose()
+
+
+def jpeg_bytes(color=(200, 80, 80), size=(64, 64)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_case(client):
+    def _make(user_id: int = 1, name: str = "Test case") -> int:
+        response = client.post("/api/create_case", json={"name": name, "user_id": user_id})
+        assert response.status_code == 200, response.text
+        return response.json()["case"]["id"]
+    return _make
+
+
+@pytest.fixture
+def make_wound(client):
+    """Upload a JPEG through /api/upload; by default also store a classification + recommendation"""
+    from database import SessionLocal, Classification, Recommendation
+
+    def _make(user_id: int = 1, case_id: int = None, classified: bool = True, color=(200, 80, 80)) -> int:
+        data = {"user_id": str(user_id)}
+        if case_id:
+            data["case_id"] = str(case_id)
+        response = client.post("/api/upload", data=data, files={"image": ("wound.jpg", jpeg_bytes(color), "image/jpeg")})
+        assert response.status_code == 200, response.text
+        wound_id = response.json()["wound_id"]
+        if classified:
+            with SessionLocal() as db:
+                classification = Classification(
+                    wound_id=wound_id, wound_type="surgical", confidence=0.9,
+                    all_probabilities={"surgical": 0.9}, processing_time_ms=1200
+                )
+                db.add(classification)
+                db.flush()
+                db.add(Recommendation(classification_id=classification.id, summary="Keep it clean", ai_confidence=80))
+                db.commit()
+        return wound_id
+    return _make
@@ -0,0 +1,71 @@
+import logging
+import queue
+from types import SimpleNamespace
+
+import pytest
+
+import app_logging
+from config import config
+
+SCOPE = {"method": "GET", "path": "/api/cases/7/trajectory", "route": SimpleNamespace(path="/api/cases/{case_id}/trajectory")}
+
+
+@pytest.fixture
+def request_log(caplog, monkeypatch):
+    caplog.set_level(logging.INFO, logger=app_logging.logger.name)
+    monkeypatch.setattr(config, "LOG_SLOW_REQUEST_MS", 1000)
+
+    def logged(status: int, duration_ms: float = 5, sample_draw: float = 0.5) -> list:
+        caplog.clear()
+        monkeypatch.setattr(app_logging, "random", SimpleNamespace(random=lambda: sample_draw))
+        app_logging._log_request(SCOPE, status, duration_ms, failed=False)
+        return [r for r in caplog.records if r.name == app_logging.logger.name]
+
+    return logged
+
+
+def test_successes_are_sampled_but_errors_and_slow_requests_never_are(request_log, monkeypatch):
+    monkeypatch.setattr(config, "LOG_SUCCESS_SAMPLE_RATE", 0.25)
+    assert request_log(200, sample_draw=0.1)  # Inside the sample
+    assert not request_log(200, sample_draw=0.25)
+    assert not request_log(304, sample_draw=0.9)
+
+    monkeypatch.setattr(config, "LOG_SUCCESS_SAMPLE_RATE", 0.0)
+    assert [r.levelno for r in request_log(404, sample_draw=0.9)] == [logging.WARNING]
+    assert [r.levelno for r in request_log(503, sample_draw=0.9)] == [logging.ERROR]
+    (slow,) = request_log(200, duration_ms=1500, sample_draw=0.9)
+    assert slow.levelno == logging.INFO
+    assert (slow.route, slow.path, slow.status, slow.duration_ms) == (
+        "/api/cases/{case_id}/trajectory", "/api/cases/7/trajectory", 200, 1500
+    )
+
+    monkeypatch.setattr(config, "LOG_SUCCESS_SAMPLE_RATE", 1.0)
+    assert request_log(200, sample_draw=0.999)
+
+
+def test_request_ids_are_echoed_or_assigned(client):
+    response = client.get("/api/history", params={"user_id": 47}, headers={"X-Request-ID": "trace-47"})
+    assert response.headers["x-request-id"] == "trace-47"
+    assigned = client.get("/api/history", params={"user_id": 47}).headers["x-request-id"]
+    assert assigned and assigned != "trace-47"
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = app_logging.DroppingQueueHandler(queue.Queue(maxsize=2))
+    log = logging.Logger("test_app_logging")
+    log.addHandler(handler)
+
+    items = ["a", "b"]
+    log.warning("payload %s", items)
+    items.append("c")  # Changes after the call don't reach the queued message
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log.exception("failed")
+    log.warning("one too many")
+
+    assert handler.dropped == 1
+    first, second = handler.queue.get_nowait(), handler.queue.get_nowait()
+    assert (first.msg, first.args) == ("payload ['a', 'b']", None)
+    assert second.exc_info is None and "ValueError: boom" in second.exc_text
+    assert handler.queue.empty()
@@ -0,0 +1,70 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+import trajectory
+from database import SessionLocal, CaseTrajectory, Classification, WoundSearchIndex
+from routes import classify
+
+RESULT = {
+    "wound_type": "Normal Healing", "confidence": 85, "probabilities": {"Normal Healing": 85},
+    "tissue_composition": {"pink": 10, "red": 60, "yellow": 30, "black": 0, "white": 0},
+}
+
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    class GenerativeModel:
+        def __init__(self, name):
+            self.name = name
+
+        def generate_content(self, parts, generation_config=None):
+            return SimpleNamespace(text=json.dumps(RESULT))
+
+    monkeypatch.setattr(classify, "genai", SimpleNamespace(upload_file=lambda path: "file", GenerativeModel=GenerativeModel))
+
+
+def _stored(wound_id: int, case_id: int):
+    with SessionLocal() as db:
+        classifications = db.scalar(select(func.count()).select_from(Classification).where(Classification.wound_id == wound_id))
+        indexed = db.get(WoundSearchIndex, wound_id)
+        case_trajectory = db.get(CaseTrajectory, case_id)
+        return classifications, indexed, case_trajectory
+
+
+def test_classify_writes_everything_in_one_transaction(client, make_case, make_wound, fake_genai):
+    case_id = make_case(user_id=28)
+    wound_id = make_wound(user_id=28, case_id=case_id, classified=False)
+
+    response = client.post("/api/classify", json={"wound_id": wound_id})
+    assert response.status_code == 200, response.text
+    assert response.json()["wound_type"] == "Delayed Healing"  # 30% slough overrides "Normal"
+
+    classifications, indexed, case_trajectory = _stored(wound_id, case_id)
+    assert classifications == 1
+    assert indexed.final_wound_type == "Delayed Healing"
+    assert [p["wound_id"] for p in case_trajectory.points] == [wound_id]
+    with SessionLocal() as db:
+        # The classification keeps the model's own answer
+        stored = db.scalars(select(Classification).where(Classification.wound_id == wound_id)).one()
+        assert stored.wound_type == "Normal Healing"
+        assert stored.all_probabilities == {"Normal Healing": 85}
+
+
+def test_failed_trajectory_update_rolls_the_classification_back(client, make_case, make_wound, fake_genai, monkeypatch):
+    case_id = make_case(user_id=28)
+    wound_id = make_wound(user_id=28, case_id=case_id, classified=False)
+
+    def broken(*args):
+        raise RuntimeError("trajectory unavailable")
+
+    monkeypatch.setattr(trajectory, "record_classification", broken)
+    response = client.post("/api/classify", json={"wound_id": wound_id})
+    assert response.status_code == 500
+
+    classifications, indexed, case_trajectory = _stored(wound_id, case_id)
+    assert classifications == 0
+    assert indexed is None
+    assert case_trajectory is None or not case_trajectory.points
@@ -0,0 +1,21 @@
+import json
+import zlib
+
+from config import config
+from database import CompactJSON
+
+
+def test_large_values_are_zlib_json_readable_without_msgpack():
+    column = CompactJSON()
+    value = {"notes": "x" * (config.COMPACT_JSON_MIN_BYTES + 10), "tissue": [1, 2, 3]}
+    stored = column.process_bind_param(value, None)
+    assert stored[:1] == b"\x01"
+    assert json.loads(zlib.decompress(stored[1:])) == value
+    assert column.process_result_value(stored, None) == value
+
+
+def test_small_values_stay_plain_json():
+    column = CompactJSON()
+    stored = column.process_bind_param({"a": 1}, None)
+    assert stored == b'{"a":1}'
+    assert column.process_result_value(stored, None) == {"a": 1}
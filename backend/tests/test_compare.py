@@ -0,0 +1,83 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from routes import comparison
+
+RESULT = {"overallAssessment": "improving", "healingProgress": 60, "summary": "Smaller and less red"}
+
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    """Stands in for google.generativeai; records prompts, returns RESULT as fenced JSON"""
+    calls = {"uploads": 0, "prompts": []}
+
+    def upload_file(buffer, mime_type):
+        calls["uploads"] += 1
+        return f"file-{calls['uploads']}"
+
+    class GenerativeModel:
+        def __init__(self, name):
+            self.name = name
+
+        def generate_content(self, parts):
+            calls["prompts"].append(parts[-1])
+            return SimpleNamespace(text=f"```json\n{json.dumps(RESULT)}\n```")
+
+    monkeypatch.setattr(comparison, "genai", SimpleNamespace(upload_file=upload_file, GenerativeModel=GenerativeModel))
+    return calls
+
+
+def test_compare_calls_gemini_then_serves_stored_result(client, make_case, make_wound, fake_genai):
+    case_id = make_case()
+    base_id = make_wound(case_id=case_id, color=(220, 60, 60))
+    current_id = make_wound(case_id=case_id, color=(200, 120, 120))
+    body = {"base_wound_id": base_id, "current_wound_id": current_id}
+
+    first = client.post("/api/compare", json=body)
+    assert first.status_code == 200, first.text
+    assert first.json()["comparison"] == RESULT
+    assert first.json()["cached"] is False
+    assert fake_genai["uploads"] == 2 and len(fake_genai["prompts"]) == 1
+
+    second = client.post("/api/compare", json=body)
+    assert second.status_code == 200, second.text
+    assert second.json()["comparison"] == RESULT
+    assert second.json()["cached"] is True
+    assert len(fake_genai["prompts"]) == 1
+
+
+def test_compare_records_gemini_metrics(client, make_wound, fake_genai):
+    import metrics
+    before = metrics.AI_CALLS.value("gemini-1.5-flash", "generate", "ok")
+    response = client.post("/api/compare", json={"base_wound_id": make_wound(), "current_wound_id": make_wound()})
+    assert response.status_code == 200, response.text
+    assert metrics.AI_CALLS.value("gemini-1.5-flash", "generate", "ok") == before + 1
+
+
+def test_compare_metrics_runs_inline_without_pool(client, make_wound, monkeypatch):
+    from config import config
+    monkeypatch.setattr(config, "METRICS_WORKERS", 0)
+    response = client.post("/api/compare/metrics", json={"base_wound_id": make_wound(), "current_wound_id": make_wound()})
+    assert response.status_code == 200, response.text
+    assert "wound_area_change_percent" in response.json()["metrics"]
+
+
+def test_compare_is_recomputed_after_the_stored_analysis_changes(client, make_wound, fake_genai):
+    from database import SessionLocal, Classification
+    base_id, current_id = make_wound(), make_wound()
+    body = {"base_wound_id": base_id, "current_wound_id": current_id}
+    assert client.post("/api/compare", json=body).json()["cached"] is False
+    assert client.post("/api/compare", json=body).json()["cached"] is True
+
+    saved = client.post("/api/save_analysis", json={"wound_id": base_id, "analysis": {"notes": "Edges now closed"}})
+    assert saved.status_code == 200, saved.text
+    assert client.post("/api/compare", json=body).json()["cached"] is False
+    assert "Edges now closed" in fake_genai["prompts"][-1]
+
+    with SessionLocal() as db:
+        db.add(Classification(wound_id=current_id, wound_type="infected", confidence=0.7, all_probabilities={}))
+        db.commit()
+    assert client.post("/api/compare", json=body).json()["cached"] is False
+    assert client.post("/api/compare", json=body).json()["cached"] is True
@@ -0,0 +1,26 @@
+from database import create_db_engine, describe_engine, engine
+
+
+def test_describe_engine_reports_the_profile_the_engine_was_built_with(tmp_path):
+    for profile, journal_mode in (("default", "delete"), ("tuned", "wal")):
+        db_engine = create_db_engine(f"sqlite:///{tmp_path}/{profile}.db", profile=profile)
+        try:
+            report = describe_engine(db_engine)
+        finally:
+            db_engine.dispose()
+        assert report["profile"] == profile
+        assert report["journal_mode"] == journal_mode
+
+
+def test_server_engines_remember_their_resolved_pool_options(monkeypatch):
+    from config import config
+    from database import _engine_settings, create_async_db_engine
+    monkeypatch.setattr(config, "DB_POOL_RECYCLE", 123)
+    # Building an engine doesn't connect, so no server is needed
+    tuned = create_async_db_engine("postgresql://user:pw@localhost/none", profile="tuned")
+    default = create_async_db_engine("postgresql://user:pw@localhost/none", profile="default")
+    assert _engine_settings[tuned.sync_engine]["profile"] == "tuned"
+    assert _engine_settings[tuned.sync_engine]["pool_recycle"] == 123
+    assert _engine_settings[default.sync_engine]["profile"] == "default"
+    assert _engine_settings[default.sync_engine]["pool_recycle"] == -1
+    assert describe_engine(engine)["profile"] == config.DB_PROFILE
@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import select, update
+
+import email_outbox
+import fake_resend
+from config import config
+from database import AsyncSessionLocal, Base, EmailOutbox, create_async_db_engine
+
+
+@pytest.fixture
+def resend(monkeypatch):
+    """fake_resend.py served in-process; the dispatcher's client talks to it"""
+    monkeypatch.setattr(config, "RESEND_API_URL", "http://fake-resend/emails")
+    monkeypatch.setattr(config, "RESEND_API_KEY", "test")
+    monkeypatch.setattr(fake_resend.app.state, "fail_rate", 0.0)
+    monkeypatch.setattr(email_outbox, "_client", None)
+    monkeypatch.setattr(email_outbox, "get_client", lambda: httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=fake_resend.app)
+    ))
+    fake_resend._sent.clear()
+    fake_resend._by_idempotency_key.clear()
+    return fake_resend
+
+
+def _fail_with(resend, monkeypatch, status: int):
+    monkeypatch.setattr(resend.app.state, "fail_rate", 1.0 if status else 0.0)
+    monkeypatch.setattr(resend.app.state, "fail_status", status)
+
+
+def _run(tmp_path, scenario):
+    """Run scenario(session) on a fresh outbox database; session() opens a new session, like a request or a dispatcher pass"""
+    async def main():
+        engine = create_async_db_engine(f"sqlite:///{tmp_path}/outbox.db")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            await scenario(lambda: AsyncSessionLocal(bind=engine))
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+
+async def _queue(session, *subjects) -> list:
+    async with session() as db:
+        rows = [email_outbox.enqueue(db, "otp", "pat@example.com", subject, "<p>123456</p>", "123456") for subject in subjects]
+        await db.commit()
+        return [row.id for row in rows]
+
+
+async def _rows(session) -> dict:
+    async with session() as db:
+        return {row.id: row for row in (await db.execute(select(EmailOutbox))).scalars()}
+
+
+async def _make_due(session):
+    """Skip the backoff (or an expired lease) instead of waiting it out"""
+    async with session() as db:
+        await db.execute(update(EmailOutbox).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        await db.commit()
+
+
+async def _claim(session) -> list:
+    async with session() as db:
+        return await email_outbox._claim(db)
+
+
+async def _dispatch(session) -> int:
+    async with session() as db:
+        return await email_outbox.dispatch_once(db)
+
+
+def test_claims_lease_rows_until_the_lease_runs_out(tmp_path):
+    async def scenario(session):
+        first, second = await _queue(session, "one", "two")
+        claimed = await _claim(session)
+        assert sorted(row.id for row in claimed) == [first, second]
+        assert len({row.claim_token for row in claimed}) == 1
+        for row in (await _rows(session)).values():
+            assert row.attempts == 1
+            assert row.next_attempt_at > datetime.utcnow() + timedelta(seconds=config.EMAIL_LEASE_SECONDS - 5)
+
+        assert await _claim(session) == []  # Still leased: another worker skips them
+
+        # The claiming worker died; once the lease runs out the rows are claimed again
+        await _make_due(session)
+        reclaimed = await _claim(session)
+        assert sorted(row.id for row in reclaimed) == [first, second]
+        assert {row.attempts for row in reclaimed} == {2}
+        assert reclaimed[0].claim_token != claimed[0].claim_token
+
+    _run(tmp_path, scenario)
+
+
+def test_throttled_and_failing_sends_are_retried_then_sent(tmp_path, resend, monkeypatch):
+    async def scenario(session):
+        (email_id,) = await _queue(session, "Your code")
+        for status in (429, 503):
+            _fail_with(resend, monkeypatch, status)
+            assert await _dispatch(session) == 1
+            row = (await _rows(session))[email_id]
+            assert row.status == "pending" and row.claim_token is None
+            assert row.last_error.startswith(f"HTTP {status}")
+            assert row.next_attempt_at > datetime.utcnow()  # Backing off
+            assert await _dispatch(session) == 0
+            await _make_due(session)
+
+        _fail_with(resend, monkeypatch, 0)
+        assert await _dispatch(session) == 1
+        row = (await _rows(session))[email_id]
+        assert (row.status, row.attempts, row.last_error) == ("sent", 3, None)
+        assert row.sent_at is not None
+        assert [email["id"] for email in resend._sent] == [row.provider_id]
+        assert resend._by_idempotency_key == {f"outbox-{email_id}": row.provider_id}
+
+    _run(tmp_path, scenario)
+
+
+def test_rejected_and_exhausted_sends_are_dead_lettered(tmp_path, resend, monkeypatch):
+    monkeypatch.setattr(config, "EMAIL_MAX_ATTEMPTS", 2)
+
+    async def scenario(session):
+        # Resend rejects an empty subject with a 422: no point retrying
+        (rejected,) = await _queue(session, "")
+        assert await _dispatch(session) == 1
+        row = (await _rows(session))[rejected]
+        assert (row.status, row.attempts) == ("dead", 1)
+        assert row.last_error.startswith("HTTP 422")
+
+        (unlucky,) = await _queue(session, "Your code")
+        _fail_with(resend, monkeypatch, 503)
+        for _ in range(config.EMAIL_MAX_ATTEMPTS):
+            await _make_due(session)
+            assert await _dispatch(session) == 1  # Dead rows are never claimed again
+        rows = await _rows(session)
+        assert (rows[unlucky].status, rows[unlucky].attempts) == ("dead", 2)
+        assert rows[rejected].attempts == 1
+        assert resend._sent == []
+
+    _run(tmp_path, scenario)
@@ -0,0 +1,53 @@
+import csv
+import gzip
+import io
+import json
+
+from routes import history
+
+USER_ID = 36
+
+
+def _export(client, **params) -> tuple:
+    """(headers, body bytes exactly as sent: no transparent gzip decoding)"""
+    with client.stream("GET", "/api/history/export", params={"user_id": USER_ID, **params}) as response:
+        assert response.status_code == 200
+        return response.headers, b"".join(response.iter_raw())
+
+
+def test_export_formats(client, make_case, make_wound, monkeypatch):
+    case_id = make_case(user_id=USER_ID)
+    classified = [make_wound(user_id=USER_ID, case_id=case_id) for _ in range(3)]
+    unclassified = make_wound(user_id=USER_ID, classified=False)
+    monkeypatch.setattr(history, "EXPORT_CHUNK_BYTES", 256)  # Several chunks even for a few rows
+
+    headers, body = _export(client)
+    assert headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in body.decode().splitlines()]
+    assert [r["wound_id"] for r in records] == [unclassified, *reversed(classified)]  # Newest first
+    assert records[0]["wound_type"] is None and records[0]["recommendation_summary"] is None
+    assert {r["wound_type"] for r in records[1:]} == {"surgical"}
+    assert {r["recommendation_summary"] for r in records[1:]} == {"Keep it clean"}
+
+    headers, body = _export(client, format="csv", case_id=case_id)
+    assert headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(body.decode())))
+    assert [int(r["wound_id"]) for r in rows] == list(reversed(classified))
+    assert "tissue_composition" not in rows[0] and "tissue_red" in rows[0]
+    assert json.loads(rows[0]["probabilities"]) == {"surgical": 0.9}
+
+    plain_headers, plain = _export(client)
+    headers, compressed = _export(client, gzip="true")
+    assert headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain_headers
+    assert compressed[:2] == b"\x1f\x8b"
+    assert gzip.decompress(compressed) == plain
+
+
+def test_export_of_a_user_without_wounds(client):
+    _, body = _export(client, user_id=USER_ID + 1000)
+    assert body == b""
+    _, body = _export(client, user_id=USER_ID + 1000, format="csv")
+    assert body.decode().splitlines() == [",".join(
+        [name for name, _ in history.EXPORT_COLUMNS if name != "tissue_composition"] + history.TISSUE_EXPORT_FIELDS
+    )]
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from database import SessionLocal, Wound
+
+USER_ID = 31
+
+
+def _page(client, **params) -> dict:
+    response = client.get("/api/history", params={"user_id": USER_ID, "limit": 10, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _sort_key(wound: dict):
+    return wound["upload_date"], wound["wound_id"]
+
+
+def test_cursor_pages_are_stable_while_rows_are_inserted(client, make_wound):
+    original = [make_wound(user_id=USER_ID, classified=False) for _ in range(25)]
+
+    first = _page(client)
+    seen = first["wounds"]
+    cursor = first["next_cursor"]
+
+    # New uploads land before the cursor; a backdated import lands after every existing row
+    inserted = [make_wound(user_id=USER_ID, classified=False) for _ in range(3)]
+    with SessionLocal() as db:
+        backdated = Wound(user_id=USER_ID, image_path="./uploads/imported.jpg", upload_date=datetime.utcnow() - timedelta(days=30))
+        db.add(backdated)
+        db.commit()
+        backdated_id = backdated.id
+
+    while cursor:
+        page = _page(client, cursor=cursor)
+        seen += page["wounds"]
+        cursor = page["next_cursor"]
+        assert page["total"] is None  # Not counted in cursor mode unless asked for
+
+    ids = [w["wound_id"] for w in seen]
+    assert len(ids) == len(set(ids)), "a wound appeared on two pages"
+    assert set(ids) == set(original) | {backdated_id}
+    assert not set(ids) & set(inserted)  # Newer than the cursor: they belong to a fresh first page
+    assert [_sort_key(w) for w in seen] == sorted((_sort_key(w) for w in seen), reverse=True)
+    assert ids[-1] == backdated_id
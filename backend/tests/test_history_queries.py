@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import SessionLocal, Classification, Recommendation
+
+USER_ID = 30
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+
+@pytest.fixture(scope="module")
+def seeded_history(client):
+    """60 classified wounds with recommendations; every third one re-classified"""
+    wound_ids = []
+    for i in range(60):
+        response = client.post("/api/upload", data={"user_id": str(USER_ID)},
+                               files={"image": ("wound.jpg", b"\xff\xd8 not really a jpeg", "image/jpeg")})
+        assert response.status_code == 200, response.text
+        wound_ids.append(response.json()["wound_id"])
+    with SessionLocal() as db:
+        for i, wound_id in enumerate(wound_ids):
+            for attempt in range(2 if i % 3 == 0 else 1):
+                classification = Classification(
+                    wound_id=wound_id, wound_type=f"type-{attempt}", confidence=0.8,
+                    all_probabilities={f"type-{attempt}": 0.8}, processing_time_ms=900
+                )
+                db.add(classification)
+                db.flush()
+                db.add(Recommendation(classification_id=classification.id, summary=f"advice {attempt}"))
+        db.commit()
+    return wound_ids
+
+
+@pytest.mark.parametrize("mode", ["offset", "cursor"])
+def test_history_query_count_is_constant_per_page(client, seeded_history, mode):
+    counts = {}
+    for limit in (1, 10, 50):
+        params = {"user_id": USER_ID, "limit": limit}
+        if mode == "cursor":
+            # A cursor from the first page, so the keyset branch runs (and no total is counted)
+            first = client.get("/api/history", params={"user_id": USER_ID, "limit": 1}).json()
+            params["cursor"] = first["next_cursor"]
+        with count_statements() as statements:
+            response = client.get("/api/history", params=params)
+        assert response.status_code == 200, response.text
+        counts[limit] = len(statements)
+        wounds = response.json()["wounds"]
+        assert len(wounds) == limit
+        # Latest classification wins, and its recommendation comes along
+        assert all(w["classification"] and w["recommendation"] for w in wounds)
+        reclassified = [w for w in wounds if seeded_history.index(w["wound_id"]) % 3 == 0]
+        assert all(w["classification"]["wound_type"] == "type-1" for w in reclassified)
+    assert counts[1] > 0
+    assert len(set(counts.values())) == 1, f"statements per page size: {counts}"
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import maintenance
+from database import (
+    Base, SessionLocal, create_db_engine, Session as DBSession, EmailVerificationOTP, EmailOutbox,
+    Wound, Classification, ClassificationArchive, Recommendation, RecommendationArchive,
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A session on its own database, so other tests' rows don't count"""
+    engine = create_db_engine(f"sqlite:///{tmp_path}/maintenance.db")
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal(bind=engine)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _ago(**delta) -> datetime:
+    return datetime.utcnow() - timedelta(**delta)
+
+
+def _classification(db, wound_id: int, at: datetime, *recommendations_at) -> Classification:
+    classification = Classification(
+        wound_id=wound_id, wound_type="surgical", confidence=90, all_probabilities={"surgical": 0.9}, timestamp=at
+    )
+    db.add(classification)
+    db.flush()
+    for created_at in recommendations_at:
+        db.add(Recommendation(
+            classification_id=classification.id, summary="Keep it clean", cleaning_instructions=["Rinse"],
+            created_at=created_at
+        ))
+    db.flush()
+    return classification
+
+
+def _ids(db, model) -> set:
+    return {row.id for row in db.query(model)}
+
+
+def test_superseded_rows_move_to_the_archive(db):
+    for wound_id in (1, 2, 3):
+        db.add(Wound(id=wound_id, user_id=1, image_path=f"./uploads/w{wound_id}.jpg"))
+    # Wound 1: an old classification superseded by a newer one whose own first recommendation was redone
+    old = _classification(db, 1, _ago(days=100), _ago(days=100))
+    latest = _classification(db, 1, _ago(days=1), _ago(days=60), _ago(days=1))
+    # Wound 2: superseded, but only an hour ago
+    recent = _classification(db, 2, _ago(hours=1), _ago(hours=1))
+    newest = _classification(db, 2, _ago(minutes=1), _ago(minutes=1))
+    # Wound 3: a single old classification is still the latest
+    only = _classification(db, 3, _ago(days=200), _ago(days=200))
+    db.commit()
+    # Ids read up front: the archived objects are gone from the session afterwards
+    old_id, kept = old.id, {latest.id, recent.id, newest.id, only.id}
+    old_recommendation = old.recommendations[0].id
+    redone, current = sorted(r.id for r in latest.recommendations)
+
+    report = maintenance.run_all(db, batch_size=1)
+    assert report["classifications"] == 1
+    assert report["recommendations"] == 2
+
+    assert _ids(db, ClassificationArchive) == {old_id}
+    assert _ids(db, RecommendationArchive) == {old_recommendation, redone}
+    assert _ids(db, Classification) == kept
+    assert current in _ids(db, Recommendation) and not {old_recommendation, redone} & _ids(db, Recommendation)
+    archived = db.get(RecommendationArchive, old_recommendation)
+    assert archived.wound_id == 1 and archived.cleaning_instructions == ["Rinse"]
+
+    assert maintenance.run_all(db, batch_size=1)["classifications"] == 0
+
+
+def test_expired_sessions_otps_and_finished_emails_are_purged(db):
+    db.add_all([
+        DBSession(user_id=1, session_token="expired", expires_at=_ago(minutes=1)),
+        DBSession(user_id=1, session_token="live", expires_at=_ago(days=-1)),
+        EmailVerificationOTP(email="a@example.com", otp_code="111111", expires_at=_ago(minutes=1)),
+        EmailVerificationOTP(email="a@example.com", otp_code="222222", expires_at=_ago(minutes=-10)),
+    ])
+    emails = {}
+    for name, status, age in (
+        ("old_sent", "sent", 30), ("old_dead", "dead", 30), ("old_pending", "pending", 30), ("new_sent", "sent", 1)
+    ):
+        emails[name] = EmailOutbox(
+            kind="otp", to_email="a@example.com", subject=name, html_body="", text_body="",
+            status=status, created_at=_ago(days=age)
+        )
+    db.add_all(emails.values())
+    db.commit()
+
+    report = maintenance.run_all(db, batch_size=1)
+    assert (report["sessions"], report["otps"], report["emails"]) == (1, 1, 2)
+    assert [s.session_token for s in db.query(DBSession)] == ["live"]
+    assert [o.otp_code for o in db.query(EmailVerificationOTP)] == ["222222"]
+    assert {e.subject for e in db.query(EmailOutbox)} == {"old_pending", "new_sent"}
+
+    assert not any(maintenance.run_all(db).values())
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from sqlalchemy import inspect, text
+
+import migrations
+from database import Base, SessionLocal, create_db_engine, AnalyticsDaily, Case, Recommendation, Wound, WoundSearchIndex
+
+# The schema as create_all built it before migrations existed
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(100), email VARCHAR(100) UNIQUE,
+        password_hash VARCHAR(255), phone VARCHAR(20), date_of_birth VARCHAR(50), blood_type VARCHAR(10),
+        emergency_contact VARCHAR(100), emergency_phone VARCHAR(20), profile_image VARCHAR(255),
+        email_verified BOOLEAN, created_at DATETIME)""",
+    """CREATE TABLE sessions (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id),
+        session_token VARCHAR(255) UNIQUE, expires_at DATETIME, created_at DATETIME)""",
+    """CREATE TABLE email_verification_otps (id INTEGER PRIMARY KEY, email VARCHAR(100) NOT NULL,
+        otp_code VARCHAR(6) NOT NULL, expires_at DATETIME NOT NULL, verified BOOLEAN, created_at DATETIME)""",
+    """CREATE TABLE cases (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id), name VARCHAR(255),
+        description TEXT, created_at DATETIME)""",
+    """CREATE TABLE wounds (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id),
+        case_id INTEGER REFERENCES cases (id), image_path VARCHAR(255) NOT NULL, original_filename VARCHAR(255),
+        upload_date DATETIME, status VARCHAR(50), notes TEXT, classification VARCHAR(100), confidence FLOAT,
+        redness_level INTEGER, discharge_detected BOOLEAN, discharge_type VARCHAR(50), edge_quality INTEGER,
+        tissue_composition JSON, analysis JSON)""",
+    """CREATE TABLE classifications (id INTEGER PRIMARY KEY, wound_id INTEGER REFERENCES wounds (id),
+        wound_type VARCHAR(100) NOT NULL, confidence FLOAT NOT NULL, all_probabilities JSON NOT NULL,
+        processing_time_ms INTEGER, timestamp DATETIME)""",
+    """CREATE TABLE recommendations (id INTEGER PRIMARY KEY, classification_id INTEGER REFERENCES classifications (id),
+        summary TEXT NOT NULL, cleaning_instructions JSON, dressing_recommendations JSON, medication_suggestions JSON,
+        expected_healing_time VARCHAR(100), follow_up_schedule JSON, warning_signs JSON, when_to_seek_help JSON,
+        diet_advice JSON, activity_restrictions JSON, ai_confidence INTEGER, created_at DATETIME)""",
+    """CREATE TABLE comparisons (id INTEGER PRIMARY KEY, case_id INTEGER REFERENCES cases (id),
+        wound_id_before INTEGER REFERENCES wounds (id), wound_id_after INTEGER REFERENCES wounds (id),
+        analysis JSON, created_at DATETIME)""",
+]
+
+ANALYSIS = {"wound_type": "Normal Healing", "tissue_composition": {"pink": 20, "red": 50, "yellow": 30, "black": 0, "white": 0}}
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    """A database from before migrations existed, with a little data in it"""
+    engine = create_db_engine(f"sqlite:///{tmp_path}/baseline.db")
+    with engine.begin() as conn:
+        for ddl in BASELINE_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO users (id, name, email) VALUES (1, 'Pat', 'pat@example.com')"))
+        conn.execute(text("INSERT INTO cases (id, user_id, name, created_at) VALUES (1, 1, 'Knee', '2026-01-01 09:00:00')"))
+        for wound_id, day in ((1, "2026-01-02"), (2, "2026-01-05")):
+            conn.execute(text(
+                "INSERT INTO wounds (id, user_id, case_id, image_path, upload_date, status, analysis) "
+                "VALUES (:id, 1, 1, :path, :day, 'analyzed', :analysis)"
+            ), {"id": wound_id, "path": f"./uploads/w{wound_id}.jpg", "day": f"{day} 10:00:00", "analysis": json.dumps(ANALYSIS)})
+        conn.execute(text(
+            "INSERT INTO classifications (id, wound_id, wound_type, confidence, all_probabilities, processing_time_ms, timestamp) "
+            "VALUES (1, 2, 'Normal Healing', 80, '{}', 1200, '2026-01-05 10:01:00')"
+        ))
+        conn.execute(text(
+            "INSERT INTO recommendations (id, classification_id, summary, cleaning_instructions, created_at) "
+            "VALUES (1, 1, 'Keep it dry', :steps, '2026-01-05 10:02:00')"
+        ), {"steps": json.dumps(["Rinse with saline", "Pat dry"])})
+    yield engine
+    engine.dispose()
+
+
+def _snapshot(engine) -> dict:
+    inspector = inspect(engine)
+    with engine.connect() as conn:
+        return {
+            table: (
+                sorted(column["name"] for column in inspector.get_columns(table)),
+                sorted(index["name"] for index in inspector.get_indexes(table)),
+                conn.execute(text(f"SELECT * FROM {table} ORDER BY 1")).all(),
+            )
+            for table in inspector.get_table_names()
+        }
+
+
+def test_baseline_database_upgrades_then_reruns_as_a_no_op(baseline_engine):
+    # What init_db does on startup
+    Base.metadata.create_all(bind=baseline_engine)
+    assert migrations.run_migrations(baseline_engine) == [version for version, _, _ in migrations.MIGRATIONS]
+
+    indexes = {index["name"] for index in inspect(baseline_engine).get_indexes("wounds")}
+    assert {"ix_wounds_user_upload", "ix_wounds_case_upload"} <= indexes
+    db = SessionLocal(bind=baseline_engine)
+    try:
+        case = db.get(Case, 1)
+        assert (case.wound_count, case.latest_wound_id) == (2, 2)
+        assert db.get(Wound, 1).analysis == ANALYSIS  # Re-encoded, reads back the same
+        assert db.get(Recommendation, 1).cleaning_instructions == ["Rinse with saline", "Pat dry"]
+        assert {row.wound_id for row in db.query(WoundSearchIndex)} == {1, 2}
+        user_rows = db.query(AnalyticsDaily).filter_by(scope="user", scope_id=1, wound_type="*").all()
+        assert sum(row.uploads for row in user_rows) == 2
+        assert sum(row.classifications for row in user_rows) == 1
+        assert sum(row.recommendations for row in user_rows) == 1
+    finally:
+        db.close()
+
+    upgraded = _snapshot(baseline_engine)
+    Base.metadata.create_all(bind=baseline_engine)
+    assert migrations.run_migrations(baseline_engine) == []
+    assert migrations.pending_migrations(baseline_engine) == []
+    assert _snapshot(baseline_engine) == upgraded
+
+
+def test_fresh_database_records_every_migration(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/fresh.db")
+    try:
+        Base.metadata.create_all(bind=engine)
+        assert migrations.run_migrations(engine) == [version for version, _, _ in migrations.MIGRATIONS]
+        assert migrations.run_migrations(engine) == []
+    finally:
+        engine.dispose()
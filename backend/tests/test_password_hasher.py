@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import password_hasher
+from config import config
+
+
+def _slow(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def tiny_pool(monkeypatch):
+    monkeypatch.setattr(config, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(config, "PASSWORD_HASH_MAX_PENDING", 1)
+    monkeypatch.setattr(config, "PASSWORD_HASH_TIMEOUT", 0.1)
+    monkeypatch.setattr(config, "PASSWORD_HASH_QUEUE_TIMEOUT", 0.1)
+    monkeypatch.setattr(password_hasher, "_slots", None)
+    monkeypatch.setattr(password_hasher, "_executor", None)
+    yield
+    password_hasher.shutdown()
+
+
+def test_timed_out_hash_keeps_its_slot_until_the_worker_finishes(tiny_pool):
+    async def scenario():
+        await password_hasher._run(_slow, 0)  # Start the worker process
+
+        with pytest.raises(HTTPException) as timed_out:
+            await password_hasher._run(_slow, 0.6)
+        assert timed_out.value.status_code == 503
+        assert password_hasher._slots.locked()  # Still running in the pool
+
+        with pytest.raises(HTTPException) as busy:
+            await password_hasher._run(_slow, 0)
+        assert "busy" in busy.value.detail
+
+        await asyncio.sleep(0.8)
+        assert not password_hasher._slots.locked()
+        assert await password_hasher._run(_slow, 0) == 0
+
+    asyncio.run(scenario())
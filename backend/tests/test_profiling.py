@@ -0,0 +1,67 @@
+import pstats
+
+import pytest
+
+import profiling
+from config import config
+
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path / "profiles"))
+    return tmp_path / "profiles"
+
+
+def _profiles(client) -> list:
+    response = client.get("/api/admin/profiles", headers=ADMIN)
+    assert response.status_code == 200
+    return response.json()["profiles"]
+
+
+def test_admin_can_profile_a_request_and_download_it(client, profile_dir, tmp_path):
+    assert _profiles(client) == []
+    assert client.get("/api/history", params={"user_id": 49}).status_code == 200
+    assert client.get("/api/history", params={"user_id": 49}, headers={"X-Profile": "cpu"}).status_code == 200
+    assert _profiles(client) == []  # Asking without the token profiles nothing
+
+    client.get("/api/history", params={"user_id": 49}, headers={**ADMIN, "X-Profile": "cpu"})
+    client.get("/api/history", params={"user_id": 49, "_profile": "wall", "_admin_token": "test-admin-token"})
+    newest, oldest = _profiles(client)
+    assert (oldest["clock"], newest["clock"]) == ("cpu", "wall")
+    assert (newest["route"], newest["status"]) == ("/api/history", 200)
+
+    download = client.get(f"/api/admin/profiles/{newest['id']}", headers=ADMIN)
+    assert download.status_code == 200
+    assert download.headers["content-disposition"].endswith(f'{newest["id"]}.prof"')
+    (tmp_path / "downloaded.prof").write_bytes(download.content)
+    assert pstats.Stats(str(tmp_path / "downloaded.prof")).total_calls > 0
+
+    text = client.get(f"/api/admin/profiles/{newest['id']}", params={"format": "text", "limit": 5}, headers=ADMIN)
+    assert text.status_code == 200 and "function calls" in text.text
+
+
+def test_profiles_form_a_ring_of_the_newest(client, profile_dir, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_MAX_FILES", 2)
+    for _ in range(3):
+        client.get("/api/history", params={"user_id": 49}, headers={**ADMIN, "X-Profile": "wall"})
+    kept = _profiles(client)
+    assert len(kept) == 2
+    assert sorted(path.name for path in profile_dir.iterdir()) == sorted(
+        f"{meta['id']}{suffix}" for meta in kept for suffix in (".json", ".prof")
+    )
+
+
+def test_admin_endpoints_need_the_token(client, profile_dir, monkeypatch):
+    assert client.get("/api/admin/profiles").status_code == 403
+    assert client.get("/api/admin/profiles", headers={"X-Admin-Token": "guess"}).status_code == 403
+    assert client.get("/api/admin/profiles/20260101000000000000-abcdef", headers=ADMIN).status_code == 404
+    assert client.get("/api/admin/profiles/..%2F..%2Fconfig", headers=ADMIN).status_code == 404
+    assert profiling.profile_file("../../config") is None
+
+    # Without ADMIN_TOKEN the endpoints don't exist, and no token unlocks profiling
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "")
+    assert client.get("/api/admin/profiles", headers=ADMIN).status_code == 404
+    client.get("/api/history", params={"user_id": 49}, headers={**ADMIN, "X-Profile": "wall"})
+    assert profiling.list_profiles() == []
@@ -0,0 +1,83 @@
+"""
+Statement budgets for the routers that used to issue queries in loops.
+Each runs with 1 and with several wounds: the count must not grow with the
+data, and no statement shape may repeat (max_repeats=1).
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import text
+
+import query_stats
+from database import engine
+
+WOUND_COUNTS = (1, 8)
+
+
+def _seed(make_case, make_wound, user_id: int, wounds: int):
+    case_id = make_case(user_id=user_id)
+    return case_id, [make_wound(user_id=user_id, case_id=case_id) for _ in range(wounds)]
+
+
+@pytest.mark.parametrize("wounds", WOUND_COUNTS)
+def test_history_budget(client, make_case, make_wound, query_budget, wounds):
+    user_id = 100 + wounds
+    case_id, _ = _seed(make_case, make_wound, user_id, wounds)
+    with query_budget(max_queries=3, max_repeats=1):  # count, page, latest classification + recommendation
+        response = client.get("/api/history", params={"user_id": user_id, "case_id": case_id})
+    assert response.status_code == 200 and len(response.json()["wounds"]) == wounds
+
+
+@pytest.mark.parametrize("wounds", WOUND_COUNTS)
+def test_cases_budget(client, make_case, make_wound, query_budget, wounds):
+    user_id = 200 + wounds
+    for _ in range(wounds):
+        _seed(make_case, make_wound, user_id, 1)
+    with query_budget(max_queries=1, max_repeats=1):
+        response = client.get("/api/cases", params={"user_id": user_id})
+    assert response.status_code == 200 and len(response.json()["cases"]) == wounds
+
+
+@pytest.mark.parametrize("wounds", WOUND_COUNTS)
+def test_delete_wound_budget(client, make_case, make_wound, query_budget, wounds):
+    _, wound_ids = _seed(make_case, make_wound, 300 + wounds, wounds)
+    with query_budget(max_queries=15, max_repeats=1):
+        response = client.delete(f"/api/wounds/{wound_ids[0]}")
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("wounds", WOUND_COUNTS)
+def test_delete_case_budget(client, make_case, make_wound, query_budget, wounds):
+    case_id, _ = _seed(make_case, make_wound, 400 + wounds, wounds)
+    with query_budget(max_queries=17, max_repeats=1):
+        response = client.delete(f"/api/cases/{case_id}")
+    assert response.status_code == 200, response.text
+
+
+def test_budget_fails_on_repeated_statements(query_budget):
+    with pytest.raises(query_stats.QueryBudgetExceeded, match="3x the same statement"):
+        with query_budget(max_repeats=2), engine.connect() as conn:
+            for i in range(3):
+                conn.execute(text("SELECT :i"), {"i": i})
+
+
+def test_budget_ignores_statements_from_other_contexts(query_budget):
+    def background_job():  # Like the email dispatcher: started outside the budget
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    with query_budget(max_queries=0) as stats:
+        worker = threading.Thread(target=background_job)
+        worker.start()
+        worker.join()
+    assert stats.count == 0
+
+
+def test_debug_headers_are_opt_in(client, monkeypatch):
+    from config import config
+    assert "x-db-queries" not in client.get("/api/cases", params={"user_id": 1}).headers
+    monkeypatch.setattr(config, "QUERY_DEBUG_HEADERS", True)
+    headers = client.get("/api/cases", params={"user_id": 1}).headers
+    assert headers["x-db-queries"].startswith("count=1;")
+    assert headers["server-timing"].startswith("db;dur=")
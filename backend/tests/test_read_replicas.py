@@ -0,0 +1,36 @@
+import time
+
+import database
+
+USER_ID = 41
+
+
+def _history_total(client) -> int:
+    response = client.get("/api/history", params={"user_id": USER_ID})
+    assert response.status_code == 200, response.text
+    return response.json()["total"]
+
+
+def test_reads_stay_on_the_primary_during_the_sticky_window(client, make_wound, replica):
+    make_wound(user_id=USER_ID, classified=False)
+    assert _history_total(client) == 1  # Primary
+    time.sleep(0.6)
+    assert _history_total(client) == 0  # Replica
+
+
+def test_case_trajectory_follows_the_case_written_to(client, make_case, replica):
+    case_id = make_case(user_id=USER_ID)
+    assert client.get(f"/api/cases/{case_id}/trajectory").status_code == 200
+    time.sleep(0.6)
+    assert client.get(f"/api/cases/{case_id}/trajectory").status_code == 404  # Not on the replica
+
+
+def test_sticky_windows_are_shared_through_the_sqlite_file(tmp_path):
+    path = str(tmp_path / "shared.db")
+    worker_a, worker_b = database.SQLiteStickiness(path), database.SQLiteStickiness(path)
+    worker_a.mark(["user:1", "case:7"], time.time() + 5)
+    assert worker_b.active(["user:1"])
+    assert worker_b.active(["user:2", "case:7"])
+    assert not worker_b.active(["user:2"])
+    worker_a.mark(["user:3"], time.time() - 1)
+    assert not worker_b.active(["user:3"])
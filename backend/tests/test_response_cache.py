@@ -0,0 +1,87 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import response_cache
+from config import config
+from routes import classify
+
+USER_ID = 33
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    backend = response_cache.MemoryBackend(config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_TTL_SECONDS)
+    monkeypatch.setattr(response_cache, "_backend", backend)
+    return backend
+
+
+def _get(client, path, **headers):
+    response = client.get(path, params={"user_id": USER_ID}, headers=headers)
+    assert response.status_code in (200, 304), response.text
+    return response
+
+
+def test_etag_revalidation(client, memory_cache, make_wound):
+    make_wound(user_id=USER_ID)
+    first = _get(client, "/api/history")
+    assert first.headers["x-cache"] == "MISS"
+    etag = first.headers["etag"]
+
+    second = _get(client, "/api/history")
+    assert second.headers["x-cache"] == "HIT" and second.headers["etag"] == etag
+    assert second.json() == first.json()
+
+    revalidated = _get(client, "/api/history", **{"If-None-Match": etag})
+    assert revalidated.status_code == 304 and not revalidated.content
+    assert _get(client, "/api/history", **{"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_writes_invalidate_the_users_cached_pages(client, memory_cache, make_case, make_wound, monkeypatch):
+    case_id = make_case(user_id=USER_ID)
+    wound_id = make_wound(user_id=USER_ID, case_id=case_id, classified=False)
+
+    def cached_twice(path):
+        body = _get(client, path).json()
+        assert _get(client, path).headers["x-cache"] == "HIT"
+        return body
+
+    history, cases = cached_twice("/api/history"), cached_twice("/api/cases")
+
+    make_wound(user_id=USER_ID, case_id=case_id, classified=False)  # Upload
+    assert _get(client, "/api/history").json()["total"] == history["total"] + 1
+    case = next(c for c in _get(client, "/api/cases").json()["cases"] if c["id"] == case_id)
+    assert case["wound_count"] == next(c for c in cases["cases"] if c["id"] == case_id)["wound_count"] + 1
+
+    cached_twice("/api/history")
+    answer = {"wound_type": "Surgical", "confidence": 90, "probabilities": {}, "tissue_composition": {"red": 100}}
+    model = SimpleNamespace(generate_content=lambda *args, **kwargs: SimpleNamespace(text=json.dumps(answer)))
+    monkeypatch.setattr(classify, "genai", SimpleNamespace(upload_file=lambda path: "file", GenerativeModel=lambda name: model))
+    assert client.post("/api/classify", json={"wound_id": wound_id}).status_code == 200
+    page = _get(client, "/api/history")
+    assert page.headers["x-cache"] == "MISS"
+    assert next(w for w in page.json()["wounds"] if w["wound_id"] == wound_id)["classification"]["wound_type"] == "Surgical"
+
+    cached_twice("/api/history")
+    assert client.delete(f"/api/wounds/{wound_id}").status_code == 200
+    page = _get(client, "/api/history")
+    assert page.headers["x-cache"] == "MISS"
+    assert wound_id not in [w["wound_id"] for w in page.json()["wounds"]]
+
+
+def test_sqlite_backend_shares_invalidations_between_workers(client, tmp_path, monkeypatch, make_wound):
+    path = str(tmp_path / "cache.db")
+    this_worker = response_cache.SQLiteBackend(path, 100, 60)
+    other_worker = response_cache.SQLiteBackend(path, 100, 60)
+    monkeypatch.setattr(response_cache, "_backend", this_worker)
+    make_wound(user_id=USER_ID)
+
+    assert _get(client, "/api/cases").headers["x-cache"] == "MISS"
+    assert _get(client, "/api/cases").headers["x-cache"] == "HIT"
+    other_worker.bump(USER_ID)  # A write served by another worker
+    assert _get(client, "/api/cases").headers["x-cache"] == "MISS"
+
+    # Entries written by one worker are served by the other
+    monkeypatch.setattr(response_cache, "_backend", other_worker)
+    assert _get(client, "/api/cases").headers["x-cache"] == "HIT"
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from database import SessionLocal, Wound, WoundSearchIndex
+
+USER_ID = 600
+
+
+def _indexed_wound(db, pink: float, red: float, image_path: str) -> int:
+    wound = Wound(user_id=USER_ID, image_path=image_path)
+    db.add(wound)
+    db.flush()
+    db.add(WoundSearchIndex(
+        wound_id=wound.id, user_id=USER_ID, upload_date=datetime.utcnow(), final_wound_type="surgical",
+        severity_score=2.0, tissue_pink=pink, tissue_red=red, tissue_yellow=0, tissue_black=0, tissue_white=0
+    ))
+    return wound.id
+
+
+def test_search_applies_tissue_bounds_and_normalizes_paths(client):
+    with SessionLocal() as db:
+        healthy = _indexed_wound(db, pink=80, red=10, image_path=".\\uploads\\healthy.jpg")
+        inflamed = _indexed_wound(db, pink=20, red=70, image_path="./uploads/inflamed.jpg")
+        db.commit()
+
+    def search(**params):
+        response = client.get("/api/wounds/search", params={"user_id": USER_ID, **params})
+        assert response.status_code == 200, response.text
+        return response.json()["wounds"]
+
+    assert {w["wound_id"] for w in search()} == {healthy, inflamed}
+    assert [w["wound_id"] for w in search(min_pink=50)] == [healthy]
+    assert [w["wound_id"] for w in search(max_pink=50, min_red=60)] == [inflamed]
+    assert search(min_red=60, max_red=65) == []
+    paths = {w["wound_id"]: w["image_path"] for w in search()}
+    assert paths == {healthy: "uploads/healthy.jpg", inflamed: "uploads/inflamed.jpg"}
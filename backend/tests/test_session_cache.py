@@ -0,0 +1,98 @@
+import secrets
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import database
+import session_cache
+from config import config
+from database import SessionLocal, Session as DBSession, User
+
+
+def _user(user_id: int) -> User:
+    return User(id=user_id, name=f"User {user_id}", email=f"user{user_id}@example.com", email_verified=True,
+                created_at=datetime.utcnow())
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A fresh cache on its own invalidation file, installed as the process-wide one"""
+    fresh = session_cache.SessionCache(100, 60, session_cache.SQLiteChannel(str(tmp_path / "channel.db")))
+    monkeypatch.setattr(session_cache, "_cache", fresh)
+    monkeypatch.setattr(config, "SESSION_CACHE_SYNC_SECONDS", 0)
+    return fresh
+
+
+@pytest.fixture
+def stored_session():
+    """A user with a live session in the primary database: (user id, token)"""
+    token = secrets.token_urlsafe(16)
+    with SessionLocal() as db:
+        user = User(name="Stored", email=f"{token}@example.com", email_verified=True)
+        db.add(user)
+        db.flush()
+        db.add(DBSession(user_id=user.id, session_token=token, expires_at=datetime.utcnow() + timedelta(days=1)))
+        db.commit()
+        return user.id, token
+
+
+def test_remember_forget_and_forget_user(cache):
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    session_cache.remember("a1", _user(1), expires_at)
+    session_cache.remember("a2", _user(1), expires_at)
+    session_cache.remember("b1", _user(2), expires_at)
+    session_cache.remember("old", _user(2), datetime.utcnow() - timedelta(seconds=1))
+    assert cache.get("a1").id == 1
+    assert cache.get("old") is None  # Past the session's own expiry
+
+    session_cache.forget("a1")
+    assert cache.get("a1") is None and cache.get("a2").id == 1
+
+    session_cache.forget_user(1)
+    assert cache.get("a2") is None
+    assert cache.get("b1").id == 2
+
+
+def test_invalidations_reach_every_worker_through_the_channel(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_CACHE_SYNC_SECONDS", 0)
+    path = str(tmp_path / "shared.db")
+    worker_a = session_cache.SessionCache(100, 60, session_cache.SQLiteChannel(path))
+    worker_b = session_cache.SessionCache(100, 60, session_cache.SQLiteChannel(path))
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    user = session_cache.user_snapshot(_user(3))
+    for worker in (worker_a, worker_b):
+        worker.set("t1", user, expires_at)
+        worker.set("t2", user, expires_at)
+
+    worker_a.invalidate("t1")  # Logout handled by worker A
+    assert worker_b.get("t1") is None and worker_b.get("t2") is not None
+    worker_a.invalidate_user(3)  # Password reset
+    assert worker_b.get("t2") is None
+
+
+def test_lookup_asks_the_primary_when_the_replica_lags(client, replica, cache, stored_session):
+    user_id, token = stored_session
+
+    async def lookup():
+        async with database.AsyncReadSessionLocal() as db:
+            return await session_cache.lookup(db, token), db.info.get("primary")
+
+    user, fell_back = client.portal.call(lookup)
+    assert user.id == user_id and fell_back
+    assert cache.get(token).id == user_id  # Filled, so the next check costs no queries
+
+
+def test_current_user_dependency(client, cache, stored_session):
+    user_id, token = stored_session
+
+    async def current_user(**headers):
+        async with database.AsyncSessionLocal() as db:
+            return await session_cache.current_user(db=db, **{"authorization": None, "x_session_token": None, **headers})
+
+    assert client.portal.call(lambda: current_user(authorization=f"Bearer {token}")).id == user_id
+    assert client.portal.call(lambda: current_user(x_session_token=token)).id == user_id
+    for headers in ({}, {"authorization": "Bearer nope"}):
+        with pytest.raises(HTTPException) as rejected:
+            client.portal.call(lambda: current_user(**headers))
+        assert rejected.value.status_code == 401
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import analytics
+from database import SessionLocal, AnalyticsDaily, Classification, Recommendation, Wound
+
+USER_ID = 700
+
+
+def _user_stats(client) -> dict:
+    response = client.get("/api/stats", params={"user_id": USER_ID})
+    assert response.status_code == 200, response.text
+    return response.json()["stats"]
+
+
+def test_deletes_are_taken_out_of_the_summaries(client, make_case, make_wound):
+    case_id = make_case(user_id=USER_ID)
+    first, *_ = [make_wound(user_id=USER_ID, case_id=case_id, classified=False) for _ in range(3)]
+    with SessionLocal() as db:
+        classification = Classification(wound_id=first, wound_type="surgical", confidence=0.9, all_probabilities={}, processing_time_ms=1500)
+        db.add(classification)
+        analytics.record_classification(db, db.get(Wound, first), classification)
+        db.commit()
+    stats = _user_stats(client)
+    assert (stats["uploads"], stats["classifications"]) == (3, 1)
+
+    assert client.delete(f"/api/wounds/{first}").status_code == 200
+    stats = _user_stats(client)
+    assert (stats["uploads"], stats["classifications"]) == (2, 0)
+    assert stats["wound_type_distribution"] == {}
+
+    assert client.delete(f"/api/cases/{case_id}").status_code == 200
+    assert _user_stats(client)["uploads"] == 0
+
+    # Incremental totals agree with a rebuild from the base tables
+    with SessionLocal() as db:
+        incremental = analytics.summary(db, "user", USER_ID, 30)
+        analytics.rebuild(db)
+        assert analytics.summary(db, "user", USER_ID, 30) == incremental
+
+
+def _daily_rows(db, user_id: int) -> dict:
+    rows = db.query(AnalyticsDaily).filter_by(scope="user", scope_id=user_id).all()
+    return {(row.day, row.wound_type): [getattr(row, column) for column in analytics.COUNTER_COLUMNS] for row in rows}
+
+
+def test_each_event_counts_on_the_day_it_happened(client):
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        wound = Wound(user_id=USER_ID + 1, image_path="./uploads/days.jpg", upload_date=now - timedelta(days=3))
+        db.add(wound)
+        db.flush()
+        analytics.record_upload(db, wound)
+        # Classified two days after the upload, the advice a day later, then re-classified now
+        earlier = Classification(wound_id=wound.id, wound_type="surgical", confidence=0.8, all_probabilities={},
+                                 processing_time_ms=900, timestamp=now - timedelta(days=1))
+        db.add(earlier)
+        analytics.record_classification(db, wound, earlier)
+        db.flush()
+        recommendation = Recommendation(classification_id=earlier.id, summary="Rest", created_at=now - timedelta(hours=2))
+        db.add(recommendation)
+        analytics.record_recommendation(db, wound, recommendation)
+        latest = Classification(wound_id=wound.id, wound_type="infected", confidence=0.6, all_probabilities={}, processing_time_ms=2500)
+        db.add(latest)
+        analytics.record_classification(db, wound, latest)
+        db.commit()
+
+        incremental = _daily_rows(db, USER_ID + 1)
+        assert incremental[((now - timedelta(days=3)).date(), "*")][:2] == [1, 0]
+        assert incremental[((now - timedelta(days=1)).date(), "surgical")][1] == 1
+        assert incremental[(latest.timestamp.date(), "infected")][1] == 1
+        analytics.rebuild(db)
+        assert _daily_rows(db, USER_ID + 1) == incremental
@@ -0,0 +1,58 @@
+import os
+import time
+
+import storage
+from config import config
+from database import SessionLocal, Wound
+
+
+def _old_file(name: str) -> str:
+    path = os.path.join(config.UPLOAD_DIR, name)
+    with open(path, "wb") as f:
+        f.write(b"x")
+    stale = time.time() - 7200
+    os.utime(path, (stale, stale))
+    return path
+
+
+def test_sweep_matches_rows_stored_under_another_upload_dir(client):
+    kept = [_old_file("kept_relative.jpg"), _old_file("kept_windows.jpg"), _old_file("kept_absolute.jpg")]
+    orphan = _old_file("orphan.jpg")
+    with SessionLocal() as db:
+        db.add_all([
+            Wound(user_id=1, image_path="./uploads/kept_relative.jpg"),
+            Wound(user_id=1, image_path="C:\\app\\uploads\\kept_windows.jpg"),
+            Wound(user_id=1, image_path="/srv/other-host/uploads/kept_absolute.jpg"),
+        ])
+        db.commit()
+
+        report = storage.sweep_orphans(db)  # Dry run by default
+        assert os.path.exists(orphan)
+        assert report["removed"] == 0
+
+        report = storage.sweep_orphans(db, dry_run=False)
+    assert report["orphaned"] == 1 and report["removed"] == 1
+    assert not os.path.exists(orphan)
+    assert all(os.path.exists(path) for path in kept)
+
+
+def test_sweep_checks_and_removes_files_in_batches(client, monkeypatch):
+    names = [f"batched_{i:03d}.jpg" for i in range(25)]
+    paths = [_old_file(name) for name in names]
+    with SessionLocal() as db:
+        # Every third file is referenced; one row is a look-alike that must not protect its suffix
+        db.add_all([Wound(user_id=1, image_path=f"./uploads/{name}") for name in names[::3]])
+        db.add(Wound(user_id=1, image_path="./uploads/xbatched_001.jpg"))
+        db.commit()
+
+        queries = []
+        original = storage.referenced_among
+        monkeypatch.setattr(storage, "referenced_among", lambda db, batch: queries.append(len(batch)) or original(db, batch))
+        monkeypatch.setattr(storage, "MATCH_CHUNK", 4)
+        report = storage.sweep_orphans(db, batch_size=10, dry_run=False)
+
+    assert max(queries) <= 10
+    assert all(os.path.exists(path) for path in paths[::3])
+    orphans = [path for i, path in enumerate(paths) if i % 3]
+    assert not any(os.path.exists(path) for path in orphans)
+    assert report["removed"] >= len(orphans)
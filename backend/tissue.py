@@ -0,0 +1,61 @@
+"""
+Tissue composition helpers shared by classification, the recommendation
+engine, the per-case trajectory index and the clinical search index.
+"""
+
+TISSUE_TYPES = ("pink", "red", "yellow", "black", "white")
+
+
+def normalize_tissue(tissue) -> dict:
+    """Coerce a tissue composition to floats that sum to ~100 (AI output can drift)"""
+    tissue = tissue if isinstance(tissue, dict) else {}
+    values = {name: float(tissue.get(name) or 0) for name in TISSUE_TYPES}
+    
+    total = sum(values.values())
+    if total > 0 and total != 100:
+        factor = 100 / total
+        values = {name: round(value * factor, 1) for name, value in values.items()}
+    return values
+
+
+def severity_score(tissue: dict) -> float:
+    """
+    Weighted tissue severity on a 0-300 scale.
+    Weights: Necrotic(Black)=3, Slough(Yellow/White)=2, Active(Red)=1, Healthy(Pink)=0
+    """
+    return (tissue["black"] * 3) + ((tissue["yellow"] + tissue["white"]) * 2) + (tissue["red"] * 1)
+
+
+def apply_override(result: dict):
+    """
+    Deterministic safety override of the AI wound type based on tissue thresholds.
+    Updates result["probabilities"] in place and returns (final_wound_type, final_probabilities).
+    """
+    t_comp = result.get("tissue_composition") or {}
+    p_yellow = t_comp.get("yellow", 0)
+    p_black = t_comp.get("black", 0)
+    p_white = t_comp.get("white", 0)
+    
+    total_slough = p_yellow + p_white
+    total_necrosis = p_black
+    
+    # Default to AI's analysis, but override if logic dictates
+    final_wound_type = result.get("wound_type", "Unknown")
+    final_probabilities = result.get("probabilities", {})
+    
+    if total_necrosis >= 10:
+        final_wound_type = "High Urgency"
+        final_probabilities["High Urgency"] = 100
+    elif total_slough >= 20:
+        if result.get("discharge_detected") and result.get("discharge_type") in ["yellow", "green"]:
+            final_wound_type = "Active Infection"
+            final_probabilities["Active Infection"] = 90
+        else:
+            final_wound_type = "Delayed Healing"
+            final_probabilities["Delayed Healing"] = 90
+    elif total_slough >= 5 and "Normal" in final_wound_type:
+        # Prevent "Normal" tag if visible slough exists
+        final_wound_type = "Delayed Healing"
+        final_probabilities["Delayed Healing"] = 80
+    
+    return final_wound_type, final_probabilities
@@ -0,0 +1,167 @@
+"""
+Per-case healing trajectory index.
+
+Every classification appends a point to its case's CaseTrajectory row and
+updates running aggregates (EMA of severity and tissue mix, least-squares
+sums for the severity slope), so trend charts are served from a single
+primary-key read without any model calls.
+"""
+
+from datetime import datetime
+from sqlalchemy.orm import Session
+from database import CaseTrajectory, Wound
+from tissue import TISSUE_TYPES, normalize_tissue, severity_score
+
+# Smoothing factor for the exponential moving averages (higher = more reactive)
+EMA_ALPHA = 0.3
+
+SECONDS_PER_DAY = 86400.0
+
+
+def _reset(trajectory: CaseTrajectory):
+    trajectory.point_count = 0
+    trajectory.first_date = None
+    trajectory.last_date = None
+    trajectory.latest_severity = None
+    trajectory.ema_severity = None
+    trajectory.ema_tissue = None
+    trajectory.sum_t = 0.0
+    trajectory.sum_y = 0.0
+    trajectory.sum_tt = 0.0
+    trajectory.sum_ty = 0.0
+
+
+def _accumulate(trajectory: CaseTrajectory, point: dict):
+    """Fold one point (newer than every point seen so far) into the aggregates"""
+    taken_at = datetime.fromisoformat(point["date"])
+    if trajectory.first_date is None:
+        trajectory.first_date = taken_at
+    t = (taken_at - trajectory.first_date).total_seconds() / SECONDS_PER_DAY
+    y = point["severity_score"]
+    
+    trajectory.point_count = (trajectory.point_count or 0) + 1
+    trajectory.sum_t = (trajectory.sum_t or 0.0) + t
+    trajectory.sum_y = (trajectory.sum_y or 0.0) + y
+    trajectory.sum_tt = (trajectory.sum_tt or 0.0) + t * t
+    trajectory.sum_ty = (trajectory.sum_ty or 0.0) + t * y
+    
+    if trajectory.ema_severity is None:
+        trajectory.ema_severity = y
+        trajectory.ema_tissue = dict(point["tissue_composition"])
+    else:
+        trajectory.ema_severity = EMA_ALPHA * y + (1 - EMA_ALPHA) * trajectory.ema_severity
+        trajectory.ema_tissue = {
+            name: round(EMA_ALPHA * point["tissue_composition"][name] + (1 - EMA_ALPHA) * trajectory.ema_tissue.get(name, 0.0), 2)
+            for name in TISSUE_TYPES
+        }
+    
+    trajectory.latest_severity = y
+    trajectory.last_date = taken_at
+
+
+def _rebuild(trajectory: CaseTrajectory, points: list):
+    """Recompute aggregates from scratch (out-of-order insert, re-classification or delete)"""
+    _reset(trajectory)
+    for point in points:
+        _accumulate(trajectory, point)
+
+
+def record_classification(db: Session, wound: Wound, tissue_composition, wound_type: str, confidence):
+    """Add or replace a wound's point in its case trajectory (caller commits)"""
+    if not wound.case_id:
+        return
+    
+    tissue = normalize_tissue(tissue_composition)
+    point = {
+        "wound_id": wound.id,
+        "date": wound.upload_date.isoformat(),
+        "wound_type": wound_type,
+        "confidence": confidence,
+        "tissue_composition": tissue,
+        "severity_score": round(severity_score(tissue), 1),
+    }
+    
+    trajectory = db.get(CaseTrajectory, wound.case_id)
+    if trajectory is None:
+        trajectory = CaseTrajectory(case_id=wound.case_id, points=[])
+        _reset(trajectory)
+        db.add(trajectory)
+    
+    points = [p for p in (trajectory.points or []) if p["wound_id"] != wound.id]
+    in_order = len(points) == len(trajectory.points or []) and (
+        not points or points[-1]["date"] <= point["date"]
+    )
+    points.append(point)
+    
+    if in_order:
+        _accumulate(trajectory, point)
+    else:
+        points.sort(key=lambda p: (p["date"], p["wound_id"]))
+        _rebuild(trajectory, points)
+    
+    # Assign a new list so the JSON column is flagged as changed
+    trajectory.points = points
+
+
+def remove_wound(db: Session, case_id, wound_id: int):
+    """Drop a deleted wound from its case trajectory (caller commits)"""
+    if not case_id:
+        return
+    trajectory = db.get(CaseTrajectory, case_id)
+    if trajectory is None:
+        return
+    points = [p for p in (trajectory.points or []) if p["wound_id"] != wound_id]
+    if len(points) != len(trajectory.points or []):
+        _rebuild(trajectory, points)
+        trajectory.points = points
+
+
+def severity_slope(trajectory: CaseTrajectory):
+    """Least-squares severity change per day, or None with fewer than two distinct times"""
+    n = trajectory.point_count or 0
+    denominator = n * trajectory.sum_tt - trajectory.sum_t ** 2 if n else 0
+    if n < 2 or abs(denominator) < 1e-9:
+        return None
+    return (n * trajectory.sum_ty - trajectory.sum_t * trajectory.sum_y) / denominator
+
+
+def serialize(trajectory: CaseTrajectory) -> dict:
+    slope = severity_slope(trajectory)
+    if slope is None:
+        trend = "insufficient_data"
+    elif slope < -0.5:
+        trend = "improving"
+    elif slope > 0.5:
+        trend = "worsening"
+    else:
+        trend = "stable"
+    
+    return {
+        "case_id": trajectory.case_id,
+        "point_count": trajectory.point_count or 0,
+        "points": trajectory.points or [],
+        "first_date": trajectory.first_date.isoformat() if trajectory.first_date else None,
+        "last_date": trajectory.last_date.isoformat() if trajectory.last_date else None,
+        "latest_severity": trajectory.latest_severity,
+        "ema_severity": round(trajectory.ema_severity, 2) if trajectory.ema_severity is not None else None,
+        "ema_tissue_composition": trajectory.ema_tissue,
+        "severity_slope_per_day": round(slope, 3) if slope is not None else None,
+        "trend": trend,
+        "updated_at": trajectory.updated_at.isoformat() if trajectory.updated_at else None,
+    }
+
+
+def empty(case_id: int) -> dict:
+    return {
+        "case_id": case_id,
+        "point_count": 0,
+        "points": [],
+        "first_date": None,
+        "last_date": None,
+        "latest_severity": None,
+        "ema_severity": None,
+        "ema_tissue_composition": None,
+        "severity_slope_per_day": None,
+        "trend": "insufficient_data",
+        "updated_at": None,
+    }
@@ -7,6 +7,7 @@ Run this script to view all data in the database
 import sqlite3
 from datetime import datetime
 import json
+from database import CompactJSON
 
 DB_PATH = "wound_care.db"
 
@@ -56,7 +57,8 @@ def view_all_data():
                                    'cleaning_instructions', 'dressing_recommendations']:
                             if value:
                                 try:
-                                    value = json.dumps(json.loads(value) if isinstance(value, str) else value, indent=2)
+                                    # Compact columns hold bytes; CompactJSON decodes every stored format
+                                    value = json.dumps(CompactJSON().process_result_value(value, None), indent=2)
                                 except:
                                     pass
                         # Truncate long values
@@ -0,0 +1,213 @@
+"""
+Local quantitative comparison of two wound images.
+
+Everything here is plain NumPy on downscaled images so a comparison runs in a
+few milliseconds and always gives the same numbers for the same pair of photos.
+The heavy lifting runs in a process pool of METRICS_WORKERS to keep it off the
+event loop (METRICS_WORKERS=0: a thread instead).
+"""
+
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from config import config
+import process_pools
+
+# Both images are resampled to this square size before any analysis
+ANALYSIS_SIZE = 256
+
+# Tissue classes in the same order as the Gemini tissue_composition keys
+TISSUE_CLASSES = ("red", "pink", "yellow", "black", "white")
+
+# Shifts larger than this fraction of the frame are treated as failed registration
+MAX_SHIFT_FRACTION = 0.25
+
+_executor = None
+
+
+def _load_rgb(image_path: str) -> np.ndarray:
+    """Load an image as a float32 RGB array in [0, 1] at ANALYSIS_SIZE x ANALYSIS_SIZE"""
+    with Image.open(image_path) as img:
+        img = img.convert("RGB").resize((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.BILINEAR)
+        return np.asarray(img, dtype=np.float32) / 255.0
+
+
+def _to_gray(rgb: np.ndarray) -> np.ndarray:
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _rgb_to_hsv(rgb: np.ndarray):
+    """Vectorised RGB -> HSV; hue in degrees [0, 360), saturation/value in [0, 1]"""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    v = rgb.max(axis=-1)
+    c = v - rgb.min(axis=-1)
+    s = np.where(v > 0, c / np.maximum(v, 1e-6), 0.0)
+
+    safe_c = np.maximum(c, 1e-6)
+    h = np.where(
+        v == r, ((g - b) / safe_c) % 6.0,
+        np.where(v == g, (b - r) / safe_c + 2.0, (r - g) / safe_c + 4.0)
+    ) * 60.0
+    h = np.where(c > 0, h, 0.0)
+    return h, s, v
+
+
+def _box_mean(mask: np.ndarray, radius: int) -> np.ndarray:
+    """Mean of a (2r+1)^2 window around every pixel, via summed-area tables"""
+    size = 2 * radius + 1
+    padded = np.pad(mask.astype(np.float32), radius + 1, mode="edge")
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    total = (
+        integral[size:, size:] - integral[:-size, size:]
+        - integral[size:, :-size] + integral[:-size, :-size]
+    )
+    return total[:mask.shape[0], :mask.shape[1]] / (size * size)
+
+
+def _phase_correlation(reference: np.ndarray, moving: np.ndarray):
+    """Estimate the integer (dy, dx) translation that aligns `moving` onto `reference`"""
+    window = np.outer(np.hanning(reference.shape[0]), np.hanning(reference.shape[1])).astype(np.float32)
+    f_ref = np.fft.fft2(reference * window)
+    f_mov = np.fft.fft2(moving * window)
+    cross_power = f_ref * np.conj(f_mov)
+    cross_power /= np.maximum(np.abs(cross_power), 1e-9)
+    correlation = np.abs(np.fft.ifft2(cross_power))
+
+    peak = np.unravel_index(np.argmax(correlation), correlation.shape)
+    dy, dx = (int(p) if p <= n // 2 else int(p) - n for p, n in zip(peak, correlation.shape))
+    return dy, dx, float(correlation[peak])
+
+
+def _shift(arr: np.ndarray, dy: int, dx: int) -> np.ndarray:
+    return np.roll(arr, shift=(dy, dx), axis=(0, 1))
+
+
+def _overlap_mask(dy: int, dx: int) -> np.ndarray:
+    """Pixels that are valid in both images after shifting by (dy, dx)"""
+    valid = np.ones((ANALYSIS_SIZE, ANALYSIS_SIZE), dtype=bool)
+    if dy > 0:
+        valid[:dy, :] = False
+    elif dy < 0:
+        valid[dy:, :] = False
+    if dx > 0:
+        valid[:, :dx] = False
+    elif dx < 0:
+        valid[:, dx:] = False
+    return valid
+
+
+def _segment_tissue(rgb: np.ndarray) -> np.ndarray:
+    """
+    Label each pixel with a tissue class index (see TISSUE_CLASSES), or -1 for
+    surrounding skin/background. Thresholds mirror the colour definitions used
+    in the classification prompt.
+    """
+    h, s, v = _rgb_to_hsv(rgb)
+    reddish = (h < 20) | (h >= 330)
+
+    black = v < 0.22
+    red = reddish & (s >= 0.55) & (v >= 0.22)
+    yellow = (h >= 30) & (h < 75) & (s >= 0.35) & (v >= 0.35)
+    white = (s < 0.12) & (v >= 0.8)
+    pink = reddish & (s >= 0.3) & (s < 0.55) & (v >= 0.55)
+
+    labels = np.full(h.shape, -1, dtype=np.int8)
+    # Later assignments win, so order from least to most clinically significant
+    for index, mask in ((1, pink), (4, white), (2, yellow), (0, red), (3, black)):
+        labels[mask] = index
+    return labels
+
+
+def _wound_mask(labels: np.ndarray) -> np.ndarray:
+    """Non-skin pixels, smoothed to drop isolated speckle and glare points"""
+    return _box_mean(labels >= 0, radius=2) > 0.5
+
+
+def _edge_sharpness(gray: np.ndarray, mask: np.ndarray) -> float:
+    """Mean gradient magnitude along the wound boundary (higher = crisper margin)"""
+    interior = _box_mean(mask, radius=1) >= 0.999
+    boundary = mask & ~interior
+    if not boundary.any():
+        return 0.0
+    gy, gx = np.gradient(gray)
+    return float(np.hypot(gx, gy)[boundary].mean())
+
+
+def _describe(rgb: np.ndarray, valid: np.ndarray) -> dict:
+    labels = _segment_tissue(rgb)
+    mask = _wound_mask(labels) & valid
+    wound_pixels = int(mask.sum())
+
+    counts = np.bincount(labels[mask].astype(np.int64) + 1, minlength=len(TISSUE_CLASSES) + 1)[1:]
+    tissue = {
+        name: round(100.0 * int(count) / wound_pixels, 1) if wound_pixels else 0.0
+        for name, count in zip(TISSUE_CLASSES, counts)
+    }
+    return {
+        "wound_area_percent": round(100.0 * wound_pixels / max(int(valid.sum()), 1), 2),
+        "tissue_composition": tissue,
+        "edge_sharpness": round(_edge_sharpness(_to_gray(rgb), mask), 4),
+    }
+
+
+def compare_images(base_path: str, current_path: str) -> dict:
+    """Compute reproducible numeric deltas between a baseline and a current wound image"""
+    start_time = time.perf_counter()
+
+    base = _load_rgb(base_path)
+    current = _load_rgb(current_path)
+
+    # Coarse registration: estimate the translation, reject implausible shifts
+    dy, dx, peak = _phase_correlation(_to_gray(base), _to_gray(current))
+    max_shift = int(ANALYSIS_SIZE * MAX_SHIFT_FRACTION)
+    registered = abs(dy) <= max_shift and abs(dx) <= max_shift
+    if not registered:
+        dy, dx = 0, 0
+    current = _shift(current, dy, dx)
+    valid = _overlap_mask(dy, dx)
+
+    base_stats = _describe(base, valid)
+    current_stats = _describe(current, valid)
+
+    base_area = base_stats["wound_area_percent"]
+    current_area = current_stats["wound_area_percent"]
+    area_change = round(100.0 * (current_area - base_area) / base_area, 1) if base_area else None
+
+    return {
+        "alignment": {"dx": dx, "dy": dy, "peak": round(peak, 4), "registered": registered},
+        "baseline": base_stats,
+        "current": current_stats,
+        "wound_area_change_percent": area_change,
+        "tissue_delta": {
+            name: round(current_stats["tissue_composition"][name] - base_stats["tissue_composition"][name], 1)
+            for name in TISSUE_CLASSES
+        },
+        "edge_sharpness_change": round(current_stats["edge_sharpness"] - base_stats["edge_sharpness"], 4),
+        "processing_time_ms": int((time.perf_counter() - start_time) * 1000),
+    }
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=config.METRICS_WORKERS, initializer=process_pools.init_worker)
+    return _executor
+
+
+async def compare_images_async(base_path: str, current_path: str) -> dict:
+    """Run compare_images in the shared process pool (or a thread when METRICS_WORKERS is 0)"""
+    if config.METRICS_WORKERS <= 0:
+        return await asyncio.to_thread(compare_images, base_path, current_path)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), compare_images, base_path, current_path)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None